@@ -2,13 +2,14 @@
 
 ''' Main vector generation functions '''
 
-from app.common.utilities import error_exit, execute_command
+from app.common.utilities import error_exit
 from app.ast import ast_vector, ast_obj
-from app.tools import emitter
+from app.tools import emitter, runner
 from app.common import definitions, values
 import json
 import os
 import io
+import shlex
 
 APP_FORMAT_LLVM = "clang-format -style=LLVM "
 APP_AST_DIFF = "crochet-diff"
@@ -26,20 +27,24 @@ def generate_vector(file_path, f_or_struct, start_line, end_line, is_deckard=Tru
     return v
 
 
-def ast_dump(file_path, output_path, is_header=True, use_macro=False, use_local=False):
-    dump_command = APP_AST_DIFF + " -ast-dump-json "
+def get_dump_command(file_path, use_macro=False, use_local=False):
+    dump_command = [APP_AST_DIFF, "-ast-dump-json"]
     if use_macro:
         if values.CONF_PATH_A in file_path or values.CONF_PATH_B in file_path:
-            dump_command += " " + values.DONOR_PRE_PROCESS_MACRO.replace("--extra-arg-a", "--extra-arg") + "  "
+            dump_command += shlex.split(values.DONOR_PRE_PROCESS_MACRO.replace("--extra-arg-a", "--extra-arg"))
         else:
-            dump_command += " " + values.TARGET_PRE_PROCESS_MACRO.replace("--extra-arg-c", "--extra-arg") + "  "
-
-    dump_command += file_path
+            dump_command += shlex.split(values.TARGET_PRE_PROCESS_MACRO.replace("--extra-arg-c", "--extra-arg"))
+    dump_command.append(file_path)
     if file_path[-1] == 'h' or use_local:
-        dump_command += " --"
+        dump_command.append("--")
+    return dump_command
+
+
+def ast_dump(file_path, output_path, is_header=True, use_macro=False, use_local=False):
+    dump_command = get_dump_command(file_path, use_macro, use_local)
+    emitter.command(" ".join(dump_command))
     error_file = definitions.DIRECTORY_OUTPUT + "/errors_AST_dump"
-    dump_command += " 2> " + error_file + " > " + output_path
-    return_code = execute_command(dump_command)
+    return_code = str(runner.run(dump_command, "clang-dump", output_path, error_file).return_code)
     emitter.debug("return code:" + str(return_code))
     return return_code
 
@@ -118,28 +123,30 @@ def get_vars(proj, file, dict_file):
                     proj.function_list[file][func].variables.append(line)
 
 def generate_ast_script(source_a, source_b, outfile_path, dump_matches=False):
-    extra_args = " "
+    generate_command = [APP_AST_DIFF, "-s=" + values.CONF_AST_DIFF_SIZE]
     if dump_matches:
-        extra_args = " -dump-matches "
-    generate_command = APP_AST_DIFF + " -s=" + values.CONF_AST_DIFF_SIZE + extra_args
+        generate_command.append("-dump-matches")
     if values.DONOR_REQUIRE_MACRO:
-        generate_command += " " + values.DONOR_PRE_PROCESS_MACRO + " "
+        generate_command += shlex.split(values.DONOR_PRE_PROCESS_MACRO)
         if values.CONF_PATH_B in source_b:
-            generate_command += " " + values.DONOR_PRE_PROCESS_MACRO.replace("--extra-arg-a", "--extra-arg-c") + " "
+            generate_command += shlex.split(values.DONOR_PRE_PROCESS_MACRO.replace("--extra-arg-a", "--extra-arg-c"))
     if values.TARGET_REQUIRE_MACRO:
         if values.CONF_PATH_C in source_b:
-            generate_command += " " + values.TARGET_PRE_PROCESS_MACRO + " "
-    generate_command += source_a + " " + source_b
+            generate_command += shlex.split(values.TARGET_PRE_PROCESS_MACRO)
+    generate_command += [source_a, source_b]
     if source_a[-1] == 'h':
-        generate_command += " --"
-    generate_command += " 2> " + definitions.FILE_AST_DIFF_ERROR
-    if dump_matches:
-        generate_command += " | grep -P '^Match ' | grep -P '^Match '"
-    generate_command += " > " + outfile_path
+        generate_command.append("--")
 
     try:
-        # print(generate_command)
-        execute_command(generate_command, False)
+        emitter.command(" ".join(generate_command))
+        if not dump_matches:
+            runner.run(generate_command, "gumtree", outfile_path, definitions.FILE_AST_DIFF_ERROR)
+            return
+        result = runner.run(generate_command, "gumtree", runner.CAPTURE, definitions.FILE_AST_DIFF_ERROR)
+        with open(outfile_path, 'wb') as out_file:
+            for output_line in result.output.splitlines(True):
+                if output_line.startswith(b"Match "):
+                    out_file.write(output_line)
     except Exception as exception:
         error_exit(exception, "Unexpected error in generate_ast_script.")
 
@@ -155,5 +162,5 @@ def generate_function_list(project, source_file):
     project.function_list[source_file] = dict()
     for function_name, begin_line, finish_line in function_list:
         if function_name not in project.function_list[source_file]:
-            project.function_list[source_file][function_name] = ast_vector.Vector(source_file, function_name, begin_line, finish_line, True)
+            project.add_vector("func", source_file, function_name, begin_line, finish_line)
     get_vars(project, source_file, definition_list)
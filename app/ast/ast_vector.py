@@ -1,43 +1,127 @@
 # -*- coding: utf-8 -*-
 
-from app.tools import emitter
+from app.tools import emitter, runner
 import sys
 from app.common import definitions
-from app.common.utilities import execute_command, error_exit
+from app.common.utilities import error_exit
 import os
 import codecs
+from array import array
+
+
+class VectorMatrix:
+
+    def __init__(self):
+        # flat storage of the normed deckard vectors, row i at data[offset_list[i]:][:length_list[i]]
+        self.data = array('d')
+        self.offset_list = array('q')
+        self.length_list = array('l')
+        # start and end line of row i at line_list[2 * i] and line_list[2 * i + 1]
+        self.line_list = array('l')
+
+    def __len__(self):
+        return len(self.offset_list)
+
+    def add_row(self, start_line, end_line):
+        self.offset_list.append(len(self.data))
+        self.length_list.append(-1)
+        self.line_list.append(int(start_line))
+        self.line_list.append(int(end_line))
+        return len(self.offset_list) - 1
+
+    def set_vector(self, row, vector):
+        if vector is None:
+            self.length_list[row] = -1
+            return
+        offset = self.offset_list[row]
+        if self.length_list[row] == len(vector):
+            # same length, the row keeps its storage
+            self.data[offset:offset + len(vector)] = array('d', vector)
+            return
+        if offset + max(self.length_list[row], 0) == len(self.data):
+            # the row is stored last, it can grow or shrink where it is
+            del self.data[offset:]
+        else:
+            self.offset_list[row] = len(self.data)
+        self.length_list[row] = len(vector)
+        self.data.extend(vector)
+
+    def get_vector(self, row):
+        length = self.length_list[row]
+        if length < 0:
+            return None
+        offset = self.offset_list[row]
+        return self.data[offset:offset + length].tolist()
 
 
 class Vector:
+    __slots__ = ("file_path", "name", "variables", "id", "matrix", "row")
     deckard_path = "third-party/Deckard/cvecgen_fail "
     deckard_path_2 = "third-party/Deckard/cvecgen "
     # deckard_vecs = dict()
     vid = 0
 
-    def __init__(self, file_path, name, start_line, end_line, is_deckard=True):
+    def __init__(self, file_path, name, start_line, end_line, is_deckard=True, matrix=None):
         # self.project = project
         self.file_path = file_path
         self.name = name
-        self.start_line = start_line
-        self.end_line = end_line
         self.variables = []
-        if self.name is not None:
-            self.vector_path = self.file_path + "." + self.name + ".vec"
-        else:
-            self.vector_path = self.file_path + ".vec"
-        self.vector = None
+        # vectors created outside of a project keep a matrix of their own
+        if matrix is None:
+            matrix = VectorMatrix()
+        self.matrix = matrix
+        self.row = matrix.add_row(start_line, end_line)
         if is_deckard:
-            self.vector = self.generate_deckard_vec()
+            matrix.set_vector(self.row, self.generate_deckard_vec())
         self.id = Vector.vid
         Vector.vid += 1
 
+    def __getstate__(self):
+        # only this row is pickled, not the matrix of the whole project
+        return (self.file_path, self.name, self.variables, self.id, self.start_line, self.end_line, self.vector)
+
+    def __setstate__(self, state):
+        self.file_path, self.name, self.variables, self.id, start_line, end_line, vector = state
+        self.matrix = VectorMatrix()
+        self.row = self.matrix.add_row(start_line, end_line)
+        self.matrix.set_vector(self.row, vector)
+
+    @property
+    def start_line(self):
+        return self.matrix.line_list[2 * self.row]
+
+    @start_line.setter
+    def start_line(self, start_line):
+        self.matrix.line_list[2 * self.row] = int(start_line)
+
+    @property
+    def end_line(self):
+        return self.matrix.line_list[2 * self.row + 1]
+
+    @end_line.setter
+    def end_line(self, end_line):
+        self.matrix.line_list[2 * self.row + 1] = int(end_line)
+
+    @property
+    def vector_path(self):
+        if self.name is not None:
+            return self.file_path + "." + self.name + ".vec"
+        return self.file_path + ".vec"
+
+    @property
+    def vector(self):
+        return self.matrix.get_vector(self.row)
+
+    def get_deckard_command(self, deckard_path):
+        command = [deckard_path.strip()]
+        if self.name is not None:
+            command += ["--start-line-number", str(self.start_line), "--end-line-number", str(self.end_line)]
+        command += [self.file_path, "-o", self.vector_path]
+        return command
+
     def generate_deckard_vec(self):
         error_log = definitions.DIRECTORY_TMP + "/deckard_error_log"
-        if self.name is None:
-            command = "echo " + self.vector_path + " >> " + error_log + "; " + \
-                      Vector.deckard_path + " " + self.file_path + " -o " + \
-                      self.vector_path + " 2> " + error_log
-        else:
+        if self.name is not None:
             current = "\t\t" + self.name + " " + str(self.start_line) + "-" + \
                       str(self.end_line)
             emitter.information("generating vector for " + str(current))
@@ -54,31 +138,19 @@ class Vector:
             self.start_line = start_line
             self.end_line = end_line
 
-            command = "echo " + self.vector_path + "\n >> " + error_log + "; "
-            command += Vector.deckard_path + " --start-line-number " + \
-                       str(self.start_line) + " --end-line-number " + str(self.end_line) + \
-                       " " + self.file_path + " -o " + self.vector_path + \
-                       " 2> " + error_log
-
+        command = self.get_deckard_command(Vector.deckard_path)
+        c1 = list()
         try:
-            execute_command(command)
+            emitter.command(" ".join(command))
+            runner.run(command, "deckard", runner.CAPTURE, error_log)
         except Exception as exception:
             error_exit(exception, "Error with Deckard vector generation. Exiting...")
 
         if not os.path.isfile(self.vector_path):
-            error_log = definitions.DIRECTORY_TMP + "/deckard_error_log"
-            if self.name is None:
-                c1 = "echo " + self.vector_path + " >> output/errors; " + \
-                     Vector.deckard_path_2 + " " + self.file_path + " -o " + \
-                     self.vector_path + " 2> output/errors"
-            else:
-                c1 = "echo " + self.vector_path + "\n >>  output/errors; "
-                c1 += Vector.deckard_path_2 + " --start-line-number " + \
-                      str(self.start_line) + " --end-line-number " + \
-                      str(self.end_line) + " " + self.file_path + " -o " + \
-                      self.vector_path + " 2> output/errors"
+            c1 = self.get_deckard_command(Vector.deckard_path_2)
             try:
-                execute_command(c1, False)
+                emitter.command(" ".join(c1))
+                runner.run(c1, "deckard", None, "output/errors")
             except Exception as e:
                 error_exit(e, "Error with Deckard vector generation. Exiting...")
 
@@ -86,7 +158,7 @@ class Vector:
             emitter.warning("Deckard fail. The vector file was not generated:")
             emitter.warning(self.vector_path + "\n")
             with open('output/reproduce_errors', 'a') as file:
-                file.write(command + "\n" + c1 + "\n")
+                file.write(" ".join(command) + "\n" + " ".join(c1) + "\n")
             return None
 
         with open(self.vector_path, 'r') as vec_file:
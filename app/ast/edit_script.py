@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+''' Parsed representation of AST edit scripts '''
+
+import re
+from app.common import definitions
+
+NODE_PATTERN = re.compile(r"([^\s()]+)\((\d+)\)")
+
+
+class EditOperation:
+
+    def __init__(self, kind, node_type, node_id, target_type=None, target_id=None, position=None, line=None):
+        self.kind = kind
+        self.node_type = str(node_type)
+        self.node_id = int(node_id)
+        self.target_type = None if target_type is None else str(target_type)
+        self.target_id = None if target_id is None else int(target_id)
+        self.position = position
+        if line is None:
+            line = self.to_line()
+        self.line = line
+
+    @property
+    def node_str(self):
+        return str(self.node_type) + "(" + str(self.node_id) + ")"
+
+    @property
+    def target_str(self):
+        return str(self.target_type) + "(" + str(self.target_id) + ")"
+
+    def to_line(self):
+        if self.kind in [definitions.INSERT, definitions.MOVE, definitions.UPDATEMOVE]:
+            return self.kind + " " + self.node_str + definitions.INTO + self.target_str + \
+                   definitions.AT + str(self.position)
+        elif self.kind in [definitions.UPDATE, definitions.MATCH]:
+            return self.kind + " " + self.node_str + definitions.TO + self.target_str
+        elif self.kind == definitions.REPLACE:
+            return self.kind + " " + self.node_str + definitions.WITH + self.target_str
+        return self.kind + " " + self.node_str + "\n"
+
+    def __str__(self):
+        return self.line
+
+
+def parse_script_line(script_line):
+    kind = script_line.strip().split(" ")[0]
+    node_list = NODE_PATTERN.findall(script_line)
+    if not node_list:
+        return None
+    node_type, node_id = node_list[0]
+    target_type = None
+    target_id = None
+    position = None
+    if len(node_list) > 1:
+        target_type, target_id = node_list[1]
+    if definitions.AT in script_line:
+        position = int(script_line.split(definitions.AT)[-1])
+    return EditOperation(kind, node_type, node_id, target_type, target_id, position, script_line)
+
+
+class EditScript:
+
+    def __init__(self, script_lines):
+        self.operations = list()
+        self.kind_index = dict()
+        self.node_index = dict()
+        self.merge_cache = dict()
+        # id of an AST -> (AST, node index), the AST is held so its id cannot be reused while cached
+        self.node_index_cache = dict()
+        for script_line in script_lines:
+            operation = parse_script_line(script_line)
+            if operation is None:
+                continue
+            self.operations.append(operation)
+            if operation.kind not in self.kind_index:
+                self.kind_index[operation.kind] = list()
+            self.kind_index[operation.kind].append(operation)
+            node_key = (operation.kind, operation.node_id)
+            if node_key not in self.node_index:
+                self.node_index[node_key] = list()
+            self.node_index[node_key].append(operation)
+
+    def __iter__(self):
+        return iter(self.operations)
+
+    def __len__(self):
+        return len(self.operations)
+
+    def get_operations(self, kind):
+        return self.kind_index.get(kind, [])
+
+    def has_operation(self, kind, node_id, node_type=None):
+        for operation in self.node_index.get((kind, int(node_id)), []):
+            if node_type is None or operation.node_type == str(node_type):
+                return True
+        return False
+
+    def get_node_index(self, ast_node):
+        cache_key = id(ast_node)
+        if cache_key not in self.node_index_cache:
+            self.node_index_cache[cache_key] = (ast_node, build_node_index(ast_node))
+        return self.node_index_cache[cache_key][1]
+
+
+def load_script(ast_script):
+    if isinstance(ast_script, EditScript):
+        return ast_script
+    return EditScript(ast_script)
+
+
+def build_node_index(ast_node):
+    node_index = dict()
+    node_list = [ast_node]
+    while node_list:
+        node = node_list.pop()
+        node_index[int(node['id'])] = node
+        node_list.extend(node['children'])
+    return node_index
+
+
+def get_child_id_list(ast_node):
+    id_list = set()
+    node_list = list(ast_node['children'])
+    while node_list:
+        node = node_list.pop()
+        id_list.add(int(node['id']))
+        node_list.extend(node['children'])
+    return id_list
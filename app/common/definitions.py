@@ -24,6 +24,7 @@ FILE_ERROR_LOG = DIRECTORY_MAIN +  "/log-error"
 FILE_STANDARD_FUNCTION_LIST = DIRECTORY_DATA + "/standard-function-list"
 FILE_STANDARD_MACRO_LIST = DIRECTORY_DATA + "/standard-macro-list"
 FILE_STANDARD_DATATYPE_LIST = DIRECTORY_DATA + "/standard-data-type-list"
+FILE_LLM_CACHE = DIRECTORY_OUTPUT_BASE + "/llm-cache.db"
 
 FILE_AST_SCRIPT = DIRECTORY_TMP + "/ast-script"
 FILE_TEMP_DIFF = DIRECTORY_TMP + "/temp_diff"
@@ -57,6 +58,9 @@ FILE_NAMESPACE_MAP_GLOBAL = ""
 FILE_SCRIPT_INFO = ""
 FILE_MACRO_DEF = ""
 FILE_FUNCTION_TRIPLETS = ""
+FILE_FUNCTION_TRIPLETS_STREAM = ""
+FILE_SLICE_STORE = ""
+FILE_STATE_STORE = ""
 
 FILE_AST_MAP_LOCAL = ""
 FILE_AST_MAP_GLOBAL = ""
@@ -66,19 +70,7 @@ FILE_COMPARISON_RESULT = ""
 FILE_TEMP_FIX = ""
 
 FILE_PROJECT = ""
-FILE_PROJECT_A = ""
-FILE_PROJECT_B = ""
-FILE_PROJECT_C = ""
-FILE_PROJECT_D = ""
 FILE_PROJECT_E = ""
-FILE_VAR_MAP_STORE = ""
-FILE_VEC_MAP_STORE = ""
-FILE_SOURCE_MAP_STORE = ""
-FILE_MISSING_FUNCTIONS = ""
-FILE_MISSING_MACROS = ""
-FILE_MISSING_HEADERS = ""
-FILE_MISSING_TYPES = ""
-FILE_SEGMENT_STATE = ""
 FILE_ORIG_N = ""
 FILE_PORT_N = ""
 FILE_TRANS_N = ""
@@ -111,6 +103,11 @@ CONF_LINUX_KERNEL = "linux-kernel:"
 CONF_BACKPORT = "backport:"
 CONF_CONTEXT_LEVEL = "context_level:"
 CONF_TAG_ID = "tag_id:"
+CONF_DIFF_MODE = "diff_mode:"
+CONF_PROJECT_D_MODE = "project_d_mode:"
+CONF_WORKERS = "workers:"
+CONF_RESUME = "resume:"
+CONF_COMMAND_TIMEOUT = "command_timeout:"
 
 
 # ----------------- KEY DEFINITIONS -------------------
@@ -2,10 +2,9 @@
 
 import os
 import sys
-import subprocess
-import pickle
+import shlex
 import shutil
-from app.tools import emitter
+from app.tools import emitter, slice_store, file_index, state_store, runner
 from app.common import definitions, values
 
 
@@ -21,56 +20,21 @@ def get_type(node_ref):
     return node_ref.split("(")[0]
 
 
-def execute_command(command, show_output=True):
+def execute_command(command, show_output=True, tool=None, timeout=None):
     # Print executed command and execute it in console
     emitter.command(command)
-    command = "{ " + command + " ;} 2> " + definitions.FILE_ERROR_LOG
-    if not show_output:
-        command += " > /dev/null"
-    # print(command)
-    process = subprocess.Popen([command], stdout=subprocess.PIPE, shell=True)
-    (output, error) = process.communicate()
+    stdout = runner.CAPTURE if show_output else None
+    result = runner.run_shell(command, tool, stdout, definitions.FILE_ERROR_LOG, timeout)
     # out is the output of the command, and err is the exit value
-    return str(process.returncode)
-
-
-def save_current_state():
-    pickle.dump(values.Project_A, open(definitions.FILE_PROJECT_A, 'wb'))
-    pickle.dump(values.Project_B, open(definitions.FILE_PROJECT_B, 'wb'))
-    pickle.dump(values.Project_C, open(definitions.FILE_PROJECT_C, 'wb'))
-    pickle.dump(values.Project_D, open(definitions.FILE_PROJECT_D, 'wb'))
-
-    segment_state = [values.IS_STRUCT, values.IS_ENUM, values.IS_MACRO, values.IS_TYPEDEC, values.IS_FUNCTION]
-    pickle.dump(segment_state, open(definitions.FILE_SEGMENT_STATE, 'wb'))
-    pickle.dump(values.data_type_map, open(definitions.FILE_DATATYPE_MAP, 'wb'))
-    pickle.dump(values.map_namespace_global, open(definitions.FILE_VAR_MAP_STORE, 'wb'))
-    pickle.dump(values.VECTOR_MAP, open(definitions.FILE_VEC_MAP_STORE, 'wb'))
-    pickle.dump(values.SOURCE_MAP, open(definitions.FILE_SOURCE_MAP_STORE, 'wb'))
-    pickle.dump(values.missing_header_list, open(definitions.FILE_MISSING_HEADERS, 'wb'))
-    pickle.dump(values.missing_macro_list, open(definitions.FILE_MISSING_MACROS, 'wb'))
-    pickle.dump(values.missing_function_list, open(definitions.FILE_MISSING_FUNCTIONS, 'wb'))
-    pickle.dump(values.missing_data_type_list, open(definitions.FILE_MISSING_TYPES, 'wb'))
-
-
-def load_state():
-    values.Project_A = pickle.load(open(definitions.FILE_PROJECT_A, 'rb'))
-    values.Project_B = pickle.load(open(definitions.FILE_PROJECT_B, 'rb'))
-    values.Project_C = pickle.load(open(definitions.FILE_PROJECT_C, 'rb'))
-    values.Project_D = pickle.load(open(definitions.FILE_PROJECT_D, 'rb'))
-    values.map_namespace_global = pickle.load(open(definitions.FILE_VAR_MAP_STORE, 'rb'))
-    values.VECTOR_MAP = pickle.load(open(definitions.FILE_VEC_MAP_STORE, 'rb'))
-    values.SOURCE_MAP = pickle.load(open(definitions.FILE_SOURCE_MAP_STORE, 'rb'))
-    values.missing_function_list = pickle.load(open(definitions.FILE_MISSING_FUNCTIONS, 'rb'))
-    values.missing_data_type_list = pickle.load(open(definitions.FILE_MISSING_TYPES, 'rb'))
-    values.missing_macro_list = pickle.load(open(definitions.FILE_MISSING_MACROS, 'rb'))
-    values.missing_header_list = pickle.load(open(definitions.FILE_MISSING_HEADERS, 'rb'))
-    values.data_type_map = pickle.load(open(definitions.FILE_DATATYPE_MAP, 'rb'))
-    segment_state = pickle.load(open(definitions.FILE_SEGMENT_STATE, 'rb'))
-    values.IS_STRUCT = segment_state[0]
-    values.IS_ENUM = segment_state[1]
-    values.IS_MACRO = segment_state[2]
-    values.IS_TYPEDEC = segment_state[3]
-    values.IS_FUNCTION = segment_state[4]
+    return str(result.return_code)
+
+
+def save_current_state(key_list=None):
+    state_store.save_state(key_list)
+
+
+def load_state(key_list=None):
+    state_store.load_state(key_list)
 
 
 def error_exit(*args):
@@ -80,22 +44,20 @@ def error_exit(*args):
     raise Exception("Error. Exiting...")
 
 
+def write_file_list(file_list, output):
+    with open(output, 'w') as output_file:
+        for file_path in file_list:
+            output_file.write(file_path + "\n")
+
+
 def find_files(src_path, extension, output, regex):
     # Save paths to all files in src_path with extension extension to output
-    find_command = "find " + src_path + " -name '" + extension + "' "
-    if regex is not None:
-        find_command += " | grep '" + regex + "' "
-    find_command += " > " + output
-    execute_command(find_command)
+    write_file_list(file_index.find_files(src_path, extension, regex), output)
 
 
 def find_file_using_path(src_path, partial_path, output, regex):
     # Save paths to all files in src_path with extension extension to output
-    find_command = "find " + src_path + " -path '" + partial_path + "' "
-    if regex is not None:
-        find_command += " | grep '" + regex + "' "
-    find_command += " > " + output
-    execute_command(find_command)
+    write_file_list(file_index.find_file_using_path(src_path, partial_path, regex), output)
 
 
 def clean_files():
@@ -120,20 +82,9 @@ def clean_files():
 
 
 def get_file_extension_list(src_path, output_file_name):
-    extensions = set()
-    find_command = "find " + src_path + " -type f -not -name '*\.cc' -not -name '*\.h'" + \
-        " > " + output_file_name
-    execute_command(find_command)
-    with open(output_file_name, 'r') as f:
-        a = f.readline().strip()
-        while(a):
-            a = a.split("/")[-1]
-            if "." in a:
-                extensions.add("*." + a.split(".")[-1])
-            else:
-                extensions.add(a)
-            a = f.readline().strip()
-    return extensions
+    exclude_pattern_list = ['*.cc', '*.h']
+    write_file_list(file_index.find_regular_files(src_path, exclude_pattern_list), output_file_name)
+    return file_index.get_extension_list(src_path, exclude_pattern_list)
 
 
 def backup_file(file_path, backup_name):
@@ -240,6 +191,7 @@ def is_intersect(start, end, start2, end2):
 def backup_file_orig(file_path):
     # backup_command = "cp " + file_path + " " + file_path + ".orig"
     if os.path.isfile(file_path):
+        runner.break_link(file_path + ".orig")
         shutil.copyfile(file_path, file_path + ".orig")
     # os.system(backup_command)
     # execute_command(backup_command)
@@ -249,6 +201,7 @@ def replace_file(file_a, file_b):
     # replace_command = "cp " + file_a + " " + file_b
     # os.system(replace_command)
     if os.path.isfile(file_a):
+        runner.break_link(file_b)
         shutil.copyfile(file_a, file_b)
     # execute_command(replace_command)
 
@@ -257,6 +210,7 @@ def restore_file_orig(file_path):
     # restore_command = "cp " + file_path + ".orig " + file_path
     # os.system(restore_command)
     if os.path.isfile(file_path + ".orig"):
+        runner.break_link(file_path)
         shutil.copyfile(file_path + ".orig", file_path)
     # execute_command(restore_command)
 
@@ -282,7 +236,11 @@ def get_identifier_from_slice(slice_path):
 def shift_per_slice(slice_file):
     vector_source = get_source_name_from_slice(slice_file)
     backup_file_orig(vector_source)
-    replace_file(slice_file, vector_source)
+    slice_content = slice_store.read_slice(slice_file)
+    if slice_content is not None:
+        runner.break_link(vector_source)
+        with open(vector_source, 'w') as source_file:
+            source_file.write(slice_content)
 
 
 def shift_slice_source(slice_file_a, slice_file_c):
@@ -331,21 +289,19 @@ def generate_map_gumtree(file_a, file_b, output_file):
     emitter.normal("\ttarget: " + file_b)
     emitter.normal("\tgenerating ast map")
     try:
-        extra_arg = ""
-        if file_a[-1] == 'h':
-            extra_arg = " --"
-        generate_command = definitions.DIFF_COMMAND + " -s=" + definitions.DIFF_SIZE + " -dump-matches "
+        generate_command = [definitions.DIFF_COMMAND.strip(), "-s=" + definitions.DIFF_SIZE, "-dump-matches"]
         if values.DONOR_REQUIRE_MACRO:
-            generate_command += " " + values.DONOR_PRE_PROCESS_MACRO + " "
+            generate_command += shlex.split(values.DONOR_PRE_PROCESS_MACRO)
             if values.CONF_PATH_B in file_b:
-                generate_command += " " + values.DONOR_PRE_PROCESS_MACRO.replace("--extra-arg-a", "--extra-arg-c") + " "
+                generate_command += shlex.split(values.DONOR_PRE_PROCESS_MACRO.replace("--extra-arg-a", "--extra-arg-c"))
         if values.TARGET_REQUIRE_MACRO:
             if values.CONF_PATH_C in file_b:
-                generate_command += " " + values.TARGET_PRE_PROCESS_MACRO + " "
-        generate_command += file_a + " " + file_b + extra_arg + " 2> output/errors_clang_diff "
-        # command += "| grep '^Match ' "
-        generate_command += " > " + output_file
-        execute_command(generate_command, False)
+                generate_command += shlex.split(values.TARGET_PRE_PROCESS_MACRO)
+        generate_command += [file_a, file_b]
+        if file_a[-1] == 'h':
+            generate_command.append("--")
+        emitter.command(" ".join(generate_command))
+        runner.run(generate_command, "gumtree", output_file, "output/errors_clang_diff")
     except Exception as e:
         error_exit(e, "Unexpected fail at generating map: " + output_file)
 
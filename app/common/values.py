@@ -81,6 +81,11 @@ CONF_KLEE_FLAG_C = ""
 FILE_CONFIGURATION = ""
 CONF_AST_DIFF_SIZE = ""
 CONF_VC = ""
+CONF_DIFF_MODE = ""
+CONF_PROJECT_D_MODE = "link"
+CONF_WORKERS = 0
+CONF_RESUME = False
+CONF_COMMAND_TIMEOUT = 0
 CONF_USE_CACHE = False
 CONF_TAG_ID = None
 CONF_CONTEXT_LEVEL = -1
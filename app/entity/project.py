@@ -3,10 +3,13 @@
 import os
 from app.common.utilities import error_exit
 from app.tools import emitter
+from app.ast import ast_vector
 
 
 class Project:
-    
+    __slots__ = ("path", "name", "function_list", "struct_list", "macro_list", "def_list", "decl_list",
+                 "enum_list", "type_def_list", "header_list", "definition_list", "symbol_table", "vector_matrix")
+
     def __init__(self, path, name):
         emitter.information("creating project for " + path)
         if not (os.path.isdir(path)):
@@ -24,3 +27,23 @@ class Project:
         self.type_def_list = dict()
         self.header_list = dict()
         self.definition_list = dict()
+        self.symbol_table = None
+        # the vectors of every segment kind share one matrix
+        self.vector_matrix = ast_vector.VectorMatrix()
+
+    def get_segment_list(self, segment_type):
+        return {
+            "func": self.function_list,
+            "struct": self.struct_list,
+            "var": self.decl_list,
+            "macro": self.macro_list,
+            "enum": self.enum_list
+        }[segment_type]
+
+    def add_vector(self, segment_type, source_file, segment_name, start_line, end_line, is_deckard=True):
+        segment_list = self.get_segment_list(segment_type)
+        if source_file not in segment_list:
+            segment_list[source_file] = dict()
+        vector = ast_vector.Vector(source_file, segment_name, start_line, end_line, is_deckard, self.vector_matrix)
+        segment_list[source_file][segment_name] = vector
+        return vector
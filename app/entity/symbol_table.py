@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import os
+from app.tools import extractor, converter
+from app.ast import ast_generator
+
+
+class TranslationUnit:
+
+    def __init__(self, source_path):
+        self.source_path = source_path
+        # function name -> number of children of its signature node
+        self.function_list = dict()
+        self.type_list = dict()
+        self.global_list = set()
+        # function name -> set of labels
+        self.label_list = dict()
+        # filled on first use, it needs a clang run
+        self.macro_list = None
+
+
+class SymbolTable:
+
+    def __init__(self, use_macro=False):
+        self.use_macro = use_macro
+        self.unit_list = dict()
+
+    def build_unit(self, source_path, ast_tree=None):
+        source_path = os.path.normpath(source_path)
+        unit = TranslationUnit(source_path)
+        if ast_tree is None:
+            ast_tree = ast_generator.get_ast_json(source_path, self.use_macro)
+        if ast_tree:
+            for function_name, function_node in extractor.extract_function_node_list(ast_tree).items():
+                signature_size = 0
+                if function_node['children']:
+                    signature_size = len(function_node['children'][0]['children'])
+                unit.function_list[function_name] = signature_size
+                if len(function_node['children']) > 1:
+                    unit.label_list[function_name] = set(extractor.extract_label_node_list(function_node).keys())
+            unit.type_list = extractor.extract_typedef_node_list(ast_tree)
+            unit.global_list = set(extractor.extract_decl_node_list_global(ast_tree).keys())
+        self.unit_list[source_path] = unit
+        return unit
+
+    def get_unit(self, source_path, ast_tree=None):
+        source_path = os.path.normpath(source_path)
+        if source_path not in self.unit_list:
+            self.build_unit(source_path, ast_tree)
+        return self.unit_list[source_path]
+
+    def get_function_list(self, source_path, ast_tree=None):
+        return self.get_unit(source_path, ast_tree).function_list
+
+    def get_type_list(self, source_path, ast_tree=None):
+        return self.get_unit(source_path, ast_tree).type_list
+
+    def get_global_list(self, source_path, ast_tree=None):
+        return self.get_unit(source_path, ast_tree).global_list
+
+    def get_label_list(self, source_path, function_name, ast_tree=None):
+        return self.get_unit(source_path, ast_tree).label_list.get(function_name, set())
+
+    def get_macro_list(self, source_path, ast_tree=None):
+        unit = self.get_unit(source_path, ast_tree)
+        if unit.macro_list is None:
+            macro_def_list = extractor.extract_macro_definitions(unit.source_path)
+            unit.macro_list = set(converter.convert_macro_list_to_dict(macro_def_list).keys())
+        return unit.macro_list
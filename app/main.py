@@ -3,7 +3,7 @@
 
 
 import os
-from app.tools import emitter, configuration
+from app.tools import emitter, configuration, slice_store, state_store, runner
 from app.phases import differencing, detection, slicing
 from app.common import definitions, values, utilities
 
@@ -15,30 +15,11 @@ def clean_data():
 
 
 def create_files():
-    definitions.FILE_PROJECT_A = definitions.DIRECTORY_OUTPUT + "/project-A"
-    open(definitions.FILE_PROJECT_A, 'a').close()
-    definitions.FILE_PROJECT_B = definitions.DIRECTORY_OUTPUT + "/project-B"
-    open(definitions.FILE_PROJECT_B, 'a').close()
-    definitions.FILE_PROJECT_C = definitions.DIRECTORY_OUTPUT + "/project-C"
-    open(definitions.FILE_PROJECT_C, 'a').close()
-    definitions.FILE_PROJECT_D = definitions.DIRECTORY_OUTPUT + "/project-D"
-    open(definitions.FILE_PROJECT_D, 'a').close()
-    definitions.FILE_VAR_MAP_STORE = definitions.DIRECTORY_OUTPUT + "/var-map-store"
-    open(definitions.FILE_VAR_MAP_STORE, 'a').close()
-    definitions.FILE_DATATYPE_MAP = definitions.DIRECTORY_OUTPUT + "/datatype-map"
-    open(definitions.FILE_DATATYPE_MAP, 'a').close()
-    definitions.FILE_VEC_MAP_STORE = definitions.DIRECTORY_OUTPUT + "/vec-map-store"
-    open(definitions.FILE_VEC_MAP_STORE, 'a').close()
-    definitions.FILE_SOURCE_MAP_STORE = definitions.DIRECTORY_OUTPUT + "/source-map-store"
-    open(definitions.FILE_SOURCE_MAP_STORE, 'a').close()
-    definitions.FILE_MISSING_FUNCTIONS = definitions.DIRECTORY_OUTPUT + "/missing-functions"
-    open(definitions.FILE_MISSING_FUNCTIONS, 'a').close()
-    definitions.FILE_MISSING_HEADERS = definitions.DIRECTORY_OUTPUT + "/missing-headers"
-    open(definitions.FILE_MISSING_HEADERS, 'a').close()
-    definitions.FILE_MISSING_MACROS = definitions.DIRECTORY_OUTPUT + "/missing-macros"
-    open(definitions.FILE_MISSING_MACROS, 'a').close()
-    definitions.FILE_MISSING_TYPES = definitions.DIRECTORY_OUTPUT + "/missing-types"
-    open(definitions.FILE_MISSING_TYPES, 'a').close()
+    definitions.FILE_STATE_STORE = definitions.DIRECTORY_OUTPUT + "/state.db"
+    state_store.open_store(definitions.FILE_STATE_STORE, reset=not values.CONF_RESUME)
+
+    definitions.FILE_SLICE_STORE = definitions.DIRECTORY_OUTPUT + "/slice-store"
+    slice_store.open_store(definitions.FILE_SLICE_STORE, reset=not values.CONF_RESUME)
 
     if values.CONF_PATH_E:
         definitions.FILE_PROJECT_E = definitions.DIRECTORY_OUTPUT + "/project-E"
@@ -59,6 +40,18 @@ def create_directories():
         os.makedirs(definitions.DIRECTORY_OUTPUT_BASE)
 
 
+def create_gemini_prefetcher():
+    # model requests start on the first triplets instead of waiting for function-triplets.json
+    try:
+        from app.tools.gemini_integration import create_prefetcher
+        return create_prefetcher()
+    except ImportError:
+        return None
+    except Exception as e:
+        emitter.warning("Gemini prefetch disabled: " + str(e))
+        return None
+
+
 def run(config_file_path):
     create_directories()
 
@@ -73,7 +66,13 @@ def run(config_file_path):
     # Extract function triplets after all slice files are created
     try:
         from app.tools import function_extractor
-        function_extractor.process_and_save_function_triplets()
+        prefetcher = create_gemini_prefetcher()
+        try:
+            function_extractor.process_and_save_function_triplets(
+                None if prefetcher is None else prefetcher.submit)
+        finally:
+            if prefetcher is not None:
+                prefetcher.finish()
     except ImportError:
         emitter.error("Function extractor not available")
     except Exception as e:
@@ -105,7 +104,8 @@ def main():
             emitter.title("Gemini AI Patch Generation")
             from app.tools.gemini_integration import integrate_gemini_patch_generation
             patches_file = integrate_gemini_patch_generation(
-                output_dir=definitions.DIRECTORY_OUTPUT
+                output_dir=definitions.DIRECTORY_OUTPUT,
+                resume=values.CONF_RESUME
             )
             emitter.sub_title("Gemini patch generation completed")
             emitter.normal("Generated patches saved to: " + patches_file)
@@ -124,4 +124,5 @@ def main():
     finally:
         # Final running time and exit message
         utilities.restore_slice_source()
+        runner.print_stats()
 
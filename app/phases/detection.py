@@ -5,10 +5,12 @@
 import time
 from app.common.utilities import error_exit, save_current_state, load_state
 from app.common import definitions, values
-from app.tools import generator, emitter, reader, detector, writer
+from app.tools import generator, emitter, reader, detector, writer, fingerprint, state_store
 
 segment_clone_list = dict()
 file_clone_list = dict()
+# state store records changed by this phase: vectors of the target and the clone maps
+CHANGED_STATE_KEY_LIST = ["project-c", "vec-map", "source-map"]
 
 
 def generate_target_vectors():
@@ -50,6 +52,7 @@ def load_values():
     definitions.FILE_AST_MAP = definitions.DIRECTORY_OUTPUT + "/ast-map"
     definitions.FILE_SOURCE_MAP = definitions.DIRECTORY_OUTPUT + "/source-map"
     definitions.FILE_FUNCTION_TRIPLETS = definitions.DIRECTORY_OUTPUT + "/function-triplets.json"
+    definitions.FILE_FUNCTION_TRIPLETS_STREAM = definitions.DIRECTORY_OUTPUT + "/function-triplets.jsonl"
 
 
 def save_values():
@@ -61,7 +64,7 @@ def save_values():
     else:
         values.file_list_to_patch = file_clone_list
     writer.write_as_json(values.file_list_to_patch, definitions.FILE_LIST_PATCH_FILES)
-    save_current_state()
+    save_current_state(CHANGED_STATE_KEY_LIST)
 
 
 def safe_exec(function_def, title, *args):
@@ -82,10 +85,30 @@ def safe_exec(function_def, title, *args):
     return result
 
 
+def restore_values():
+    global segment_clone_list
+    segment_clone_list = [tuple(clone_info) for clone_info in reader.read_json(definitions.FILE_CLONE_INFO)]
+    if values.DEFAULT_OPERATION_MODE in [0, 3]:
+        values.file_list_to_patch = segment_clone_list
+    else:
+        values.file_list_to_patch = reader.read_json(definitions.FILE_LIST_PATCH_FILES)
+
+
 def start():
     emitter.title("Clone Detection")
     load_values()
-    
+    input_list = [definitions.FILE_DIFF_INFO]
+    output_list = [definitions.FILE_CLONE_INFO, definitions.FILE_LIST_PATCH_FILES,
+                   state_store.get_snapshot_file(definitions.PHASE_DETECTION)]
+    is_current, digest = fingerprint.check_phase(definitions.PHASE_DETECTION, input_list, output_list,
+                                                 [values.CONF_PATH_C])
+    if is_current and state_store.load_snapshot(definitions.PHASE_DETECTION):
+        restore_values()
+        emitter.success("\n\tInputs unchanged, reusing clone detection of previous run")
+        return
+
     safe_exec(generate_target_vectors, "generating vectors for target")
     safe_exec(find_segment_clones, "finding segment clones in target")
     save_values()
+    state_store.save_snapshot(definitions.PHASE_DETECTION)
+    fingerprint.record_phase(definitions.PHASE_DETECTION, digest, output_list)
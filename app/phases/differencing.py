@@ -6,7 +6,7 @@ import time
 from app.common.utilities import error_exit, save_current_state, clear_values
 from app.common import definitions, values
 from app.tools import merger, identifier
-from app.tools import generator, differ, emitter, writer
+from app.tools import generator, differ, emitter, writer, reader, fingerprint, state_store
 
 FILE_EXCLUDED_EXTENSIONS = ""
 FILE_EXCLUDED_EXTENSIONS_A = ""
@@ -18,6 +18,8 @@ FILE_AST_SCRIPT = ""
 FILE_AST_DIFF_ERROR = ""
 
 diff_info = dict()
+# state store records changed by this phase: segments of the donor and the segment flags
+CHANGED_STATE_KEY_LIST = ["project-a", "segment-state"]
 
 
 def segment_code():
@@ -49,12 +51,18 @@ def analyse_source_diff():
     emitter.sub_sub_title("analysing changed code lines")
     diff_info_c = dict()
     diff_info_h = dict()
-    if diff_c_file_list:
-        emitter.normal("\t\tcollecting diff line information for C/CPP files")
-        diff_info_c = differ.diff_line(diff_c_file_list, definitions.FILE_TEMP_DIFF)
-    if diff_h_file_list:
-        emitter.normal("\t\tcollecting diff line information for header files")
-        diff_info_h = differ.diff_line(diff_h_file_list, definitions.FILE_TEMP_DIFF)
+    if values.CONF_DIFF_MODE == "git":
+        emitter.normal("\t\tcollecting diff line information for changed files")
+        diff_info_c = differ.diff_line_git(diff_c_file_list + diff_h_file_list,
+                                           values.CONF_PATH_A,
+                                           values.CONF_PATH_B)
+    else:
+        if diff_c_file_list:
+            emitter.normal("\t\tcollecting diff line information for C/CPP files")
+            diff_info_c = differ.diff_line(diff_c_file_list, definitions.FILE_TEMP_DIFF)
+        if diff_h_file_list:
+            emitter.normal("\t\tcollecting diff line information for header files")
+            diff_info_h = differ.diff_line(diff_h_file_list, definitions.FILE_TEMP_DIFF)
     diff_info = merger.merge_diff_info(diff_info_c, diff_info_h)
     for diff_loc in diff_info:
         diff_loc_info = diff_info[diff_loc]
@@ -100,21 +108,30 @@ def load_values():
     definitions.FILE_TEMP_DIFF = definitions.DIRECTORY_OUTPUT + "/temp_diff"
     definitions.FILE_AST_DIFF_ERROR = definitions.DIRECTORY_OUTPUT + "/errors_ast_diff"
     definitions.FILE_ORIG_N = definitions.DIRECTORY_OUTPUT + "/n-orig"
-    definitions.FILE_SEGMENT_STATE = definitions.DIRECTORY_OUTPUT + "/seg-state"
 
 
 def save_values():
     writer.write_as_json(diff_info, definitions.FILE_DIFF_INFO)
-    save_current_state()
+    save_current_state(CHANGED_STATE_KEY_LIST)
 
 
 def start():
+    global diff_info
     emitter.title("Analysing Changes")
     load_values()
-    
+    output_list = [definitions.FILE_DIFF_INFO, state_store.get_snapshot_file(definitions.PHASE_DIFF)]
+    is_current, digest = fingerprint.check_phase(definitions.PHASE_DIFF, [], output_list,
+                                                 [values.CONF_PATH_A, values.CONF_PATH_B])
+    if is_current and state_store.load_snapshot(definitions.PHASE_DIFF):
+        diff_info = reader.read_json(definitions.FILE_DIFF_INFO)
+        emitter.success("\n\tInputs unchanged, reusing diff analysis of previous run")
+        return
+
     safe_exec(analyse_source_diff, "analysing source diff")
     safe_exec(segment_code, "segmentation of code")
     save_values()
+    state_store.save_snapshot(definitions.PHASE_DIFF)
+    fingerprint.record_phase(definitions.PHASE_DIFF, digest, output_list)
 
 
 
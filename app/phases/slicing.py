@@ -5,7 +5,10 @@
 import time
 from app.common.utilities import error_exit
 from app.common import values, definitions, utilities
-from app.tools import slicer, emitter, reader
+from app.tools import slicer, emitter, reader, parallel, slice_store, fingerprint, state_store
+
+# state store records changed by this phase
+CHANGED_STATE_KEY_LIST = []
 
 
 def fix_definitions(file_list_to_patch):
@@ -24,9 +27,61 @@ def fix_definitions(file_list_to_patch):
             error_exit("something went wrong with slicing phase")
 
 
+def add_slice_request(slice_request_list, source_path, segment_code, segment_identifier, use_macro):
+    request_key = (source_path, bool(use_macro))
+    if request_key not in slice_request_list:
+        slice_request_list[request_key] = list()
+    slice_request_list[request_key].append((segment_code, segment_identifier))
+
+
+def slice_source_batch(source_path, request_list):
+    # one worker owns a source file, its macro variants are sliced one after another
+    segment_info_list = list()
+    for use_macro, segment_list in request_list:
+        segment_info = slicer.extract_segments(source_path, segment_list, use_macro)
+        segment_info_list.append((use_macro, segment_info))
+    return source_path, segment_info_list
+
+
+def slice_requests(slice_request_list):
+    slice_result = dict()
+    source_request_list = dict()
+    for source_path, use_macro in slice_request_list:
+        segment_list = slice_request_list[(source_path, use_macro)]
+        for segment_key in segment_list:
+            slice_result[(source_path, use_macro) + segment_key] = True
+        pending_list = slicer.get_pending_segments(source_path, segment_list)
+        if not pending_list:
+            continue
+        for segment_key in pending_list:
+            slice_result[(source_path, use_macro) + segment_key] = False
+        if source_path not in source_request_list:
+            source_request_list[source_path] = list()
+        source_request_list[source_path].append((use_macro, pending_list))
+
+    result_list = list()
+    if source_request_list:
+        emitter.normal("\t\tslicing " + str(len(source_request_list)) + " source files in parallel")
+        slice_arg_list = [(source_path, source_request_list[source_path]) for source_path in source_request_list]
+        result_list = parallel.pool_map(slice_source_batch, slice_arg_list, chunk_size=1)
+
+    # slices are stored by the parent only, in submission order
+    segment_info_list = dict(result_list)
+    for source_path in source_request_list:
+        if source_path not in segment_info_list:
+            emitter.warning("\t\t[warning] slicing failed for " + source_path)
+            continue
+        for use_macro, segment_info in segment_info_list[source_path]:
+            segment_result = slicer.store_segments(segment_info)
+            for segment_key in segment_result:
+                slice_result[(source_path, use_macro) + segment_key] = segment_result[segment_key]
+    return slice_result
+
+
 def slice_code(file_list_to_patch):
     emitter.sub_sub_title("slicing unrelated segments")
-
+    segment_info_list = list()
+    slice_request_list = dict()
     for (vec_path_a, vec_path_c, var_map) in file_list_to_patch:
         segment_code = vec_path_a.split(".")[-2].split("_")[0]
         try:
@@ -52,25 +107,48 @@ def slice_code(file_list_to_patch):
 
             emitter.normal("\t\t" + segment_code + ": " + segment_identifier_a)
 
-            if values.DONOR_REQUIRE_MACRO:
-                values.PRE_PROCESS_MACRO = values.DONOR_PRE_PROCESS_MACRO
-            slicer.slice_source_file(vector_source_a, segment_code, segment_identifier_a, values.CONF_PATH_A, values.DONOR_REQUIRE_MACRO)
-            slicer.slice_source_file(vector_source_b, segment_code, segment_identifier_b, values.CONF_PATH_B, values.DONOR_REQUIRE_MACRO)
-
-            seg_found = slicer.slice_source_file(vector_source_c, segment_code, vector_name_c.replace(".vec", ""), values.CONF_PATH_C)
-
-            if not seg_found:
-                values.TARGET_REQUIRE_MACRO = True
-                values.PRE_PROCESS_MACRO = values.TARGET_PRE_PROCESS_MACRO
-                seg_found = slicer.slice_source_file(vector_source_c, segment_code, segment_identifier_c,
-                                                     values.CONF_PATH_C, values.TARGET_REQUIRE_MACRO)
-
-            slicer.slice_source_file(vector_source_d, segment_code, segment_identifier_d,
-                                     values.Project_D.path, values.TARGET_REQUIRE_MACRO)
-
+            add_slice_request(slice_request_list, vector_source_a, segment_code, segment_identifier_a,
+                              values.DONOR_REQUIRE_MACRO)
+            add_slice_request(slice_request_list, vector_source_b, segment_code, segment_identifier_b,
+                              values.DONOR_REQUIRE_MACRO)
+            add_slice_request(slice_request_list, vector_source_c, segment_code, vector_name_c.replace(".vec", ""),
+                              False)
+            segment_info_list.append((segment_code, vector_source_c, vector_name_c.replace(".vec", ""),
+                                      segment_identifier_c, vector_source_d, segment_identifier_d))
         except Exception as e:
             error_exit("something went wrong with slicing phase")
 
+    # every source file is parsed and read once for all of its segments
+    try:
+        slice_result = slice_requests(slice_request_list)
+    except Exception as e:
+        error_exit(e, "something went wrong with slicing phase")
+
+    # the macro mode of C and D is decided per clone pair
+    slice_request_list = dict()
+    is_macro_required = False
+    for segment_info in segment_info_list:
+        segment_code, vector_source_c, segment_name_c, segment_identifier_c, \
+            vector_source_d, segment_identifier_d = segment_info
+        target_require_macro = values.TARGET_REQUIRE_MACRO
+        seg_found = slice_result[(vector_source_c, False, segment_code, segment_name_c)]
+        if not seg_found:
+            target_require_macro = True
+            is_macro_required = True
+            add_slice_request(slice_request_list, vector_source_c, segment_code, segment_identifier_c,
+                              target_require_macro)
+        add_slice_request(slice_request_list, vector_source_d, segment_code, segment_identifier_d,
+                          target_require_macro)
+    try:
+        slice_requests(slice_request_list)
+    except Exception as e:
+        error_exit(e, "something went wrong with slicing phase")
+
+    # later phases analyse the target with macros once any segment needed them
+    if is_macro_required:
+        values.TARGET_REQUIRE_MACRO = True
+        values.PRE_PROCESS_MACRO = values.TARGET_PRE_PROCESS_MACRO
+
 
 def revert_definitions(file_list_to_patch):
     emitter.sub_sub_title("fixing changed definitions")
@@ -98,7 +176,8 @@ def load_values():
 
 
 def save_values():
-    utilities.save_current_state()
+    # slices go to the slice store, the state store records are left as they are
+    utilities.save_current_state(CHANGED_STATE_KEY_LIST)
 
 
 def safe_exec(function_def, title, *args):
@@ -122,6 +201,16 @@ def safe_exec(function_def, title, *args):
 def start():
     emitter.title("Slicing Source Files")
     load_values()
-    
+    input_list = [definitions.FILE_LIST_PATCH_FILES]
+    output_list = [definitions.FILE_SLICE_STORE, state_store.get_snapshot_file(definitions.PHASE_SLICING)]
+    is_current, digest = fingerprint.check_phase(definitions.PHASE_SLICING, input_list, output_list)
+    if is_current and state_store.load_snapshot(definitions.PHASE_SLICING):
+        emitter.success("\n\tInputs unchanged, reusing slices of previous run")
+        return
+
+    # slices recorded by an earlier run are not valid for the current inputs
+    slice_store.open_store(definitions.FILE_SLICE_STORE)
     safe_exec(slice_code, "slice segments", values.file_list_to_patch)
     save_values()
+    state_store.save_snapshot(definitions.PHASE_SLICING)
+    fingerprint.record_phase(definitions.PHASE_SLICING, digest, output_list)
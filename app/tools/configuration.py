@@ -1,7 +1,7 @@
 import os
 import shutil
 from app.common import definitions, values
-from app.tools import emitter
+from app.tools import emitter, runner
 from app.entity import project
 
 
@@ -17,6 +17,43 @@ def load_standard_list():
             values.STANDARD_DATATYPE_LIST.append(line[:-1] + " *")
 
 
+# files the pipeline writes next to the sources, Project D gets its own instead of sharing those of Project C
+GENERATED_PATTERN_LIST = ["*.AST", "*.vec", "*.orig", "*.slice"]
+
+
+def link_file(source_path, destination_path):
+    # share the inode with Project C, files are unlinked before being written (see runner.break_link)
+    try:
+        os.link(source_path, destination_path)
+    except OSError:
+        shutil.copy2(source_path, destination_path)
+    return destination_path
+
+
+def create_worktree(source_dir, patch_dir):
+    if not os.path.isdir(source_dir + "/.git") and not os.path.isfile(source_dir + "/.git"):
+        return False
+    worktree_command = ["git", "-C", source_dir, "worktree", "add", "--detach", "--force", patch_dir, "HEAD"]
+    return runner.run(worktree_command, "git").return_code == 0
+
+
+def create_project_d(source_dir, patch_dir):
+    project_d_mode = values.CONF_PROJECT_D_MODE
+    emitter.normal("\tcreating project D (" + project_d_mode + ")")
+    if project_d_mode == "worktree":
+        if create_worktree(source_dir, patch_dir):
+            return
+        emitter.warning("\t[warning] git worktree failed, linking project D instead")
+        if os.path.isdir(patch_dir):
+            shutil.rmtree(patch_dir)
+        project_d_mode = "link"
+    if project_d_mode == "copy":
+        shutil.copytree(source_dir, patch_dir)
+    else:
+        shutil.copytree(source_dir, patch_dir, copy_function=link_file,
+                        ignore=shutil.ignore_patterns(*GENERATED_PATTERN_LIST))
+
+
 def read_conf_file(config_file_path):
     emitter.normal("reading configuration file")
     if not os.path.exists(config_file_path):
@@ -84,6 +121,20 @@ def read_conf_file(config_file_path):
             values.CONF_EXPLOIT_C = configuration.replace(definitions.CONF_EXPLOIT_C, '')
         elif definitions.CONF_VC in configuration:
             values.CONF_VC = configuration.replace(definitions.CONF_VC, '')
+        elif definitions.CONF_DIFF_MODE in configuration:
+            values.CONF_DIFF_MODE = configuration.replace(definitions.CONF_DIFF_MODE, '').strip()
+        elif definitions.CONF_PROJECT_D_MODE in configuration:
+            values.CONF_PROJECT_D_MODE = configuration.replace(definitions.CONF_PROJECT_D_MODE, '').strip()
+        elif definitions.CONF_WORKERS in configuration:
+            values.CONF_WORKERS = int(configuration.replace(definitions.CONF_WORKERS, ''))
+        elif definitions.CONF_RESUME in configuration:
+            value = configuration.replace(definitions.CONF_RESUME, '')
+            if "true" in value:
+                values.CONF_RESUME = True
+            else:
+                values.CONF_RESUME = False
+        elif definitions.CONF_COMMAND_TIMEOUT in configuration:
+            values.CONF_COMMAND_TIMEOUT = int(configuration.replace(definitions.CONF_COMMAND_TIMEOUT, ''))
         elif definitions.CONF_CONTEXT_LEVEL in configuration:
             values.CONF_CONTEXT_LEVEL = int(configuration.replace(definitions.CONF_CONTEXT_LEVEL, ""))
         elif definitions.CONF_LINUX_KERNEL in configuration:
@@ -135,7 +186,7 @@ def update_configuration():
         if definitions.DIRECTORY_TESTS in patch_dir:
             shutil.rmtree(patch_dir)
     if not os.path.isdir(patch_dir):
-        shutil.copytree(values.CONF_PATH_C, values.CONF_PATH_C + "-patch")
+        create_project_d(values.CONF_PATH_C, patch_dir)
 
     input_dir = definitions.DIRECTORY_OUTPUT + "/fuzz-input"
     output_dir = definitions.DIRECTORY_OUTPUT + "/fuzz-output"
@@ -0,0 +1,211 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Persistent index of macro, type and function definitions with trigram lookup '''
+
+import os
+import re
+import pickle
+import hashlib
+from app.common import definitions
+from app.tools import file_index
+
+INDEX_VERSION = 2
+
+SOURCE_EXTENSION_LIST = ['*.h', '*.hh', '*.hpp', '*.hxx', '*.inc', '*.c', '*.cc', '*.cpp', '*.cxx']
+KEYWORD_LIST = ['if', 'for', 'while', 'switch', 'return', 'sizeof', 'else', 'case', 'do', 'defined']
+
+MACRO_PATTERN = re.compile(r"^\s*#\s*define\s+([A-Za-z_]\w*)")
+RECORD_PATTERN = re.compile(r"^\s*(?:typedef\s+)?(struct|enum|class|union)\s+(?:[A-Z_]+\s+)?([A-Za-z_]\w*)")
+TYPEDEF_START_PATTERN = re.compile(r"^\s*typedef\b")
+TYPEDEF_PATTERN = re.compile(r"\btypedef\b.*?([A-Za-z_]\w*)\s*(?:\[[^\]]*\])?\s*;")
+# typedef int (*handler_fn)(int);
+TYPEDEF_POINTER_PATTERN = re.compile(r"\btypedef\b.*?\(\s*[\*&^]\s*([A-Za-z_]\w*)\s*\)\s*\(")
+COMMENT_PATTERN = re.compile(r"//.*|/\*.*?(?:\*/|$)")
+TYPEDEF_CLOSE_PATTERN = re.compile(r"^\s*}\s*([A-Za-z_]\w*)\s*;")
+USING_PATTERN = re.compile(r"^\s*using\s+([A-Za-z_]\w*)\s*=")
+FUNCTION_PATTERN = re.compile(r"^(?:[A-Za-z_][\w:<>,\*&\s]*?[\s\*&:])?([A-Za-z_]\w*)\s*\(")
+
+index_list = dict()
+
+
+class DefinitionIndex:
+
+    def __init__(self, root_path):
+        self.root_path = root_path
+        # relative file -> (mtime, size, [(name, kind, line)])
+        self.file_list = dict()
+        # lower case name -> [(relative file, line, kind, name)]
+        self.name_map = dict()
+        self.trigram_map = dict()
+
+    def add_name(self, rel_path, name, kind, line_number):
+        name_key = name.lower()
+        if name_key not in self.name_map:
+            self.name_map[name_key] = list()
+            for trigram in get_trigram_list(name_key):
+                self.trigram_map.setdefault(trigram, set()).add(name_key)
+        self.name_map[name_key].append((rel_path, line_number, kind, name))
+
+    def remove_file(self, rel_path):
+        if rel_path not in self.file_list:
+            return
+        for name, kind, line_number in self.file_list[rel_path][2]:
+            name_key = name.lower()
+            if name_key not in self.name_map:
+                continue
+            entry_list = [entry for entry in self.name_map[name_key] if entry[0] != rel_path]
+            if entry_list:
+                self.name_map[name_key] = entry_list
+                continue
+            del self.name_map[name_key]
+            for trigram in get_trigram_list(name_key):
+                if trigram in self.trigram_map:
+                    self.trigram_map[trigram].discard(name_key)
+        del self.file_list[rel_path]
+
+    def index_file(self, rel_path, file_stat):
+        self.remove_file(rel_path)
+        definition_list = extract_definitions(os.path.join(self.root_path, rel_path))
+        self.file_list[rel_path] = (file_stat.st_mtime_ns, file_stat.st_size, definition_list)
+        for name, kind, line_number in definition_list:
+            self.add_name(rel_path, name, kind, line_number)
+
+    def refresh(self):
+        is_changed = False
+        prefix_length = len(self.root_path) + 1
+        current_list = set()
+        for file_path in file_index.find_regular_files(self.root_path):
+            file_name = file_path.split("/")[-1]
+            if "." not in file_name or "*." + file_name.split(".")[-1] not in SOURCE_EXTENSION_LIST:
+                continue
+            rel_path = file_path[prefix_length:]
+            if rel_path.startswith(".git/"):
+                continue
+            current_list.add(rel_path)
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                continue
+            if rel_path in self.file_list:
+                mtime, size, definition_list = self.file_list[rel_path]
+                if mtime == file_stat.st_mtime_ns and size == file_stat.st_size:
+                    continue
+            self.index_file(rel_path, file_stat)
+            is_changed = True
+        for rel_path in list(self.file_list):
+            if rel_path not in current_list:
+                self.remove_file(rel_path)
+                is_changed = True
+        if is_changed:
+            save_index(self)
+
+    def search(self, query):
+        query_key = query.lower()
+        trigram_list = get_trigram_list(query_key)
+        if trigram_list:
+            candidate_list = None
+            for trigram in trigram_list:
+                name_list = self.trigram_map.get(trigram, set())
+                candidate_list = set(name_list) if candidate_list is None else candidate_list & name_list
+                if not candidate_list:
+                    return []
+        else:
+            candidate_list = self.name_map.keys()
+        result_list = list()
+        for name_key in candidate_list:
+            if query_key in name_key:
+                result_list.extend(self.name_map[name_key])
+        return sorted(result_list)
+
+
+def get_trigram_list(text):
+    return set(text[index:index + 3] for index in range(len(text) - 2))
+
+
+def extract_definitions(file_path):
+    definition_list = list()
+    is_typedef_open = False
+    try:
+        with open(file_path, 'r', errors='replace') as source_file:
+            for line_number, source_line in enumerate(source_file, 1):
+                if "#" in source_line:
+                    macro_match = MACRO_PATTERN.match(source_line)
+                    if macro_match:
+                        definition_list.append((macro_match.group(1), "macro", line_number))
+                        continue
+                record_match = RECORD_PATTERN.match(source_line)
+                if record_match:
+                    definition_list.append((record_match.group(2), record_match.group(1), line_number))
+                if "typedef" in source_line:
+                    code_line = COMMENT_PATTERN.sub("", source_line)
+                    if TYPEDEF_START_PATTERN.match(code_line):
+                        typedef_match = TYPEDEF_POINTER_PATTERN.search(code_line) or TYPEDEF_PATTERN.search(code_line)
+                        if typedef_match:
+                            definition_list.append((typedef_match.group(1), "typedef", line_number))
+                        elif code_line.count("{") > code_line.count("}"):
+                            # the name follows the closing brace of a multi-line body
+                            is_typedef_open = True
+                        continue
+                if is_typedef_open:
+                    close_match = TYPEDEF_CLOSE_PATTERN.match(source_line)
+                    if close_match:
+                        definition_list.append((close_match.group(1), "typedef", line_number))
+                        is_typedef_open = False
+                    continue
+                using_match = USING_PATTERN.match(source_line)
+                if using_match:
+                    definition_list.append((using_match.group(1), "typedef", line_number))
+                    continue
+                if record_match or source_line[:1] in (" ", "\t", "#", "/", "}", "\n"):
+                    continue
+                function_match = FUNCTION_PATTERN.match(source_line)
+                if function_match and function_match.group(1) not in KEYWORD_LIST:
+                    definition_list.append((function_match.group(1), "function", line_number))
+    except OSError:
+        pass
+    return definition_list
+
+
+def get_index_file(root_path):
+    if not definitions.DIRECTORY_OUTPUT or not os.path.isdir(definitions.DIRECTORY_OUTPUT):
+        return None
+    path_hash = hashlib.md5(root_path.encode("utf-8")).hexdigest()[:16]
+    return definitions.DIRECTORY_OUTPUT + "/definition-index-" + path_hash
+
+
+def save_index(definition_index):
+    index_file = get_index_file(definition_index.root_path)
+    if index_file is None:
+        return
+    with open(index_file + ".tmp", 'wb') as index_fd:
+        pickle.dump((INDEX_VERSION, definition_index), index_fd)
+    os.replace(index_file + ".tmp", index_file)
+
+
+def load_index(root_path):
+    index_file = get_index_file(root_path)
+    if index_file is not None and os.path.isfile(index_file):
+        try:
+            with open(index_file, 'rb') as index_fd:
+                version, definition_index = pickle.load(index_fd)
+            if version == INDEX_VERSION and definition_index.root_path == root_path:
+                return definition_index
+        except Exception:
+            pass
+    return DefinitionIndex(root_path)
+
+
+def get_index(project_path):
+    root_path = str(project_path)
+    if len(root_path) > 1:
+        root_path = root_path.rstrip("/")
+    if root_path not in index_list:
+        index_list[root_path] = load_index(root_path)
+    definition_index = index_list[root_path]
+    definition_index.refresh()
+    return definition_index
+
+
+def find_definitions(project_path, query):
+    return get_index(project_path).search(query)
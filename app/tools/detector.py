@@ -6,7 +6,7 @@ import os
 
 import app.common.utilities
 from app.common.utilities import error_exit, definitions, id_from_string
-from app.tools import generator, slicer, parallel, emitter, finder, extractor
+from app.tools import generator, slicer, parallel, emitter, finder, extractor, slice_store
 from app.common import values, utilities
 from app.ast import ast_parser, ast_vector, ast_generator
 
@@ -111,7 +111,7 @@ def detect_segment_clone_by_similarity(vector_list_a, vector_list_c):
         slicer.slice_source_file(source_file_a, seg_type_a, segment_identifier_a,
                                  values.CONF_PATH_A,
                                  values.DONOR_REQUIRE_MACRO)
-        if os.stat(slice_file_a).st_size == 0:
+        if not slice_store.read_slice(slice_file_a):
             error_exit("SLICE NOT CREATED")
         utilities.shift_per_slice(slice_file_a)
         ast_tree_a = ast_generator.get_ast_json(source_file_a, values.DONOR_REQUIRE_MACRO, regenerate=True)
@@ -132,23 +132,17 @@ def detect_segment_clone_by_similarity(vector_list_a, vector_list_c):
                                          values.CONF_PATH_C,
                                          values.TARGET_REQUIRE_MACRO)
 
-                if not os.path.isfile(slice_file_c):
-                    continue
-                if os.stat(slice_file_c).st_size == 0:
+                if not slice_store.read_slice(slice_file_c):
                     continue
                 utilities.shift_per_slice(slice_file_c)
                 ast_tree_c = ast_generator.get_ast_json(source_file_c, values.TARGET_REQUIRE_MACRO, regenerate=True)
                 ast_node_c = finder.search_function_node_by_name(ast_tree_c, segment_identifier_c)
                 id_list_c = extractor.extract_child_id_list(ast_node_c)
                 app.common.utilities.generate_map_gumtree(source_file_a, source_file_c, map_file_name)
-                ast_node_map = parallel.read_mapping(map_file_name)
+                mapped_id_list_a, mapped_id_list_c = parallel.read_mapping_ids(map_file_name)
                 utilities.restore_per_slice(slice_file_c)
                 node_size_c = len(id_list_c)
-                match_count = 0
-                for node_str_a in ast_node_map:
-                    node_id_a = utilities.id_from_string(node_str_a)
-                    if node_id_a in id_list_a:
-                        match_count = match_count + 1
+                match_count = len(set(mapped_id_list_a).intersection(id_list_a))
                 similarity_a = float(match_count / (node_size_a))
                 similarity_b = float(match_count / (node_size_a + node_size_c))
                 emitter.information("Segment A Type: " + str(seg_type_a))
@@ -2,18 +2,81 @@
 # -*- coding: utf-8 -*-
 
 
-from app.common.utilities import execute_command, get_file_extension_list, definitions
-from app.ast import ast_generator
-from app.tools import mapper, emitter, filter
+from app.common.utilities import execute_command, get_file_extension_list, error_exit, definitions
+from app.ast import ast_generator, edit_script
+from app.tools import mapper, emitter, filter, parallel, runner
 from app.common import values
 from git import Repo
 
 
+def get_commit_pair(project_path_a, project_path_b):
+    repo = Repo(project_path_b)
+    if values.CONF_COMMIT_B:
+        commit_b = repo.commit(values.CONF_COMMIT_B)
+    else:
+        commit_b = repo.head.commit
+    if values.CONF_COMMIT_A:
+        commit_a = repo.commit(values.CONF_COMMIT_A)
+    else:
+        # PA is a separate checkout of the same history, its head is usually reachable from PB
+        try:
+            commit_a = repo.commit(Repo(project_path_a).head.commit.hexsha)
+        except Exception:
+            commit_a = commit_b.parents[0]
+    return repo, commit_a, commit_b
+
+
+def normalize_blob(blob):
+    # equivalent of diff -ENZBbw: ignore all white space and blank lines
+    content = blob.data_stream.read()
+    return [b"".join(line.split()) for line in content.splitlines() if line.strip()]
+
+
+def diff_files_git(output_diff_file, output_c_diff, output_h_diff,
+                   project_path_a, project_path_b):
+    _, commit_a, commit_b = get_commit_pair(project_path_a, project_path_b)
+    emitter.normal("\t\tcomparing tree " + commit_a.hexsha[:12] + " to " + commit_b.hexsha[:12])
+    c_file_list = list()
+    h_file_list = list()
+    for diff in commit_a.diff(commit_b):
+        # added, deleted and renamed files have no counterpart under the same path, diff -r only reported
+        # them as being in one tree; they are skipped on purpose to mirror the diff -r mode
+        if diff.new_file or diff.deleted_file or diff.renamed_file or diff.a_path != diff.b_path:
+            continue
+        file_path = diff.a_path
+        if file_path.endswith(".cc"):
+            file_list = c_file_list
+        elif file_path.endswith(".h"):
+            file_list = h_file_list
+        else:
+            continue
+        if diff.a_blob.hexsha == diff.b_blob.hexsha:
+            continue
+        if normalize_blob(diff.a_blob) == normalize_blob(diff.b_blob):
+            continue
+        file_list.append(file_path)
+
+    with open(output_diff_file, 'w') as diff_all, \
+            open(output_c_diff, 'w') as c_diff, \
+            open(output_h_diff, 'w') as h_diff:
+        for file_list, diff_file in ((c_file_list, c_diff), (h_file_list, h_diff)):
+            for file_path in sorted(file_list):
+                path_a = project_path_a + "/" + file_path
+                path_b = project_path_b + "/" + file_path
+                diff_line = "Files " + path_a + " and " + path_b + " differ\n"
+                diff_file.write(diff_line)
+                diff_all.write(diff_line)
+
+
 def diff_files(output_diff_file, output_c_diff, output_h_diff,
                output_ext_a, output_ext_b, output_ext,
                project_path_a, project_path_b):
     emitter.normal("\tfinding changed files...")
 
+    if values.CONF_DIFF_MODE == "git":
+        diff_files_git(output_diff_file, output_c_diff, output_h_diff, project_path_a, project_path_b)
+        return
+
     extensions = get_file_extension_list(project_path_a, output_ext_a)
     extensions = extensions.union(get_file_extension_list(project_path_b, output_ext_b))
     untrack_file = definitions.FILE_GIT_UNTRACKED_FILES
@@ -49,12 +112,12 @@ def diff_files(output_diff_file, output_c_diff, output_h_diff,
                 h_diff.write("Files " + path_a + " and " + path_b + " differ")
         return
 
-    untracked_list_command = "cd " + project_path_a + ";" + "touch " + untrack_file
-    if values.CONF_VC == "git":
-        untracked_list_command += "git ls-files --others  > " + untrack_file + ";"
-        untracked_list_command += "cd " + project_path_b + ";"
-        untracked_list_command += "git ls-files --others  >> " + untrack_file
-    execute_command(untracked_list_command)
+    with open(untrack_file, 'wb') as untracked_list:
+        if values.CONF_VC == "git":
+            for project_path in [project_path_a, project_path_b]:
+                untracked_list_command = ["git", "-C", project_path, "ls-files", "--others"]
+                emitter.command(" ".join(untracked_list_command))
+                runner.run(untracked_list_command, "git", untracked_list, definitions.FILE_ERROR_LOG)
 
     with open(output_ext, 'w') as exclusions:
         for pattern in extensions:
@@ -67,7 +130,7 @@ def diff_files(output_diff_file, output_c_diff, output_h_diff,
     diff_command += "cat " + output_diff_file + "| grep -P '\.cc and ' > " + output_c_diff + ";"
     diff_command += "cat " + output_diff_file + "| grep -P '\.h and ' > " + output_h_diff
     # print(diff_command)
-    execute_command(diff_command)
+    execute_command(diff_command, tool="diff")
 
 
 def diff_h_files(diff_file_path, project_path_a, untracked_file_list):
@@ -129,8 +192,9 @@ def diff_line(diff_file_list, output_file):
     for diff_file in diff_file_list:
         file_a = diff_file[0]
         file_b = diff_file[1]
-        diff_command = "diff -ENBZbwr " + file_a + " " + file_b + " > " + output_file
-        execute_command(diff_command)
+        diff_command = ["diff", "-ENBZbwr", file_a, file_b]
+        emitter.command(" ".join(diff_command))
+        runner.run(diff_command, "diff", output_file, definitions.FILE_ERROR_LOG)
         pertinent_lines_a = []
         pertinent_lines_b = []
         with open(output_file, 'r') as temp_diff_file:
@@ -185,6 +249,61 @@ def diff_line(diff_file_list, output_file):
     return diff_info
 
 
+def diff_line_git(diff_file_list, project_path_a, project_path_b):
+    diff_info = dict()
+    if not diff_file_list:
+        return diff_info
+    _, commit_a, commit_b = get_commit_pair(project_path_a, project_path_b)
+    path_list = [diff_file[0].replace(project_path_a + "/", "") for diff_file in diff_file_list]
+    diff_command = ["git", "-C", project_path_b, "diff", "-w", "--ignore-blank-lines", "--unified=0",
+                    "--no-color", "--no-ext-diff", "--no-renames", commit_a.hexsha, commit_b.hexsha, "--"]
+    diff_command += path_list
+    diff_stream = runner.run_stream(diff_command, "git")
+    file_a = None
+    is_header = False
+    for file_line in diff_stream:
+        if file_line.startswith("diff --git "):
+            is_header = True
+            continue
+        if is_header:
+            if file_line.startswith("+++ "):
+                file_a = project_path_a + "/" + file_line.strip()[6:]
+                emitter.normal("\t\t\t" + file_a + ":")
+            if not file_line.startswith("@@ "):
+                continue
+            is_header = False
+        # We only want the hunk headers: @@ -start_a[,count_a] +start_b[,count_b] @@
+        if not file_line.startswith("@@ ") or file_a is None:
+            continue
+        line_info = file_line.split(" ")
+        line_a = line_info[1][1:].split(',')
+        line_b = line_info[2][1:].split(',')
+        start_a = int(line_a[0])
+        count_a = int(line_a[1]) if len(line_a) > 1 else 1
+        start_b = int(line_b[0])
+        count_b = int(line_b[1]) if len(line_b) > 1 else 1
+        end_a = start_a + max(count_a, 1) - 1
+        end_b = start_b + max(count_b, 1) - 1
+
+        if count_a == 0:
+            operation = "insert"
+        elif count_b == 0:
+            operation = "delete"
+        else:
+            operation = "modify"
+
+        diff_loc = file_a + ":" + str(start_a)
+        diff_info[diff_loc] = dict()
+        diff_info[diff_loc]['operation'] = operation
+        diff_info[diff_loc]['old-lines'] = (start_a, end_a)
+        if operation != "delete":
+            diff_info[diff_loc]['new-lines'] = (start_b, end_b)
+        emitter.normal("\t\t\t\t" + operation + ": " + str(start_a) + "-" + str(end_a))
+    if diff_stream.result.return_code != 0:
+        error_exit("git diff failed for " + project_path_b)
+    return diff_info
+
+
 def get_ast_script(source_a, source_b, script_file_path):
     emitter.normal("\tgenerating AST script")
     ast_generator.generate_ast_script(source_a, source_b, script_file_path)
@@ -193,15 +312,60 @@ def get_ast_script(source_a, source_b, script_file_path):
         return script_lines
 
 
-def diff_ast(diff_info, project_path_a, project_path_b, script_file_path):
-    source_path_a = ""
-    line_number_a = ""
-    source_path_b = ""
-    ast_script = ""
-    ast_map_a = ""
-    ast_map_b = ""
-    mapping_ba = ""
+def diff_ast_file(source_path_a, source_path_b, diff_loc_list, script_file_path):
+    emitter.sub_sub_title(source_path_a)
+    ast_script = edit_script.EditScript(get_ast_script(source_path_a, source_path_b, script_file_path))
+    try:
+        ast_map_a = ast_generator.get_ast_json(source_path_a)
+        ast_map_b = ast_generator.get_ast_json(source_path_b)
+        mapping_ba = mapper.map_ast_from_source(source_path_a, source_path_b, script_file_path)
+    except Exception as e:
+        print(e)
+        emitter.warning("\t\twarning: no AST generated")
+        return source_path_a, None
+
+    script_info = dict()
+    for diff_loc_info in diff_loc_list:
+        start_a, end_a = diff_loc_info['old-lines']
+        diff_loc = source_path_a + ":" + str(start_a)
+        emitter.normal("\tline number:" + str(start_a))
+        operation = diff_loc_info['operation']
+        filtered_ast_script = list()
+        if operation == 'insert':
+            start_line_b, end_line_b = diff_loc_info['new-lines']
+            line_range_b = (start_line_b, end_line_b)
+            line_range_a = (-1, -1)
+            info_a = (source_path_a, line_range_a, ast_map_a)
+            info_b = (source_path_b, line_range_b, ast_map_b)
+            filtered_ast_script = filter.filter_ast_script(ast_script,
+                                                           info_a,
+                                                           info_b,
+                                                           mapping_ba
+                                                           )
+        elif operation == 'modify':
+            line_range_a = diff_loc_info['old-lines']
+            line_range_b = diff_loc_info['new-lines']
+            info_a = (source_path_a, line_range_a, ast_map_a)
+            info_b = (source_path_b, line_range_b, ast_map_b)
+            filtered_ast_script = filter.filter_ast_script(ast_script,
+                                                           info_a,
+                                                           info_b,
+                                                           mapping_ba
+                                                           )
+        elif operation == 'delete':
+            line_range_a = diff_loc_info['old-lines']
+            info_a = (source_path_a, line_range_a, ast_map_a)
+            info_b = (source_path_b, None, ast_map_b)
+            filtered_ast_script = filter.filter_ast_script(ast_script,
+                                                           info_a,
+                                                           info_b,
+                                                           mapping_ba
+                                                           )
+        script_info[diff_loc] = filtered_ast_script
+    return source_path_a, script_info
+
 
+def diff_ast(diff_info, project_path_a, project_path_b, script_file_path):
     grouped_line_info = dict()
     for source_loc in diff_info:
         source_file, start_line = source_loc.split(":")
@@ -210,58 +374,23 @@ def diff_ast(diff_info, project_path_a, project_path_b, script_file_path):
             grouped_line_info[source_file] = list()
         grouped_line_info[source_file].append(diff_line_info)
 
-    for source_path_a in grouped_line_info.keys():
-        emitter.sub_sub_title(source_path_a)
+    # each file gets its own script file, the AST files are written next to the sources
+    emitter.normal("\t\tstarting parallel computing")
+    diff_arg_list = list()
+    for file_index, source_path_a in enumerate(grouped_line_info):
         source_path_b = str(source_path_a).replace(project_path_a, project_path_b)
-        ast_script = get_ast_script(source_path_a, source_path_b, script_file_path)
-        try:
-            ast_map_a = ast_generator.get_ast_json(source_path_a)
-            ast_map_b = ast_generator.get_ast_json(source_path_b)
-            mapping_ba = mapper.map_ast_from_source(source_path_a, source_path_b, script_file_path)
-        except Exception as e:
-            print(e)
-            emitter.warning("\t\twarning: no AST generated")
-            del grouped_line_info[source_path_a]
+        file_script_path = script_file_path + "-" + str(file_index)
+        diff_arg_list.append((source_path_a, source_path_b, grouped_line_info[source_path_a], file_script_path))
+    emitter.normal("\t\twaiting for thread completion")
+    result_list = parallel.pool_map(diff_ast_file, diff_arg_list, chunk_size=1)
+
+    script_info_list = dict(result_list)
+    for source_path_a in grouped_line_info:
+        script_info = script_info_list.get(source_path_a, None)
+        if script_info is None:
             continue
-
-        diff_loc_list = grouped_line_info[source_path_a]
-        for diff_loc_info in diff_loc_list:
-            start_a, end_a = diff_loc_info['old-lines']
-            diff_loc = source_path_a + ":" + str(start_a)
-            emitter.normal("\tline number:" + str(start_a))
-            operation = diff_loc_info['operation']
-            filtered_ast_script = list()
-            if operation == 'insert':
-                start_line_b, end_line_b = diff_loc_info['new-lines']
-                line_range_b = (start_line_b, end_line_b)
-                line_range_a = (-1, -1)
-                info_a = (source_path_a, line_range_a, ast_map_a)
-                info_b = (source_path_b, line_range_b, ast_map_b)
-                filtered_ast_script = filter.filter_ast_script(ast_script,
-                                                               info_a,
-                                                               info_b,
-                                                               mapping_ba
-                                                               )
-            elif operation == 'modify':
-                line_range_a = diff_loc_info['old-lines']
-                line_range_b = diff_loc_info['new-lines']
-                info_a = (source_path_a, line_range_a, ast_map_a)
-                info_b = (source_path_b, line_range_b, ast_map_b)
-                filtered_ast_script = filter.filter_ast_script(ast_script,
-                                                               info_a,
-                                                               info_b,
-                                                               mapping_ba
-                                                               )
-            elif operation == 'delete':
-                line_range_a = diff_loc_info['old-lines']
-                info_a = (source_path_a, line_range_a, ast_map_a)
-                info_b = (source_path_b, None, ast_map_b)
-                filtered_ast_script = filter.filter_ast_script(ast_script,
-                                                               info_a,
-                                                               info_b,
-                                                               mapping_ba
-                                                               )
-
+        for diff_loc in script_info:
+            filtered_ast_script = script_info[diff_loc]
             if filtered_ast_script is None:
                 del diff_info[diff_loc]
                 continue
@@ -1,6 +1,6 @@
 import re
-from app.tools import converter, emitter, finder
-from app.common.utilities import execute_command, get_file_list, error_exit, is_intersect, definitions, \
+from app.tools import converter, emitter, finder, preprocessor, runner
+from app.common.utilities import get_file_list, error_exit, is_intersect, definitions, \
     extract_project_path
 import os
 from app.common import values
@@ -23,11 +23,12 @@ def extract_child_id_list(ast_node):
 def extract_macro_definitions(source_path):
     emitter.information("\t\t[info] extracting macro definitions from\n\t\t" + str(source_path))
     pre_macro_list = extract_pre_macro_list(source_path, True)
-    extract_command = "clang -E -dD -dM "
+    extract_command = ["clang", "-E", "-dD", "-dM"]
     for pre_macro in pre_macro_list:
-        extract_command += " -D " + pre_macro.strip().replace("\n", "") + " "
-    extract_command += source_path + " > " + definitions.FILE_MACRO_DEF
-    execute_command(extract_command)
+        extract_command += ["-D", pre_macro.strip().replace("\n", "")]
+    extract_command.append(source_path)
+    emitter.command(" ".join(extract_command))
+    runner.run(extract_command, "clang", definitions.FILE_MACRO_DEF, definitions.FILE_ERROR_LOG)
     macro_def_list = []
     with open(definitions.FILE_MACRO_DEF, "r") as macro_file:
         result_list = macro_file.readlines()
@@ -586,40 +587,13 @@ def extract_unique_in_order(list):
 
 def extract_header_list(source_path):
     header_list = list()
-    output_file_path = definitions.DIRECTORY_TMP + "/header-list"
-    extract_command = "cat " + source_path + " | grep '#include' > " + output_file_path
-    execute_command(extract_command)
-    with open(output_file_path, 'r') as output_file:
-        header_list = output_file.readlines()
+    for include_directive in preprocessor.get_include_list(source_path):
+        header_list.append(include_directive + "\n")
     return header_list
 
 
 def extract_pre_macro_list(source_file, only_if=False):
-    result_file = definitions.DIRECTORY_TMP + "/result"
-    cat_command = "cat " + source_file + " | grep '#if' > " + result_file
-    if only_if:
-        cat_command = "cat " + source_file + " | grep '#ifdef' > " + result_file
-    execute_command(cat_command)
-    pre_macro_list = set()
-    with open(result_file, 'r') as log_file:
-        read_lines = log_file.readlines()
-        for line in read_lines:
-            line = line.replace("\t", " ").replace("\n", "")
-            if "ifdef" in line:
-                pre_macro_list.add(line.split(" ")[-1])
-            elif "ifndef" in line:
-                pre_macro_list.add(line.split(" ")[-1])
-            elif "defined(" in line:
-                token_list = line.split("defined")
-                for token in token_list[1:]:
-                    macro = re.findall(r'\(([^]]*)\)', token)[0]
-                    pre_macro_list.add(macro.replace(")", "").replace("(", ""))
-            elif "defined" in line:
-                token_list = line.split(" defined ")
-                for token in token_list[1:]:
-                    macro = token.split(" ")[0]
-                    pre_macro_list.add(macro.replace(")", "").replace("(", ""))
-    return pre_macro_list
+    return preprocessor.get_conditional_macro_list(source_file, only_if)
 
 
 def extract_pre_macro_command(source_file):
@@ -0,0 +1,232 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Per-project file index, persisted with directory mtimes and revalidated per query '''
+
+import os
+import re
+import pickle
+import hashlib
+import fnmatch
+from app.common import definitions
+
+INDEX_VERSION = 1
+
+index_list = dict()
+
+
+class FileIndex:
+
+    def __init__(self, root_path):
+        self.root_path = root_path
+        # relative dir -> (mtime, [(entry name, is_dir, is_file)]) in readdir order
+        self.dir_list = dict()
+        self.path_list = list()
+        self.name_map = dict()
+        self.extension_map = dict()
+        self.is_dirty = True
+
+    def scan_dir(self, dir_path, recursive=True):
+        dir_abs_path = os.path.join(self.root_path, dir_path) if dir_path else self.root_path
+        entry_list = list()
+        sub_dir_list = list()
+        try:
+            mtime = os.stat(dir_abs_path).st_mtime_ns
+            with os.scandir(dir_abs_path) as dir_entries:
+                for dir_entry in dir_entries:
+                    is_dir = dir_entry.is_dir(follow_symlinks=False)
+                    is_file = dir_entry.is_file(follow_symlinks=False)
+                    entry_list.append((dir_entry.name, is_dir, is_file))
+                    if is_dir:
+                        sub_dir_list.append(os.path.join(dir_path, dir_entry.name) if dir_path else dir_entry.name)
+        except OSError:
+            return
+        self.dir_list[dir_path] = (mtime, entry_list)
+        self.is_dirty = True
+        for sub_dir in sub_dir_list:
+            if recursive or sub_dir not in self.dir_list:
+                self.scan_dir(sub_dir)
+
+    def drop_dir(self, dir_path):
+        prefix = dir_path + "/"
+        for indexed_dir in list(self.dir_list):
+            if indexed_dir == dir_path or indexed_dir.startswith(prefix):
+                del self.dir_list[indexed_dir]
+        self.is_dirty = True
+
+    def revalidate(self):
+        changed_list = list()
+        for dir_path in list(self.dir_list):
+            if dir_path not in self.dir_list:
+                continue
+            dir_abs_path = os.path.join(self.root_path, dir_path) if dir_path else self.root_path
+            try:
+                mtime = os.stat(dir_abs_path).st_mtime_ns
+            except OSError:
+                self.drop_dir(dir_path)
+                continue
+            if mtime != self.dir_list[dir_path][0]:
+                changed_list.append(dir_path)
+        for dir_path in changed_list:
+            if dir_path not in self.dir_list:
+                continue
+            old_sub_dir_list = set(entry[0] for entry in self.dir_list[dir_path][1] if entry[1])
+            # only new sub directories are walked, unchanged ones keep their entries
+            self.scan_dir(dir_path, recursive=False)
+            if dir_path not in self.dir_list:
+                continue
+            new_sub_dir_list = set(entry[0] for entry in self.dir_list[dir_path][1] if entry[1])
+            for sub_dir in old_sub_dir_list - new_sub_dir_list:
+                self.drop_dir(os.path.join(dir_path, sub_dir) if dir_path else sub_dir)
+        return bool(changed_list)
+
+    def build_maps(self):
+        # pre-order walk, the same order find prints its results in
+        self.path_list = list()
+        self.name_map = dict()
+        self.extension_map = dict()
+        dir_stack = [""]
+        while dir_stack:
+            dir_path = dir_stack.pop()
+            if dir_path not in self.dir_list:
+                continue
+            sub_dir_list = list()
+            for entry_name, is_dir, is_file in self.dir_list[dir_path][1]:
+                rel_path = os.path.join(dir_path, entry_name) if dir_path else entry_name
+                if is_dir:
+                    sub_dir_list.append(rel_path)
+                    continue
+                self.path_list.append((rel_path, is_file))
+            dir_stack.extend(reversed(sub_dir_list))
+        for path_index, (rel_path, is_file) in enumerate(self.path_list):
+            file_name = rel_path.split("/")[-1]
+            self.name_map.setdefault(file_name, list()).append(path_index)
+            extension = file_name.split(".")[-1] if "." in file_name else ""
+            self.extension_map.setdefault(extension, list()).append(path_index)
+        self.is_dirty = False
+
+    def refresh(self):
+        if not self.dir_list:
+            self.scan_dir("")
+        else:
+            self.revalidate()
+        if self.is_dirty:
+            self.build_maps()
+            save_index(self)
+
+    def get_path(self, path_index):
+        return os.path.join(self.root_path, self.path_list[path_index][0])
+
+
+def get_index_file(root_path):
+    if not definitions.DIRECTORY_OUTPUT or not os.path.isdir(definitions.DIRECTORY_OUTPUT):
+        return None
+    path_hash = hashlib.md5(root_path.encode("utf-8")).hexdigest()[:16]
+    return definitions.DIRECTORY_OUTPUT + "/file-index-" + path_hash
+
+
+def save_index(file_index):
+    index_file = get_index_file(file_index.root_path)
+    if index_file is None:
+        return
+    with open(index_file + ".tmp", 'wb') as index_fd:
+        pickle.dump((INDEX_VERSION, file_index.root_path, file_index.dir_list), index_fd)
+    os.replace(index_file + ".tmp", index_file)
+
+
+def load_index(root_path):
+    file_index = FileIndex(root_path)
+    index_file = get_index_file(root_path)
+    if index_file is None or not os.path.isfile(index_file):
+        return file_index
+    try:
+        with open(index_file, 'rb') as index_fd:
+            version, indexed_path, dir_list = pickle.load(index_fd)
+        if version == INDEX_VERSION and indexed_path == root_path:
+            file_index.dir_list = dir_list
+    except Exception:
+        pass
+    return file_index
+
+
+def get_index(src_path):
+    root_path = str(src_path)
+    if len(root_path) > 1:
+        root_path = root_path.rstrip("/")
+    if root_path not in index_list:
+        index_list[root_path] = load_index(root_path)
+    file_index = index_list[root_path]
+    file_index.refresh()
+    return file_index
+
+
+def compile_pattern(pattern):
+    # find/grep style escapes are not needed by fnmatch
+    return re.compile(fnmatch.translate(pattern.replace("\\.", ".")))
+
+
+def filter_regex(path_list, regex):
+    if regex is None:
+        return path_list
+    try:
+        regex_pattern = re.compile(regex)
+    except re.error:
+        return [path for path in path_list if regex in path]
+    return [path for path in path_list if regex_pattern.search(path)]
+
+
+def get_candidate_list(file_index, pattern):
+    # narrow a name pattern down through the extension or basename maps
+    if not any(char in pattern for char in "*?["):
+        return file_index.name_map.get(pattern, [])
+    if pattern.startswith("*.") and not any(char in pattern[2:] for char in "*?[."):
+        return file_index.extension_map.get(pattern[2:], [])
+    return range(len(file_index.path_list))
+
+
+def find_files(src_path, pattern, regex=None):
+    file_index = get_index(src_path)
+    pattern = pattern.replace("\\.", ".")
+    name_pattern = compile_pattern(pattern)
+    path_list = list()
+    for path_index in get_candidate_list(file_index, pattern):
+        rel_path = file_index.path_list[path_index][0]
+        if name_pattern.match(rel_path.split("/")[-1]):
+            path_list.append(file_index.get_path(path_index))
+    return filter_regex(path_list, regex)
+
+
+def find_file_using_path(src_path, partial_path, regex=None):
+    file_index = get_index(src_path)
+    path_pattern = compile_pattern(partial_path)
+    path_list = list()
+    for path_index in range(len(file_index.path_list)):
+        file_path = file_index.get_path(path_index)
+        if path_pattern.match(file_path):
+            path_list.append(file_path)
+    return filter_regex(path_list, regex)
+
+
+def find_regular_files(src_path, exclude_pattern_list=None):
+    file_index = get_index(src_path)
+    exclude_list = [compile_pattern(pattern) for pattern in exclude_pattern_list or []]
+    path_list = list()
+    for path_index, (rel_path, is_file) in enumerate(file_index.path_list):
+        if not is_file:
+            continue
+        file_name = rel_path.split("/")[-1]
+        if any(exclude_pattern.match(file_name) for exclude_pattern in exclude_list):
+            continue
+        path_list.append(file_index.get_path(path_index))
+    return path_list
+
+
+def get_extension_list(src_path, exclude_pattern_list=None):
+    extension_list = set()
+    for file_path in find_regular_files(src_path, exclude_pattern_list):
+        file_name = file_path.split("/")[-1]
+        if "." in file_name:
+            extension_list.add("*." + file_name.split(".")[-1])
+        else:
+            extension_list.add(file_name)
+    return extension_list
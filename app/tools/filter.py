@@ -4,9 +4,9 @@
 
 from app.tools import merger, oracle
 from app.tools import converter, emitter, finder, extractor
-from app.common import values
+from app.common import values, definitions
 from app.common.utilities import error_exit
-from app.ast import ast_generator
+from app.ast import ast_generator, edit_script
 import collections
 
 
@@ -68,45 +68,35 @@ def filter_ast_script(ast_script, info_a, info_b, mapping_ba):
     source_path_a, line_range_a, ast_node_a = info_a
     source_path_b, line_range_b, ast_node_b = info_b
     filtered_ast_script = list()
-    line_range_start_a, line_range_end_a = line_range_a
-    line_numbers_a = set(range(int(line_range_start_a), int(line_range_end_a) + 1))
+    line_range_start_a, line_range_end_a = int(line_range_a[0]), int(line_range_a[1])
     if line_range_b is not None:
-        line_range_start_b, line_range_end_b = line_range_b
-        line_numbers_b = set(range(int(line_range_start_b), int(line_range_end_b) + 1))
+        line_range_start_b, line_range_end_b = int(line_range_b[0]), int(line_range_b[1])
 
+    ast_script = edit_script.load_script(ast_script)
     merged_ast_script = merger.merge_ast_script(ast_script, ast_node_a, ast_node_b, mapping_ba)
     if merged_ast_script is None:
         return None
-    for script_line in merged_ast_script:
-        if "Insert" in script_line and line_range_b is not None:
-            node_id_b = int(((script_line.split(" into ")[0]).split("(")[1]).split(")")[0])
-            node_b = finder.search_ast_node_by_id(ast_node_b, node_id_b)
-            node_type_b = node_b['type']
+    node_index_a = ast_script.get_node_index(ast_node_a)
+    node_index_b = ast_script.get_node_index(ast_node_b)
+    for script_op in merged_ast_script:
+        if script_op.kind == definitions.INSERT and line_range_b is not None:
+            node_b = node_index_b.get(script_op.node_id)
             node_line_start = int(node_b['start line'])
-            node_line_end = int(node_b['end line']) + 1
-            node_line_numbers = set(range(node_line_start, node_line_end))
-
-            intersection = line_numbers_b.intersection(node_line_numbers)
-            if intersection:
-                filtered_ast_script.append(script_line)
-        elif "Delete" in script_line:
-            node_id_a = int((script_line.split("(")[1]).split(")")[0])
-            node_a = finder.search_ast_node_by_id(ast_node_a, node_id_a)
+            node_line_end = int(node_b['end line'])
+            if max(node_line_start, line_range_start_b) <= min(node_line_end, line_range_end_b):
+                filtered_ast_script.append(script_op.line)
+        elif script_op.kind == definitions.DELETE:
+            node_a = node_index_a.get(script_op.node_id)
             node_line_start = int(node_a['start line'])
-            node_line_end = int(node_a['end line']) + 1
-            node_line_numbers = set(range(node_line_start, node_line_end))
-            intersection = line_numbers_a.intersection(node_line_numbers)
-            if intersection:
-                filtered_ast_script.append(script_line)
-        elif "Replace" in script_line and line_range_b is not None:
-            node_id_a = int(((script_line.split(" with ")[0]).split("(")[1]).split(")")[0])
-            node_a = finder.search_ast_node_by_id(ast_node_a, node_id_a)
+            node_line_end = int(node_a['end line'])
+            if max(node_line_start, line_range_start_a) <= min(node_line_end, line_range_end_a):
+                filtered_ast_script.append(script_op.line)
+        elif script_op.kind == definitions.REPLACE and line_range_b is not None:
+            node_a = node_index_a.get(script_op.node_id)
             node_line_start = int(node_a['start line'])
-            node_line_end = int(node_a['end line']) + 1
-            node_line_numbers = set(range(node_line_start, node_line_end))
-            intersection = line_numbers_a.intersection(node_line_numbers)
-            if intersection:
-                filtered_ast_script.append(script_line)
+            node_line_end = int(node_a['end line'])
+            if max(node_line_start, line_range_start_a) <= min(node_line_end, line_range_end_a):
+                filtered_ast_script.append(script_op.line)
     return filtered_ast_script
 
 
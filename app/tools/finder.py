@@ -4,16 +4,15 @@
 
 import sys
 import os
-from pathlib import Path
 
 import app.common.utilities
 from app.ast import ast_vector, ast_generator
-from app.tools import converter, emitter
-from app.common.utilities import execute_command, find_files, definitions
+from app.tools import converter, emitter, file_index, definition_index, runner
+from app.common.utilities import find_files, definitions
 from app.common import values
 import mmap
 
-FILE_GREP_RESULT = ""
+header_list_cache = dict()
 
 
 
@@ -240,57 +239,56 @@ def find_definition_insertion_point(source_path):
     return 0
 
 
+def get_target_header_list(target_path):
+    # the header list only changes when the target file does
+    target_stat = os.stat(target_path)
+    cache_key = (target_stat.st_mtime_ns, target_stat.st_size)
+    if target_path in header_list_cache and header_list_cache[target_path][0] == cache_key:
+        return header_list_cache[target_path][1]
+    target_ast_tree = ast_generator.get_ast_json(target_path, regenerate=True)
+    header_file_list = extract_header_file_list(target_ast_tree)
+    header_list_cache[target_path] = (cache_key, header_file_list)
+    return header_file_list
+
+
 def find_header_file(query, source_path, target_path):
-    global FILE_GREP_RESULT
     project_dir = app.common.utilities.extract_project_path(source_path)
-    FILE_GREP_RESULT = definitions.DIRECTORY_OUTPUT + "/grep-output"
-    search_command = "cd " + project_dir + ";"
-    search_command += "grep -inr -e \"" + query + "\" . | grep define"
-    search_command += " > " + FILE_GREP_RESULT
-    execute_command(search_command)
-    target_ast_tree = ast_generator.get_ast_json(target_path, regenerate=True)
-    header_file_list_in_target = extract_header_file_list(target_ast_tree)
-    with open(FILE_GREP_RESULT, 'r') as result_file:
-        candidate_list = result_file.readlines()
-        candidate_header_list = list()
-        for candidate in candidate_list:
-            candidate_file = str(candidate).split(":")[0]
-            if values.Project_D.path in candidate_file:
-                candidate_file = candidate_file.replace(values.Project_D.path + "/", "")
-            if candidate_file[0] == ".":
-                candidate_file = candidate_file[2:]
-            if candidate_file not in candidate_header_list:
-                candidate_header_list.append(candidate_file)
-        intersection = list(set(header_file_list_in_target).intersection(candidate_header_list))
-        if intersection:
-            for header_file_path in intersection:
-                header_abs_path = values.CONF_PATH_C + "/" + header_file_path
-                with open(header_abs_path, "rb", 0) as header_file:
-                    with mmap.mmap(header_file.fileno(), 0, access=mmap.ACCESS_READ) as read_map:
-                        if read_map.find(bytes(query, 'utf-8')) != -1:
-                            return None
-        if len(candidate_list) >= 1:
-            # TODO: can improve selection
-            best_candidate = str(candidate_list[0]).split(":")[0]
-            if len(candidate_list) > 1:
-                for candidate_file in candidate_header_list:
-                    if ".h" in candidate_file:
-                        best_candidate = candidate_file
-                emitter.warning("\t\t[warning] more than one definition found")
-            abs_path = project_dir + "/" + best_candidate
-            return abs_path
+    candidate_list = definition_index.find_definitions(project_dir, query)
+    header_file_list_in_target = get_target_header_list(target_path)
+    candidate_header_list = list()
+    for candidate_file, line_number, definition_kind, definition_name in candidate_list:
+        if candidate_file not in candidate_header_list:
+            candidate_header_list.append(candidate_file)
+    intersection = list(set(header_file_list_in_target).intersection(candidate_header_list))
+    if intersection:
+        for header_file_path in intersection:
+            header_abs_path = values.CONF_PATH_C + "/" + header_file_path
+            with open(header_abs_path, "rb", 0) as header_file:
+                with mmap.mmap(header_file.fileno(), 0, access=mmap.ACCESS_READ) as read_map:
+                    if read_map.find(bytes(query, 'utf-8')) != -1:
+                        return None
+    if len(candidate_list) >= 1:
+        # TODO: can improve selection
+        best_candidate = candidate_list[0][0]
+        if len(candidate_list) > 1:
+            for candidate_file in candidate_header_list:
+                if ".h" in candidate_file:
+                    best_candidate = candidate_file
+            emitter.warning("\t\t[warning] more than one definition found")
+        abs_path = project_dir + "/" + best_candidate
+        return abs_path
     return None
 
 
 def find_file_in_dir(query, search_dir):
     file_name = query.split("/")[-1]
-    file_list = Path(search_dir).rglob(file_name)
+    file_list = file_index.find_files(search_dir, file_name)
     best_candidate = None
     # TODO: can improve selection
     for candidate in file_list:
         if query in candidate:
             best_candidate = candidate
-            return
+            break
     return best_candidate
 
 
@@ -303,10 +301,10 @@ def find_clone(file_name):
     source_path = file_name.replace(values.CONF_PATH_A, "").replace(values.CONF_PATH_B, "")
     if source_path[0] == "/":
         source_path = source_path[1:]
-    git_query = "cd " + values.CONF_PATH_A + ";"
+    git_query = ["git", "-C", values.CONF_PATH_A, "log", "--follow", "--pretty=", "--name-only", source_path]
     result_file = definitions.DIRECTORY_TMP + "/list"
-    git_query += "git log --follow --pretty=\"\" --name-only " + source_path + " > " + result_file
-    execute_command(git_query)
+    emitter.command(" ".join(git_query))
+    runner.run(git_query, "git", result_file, definitions.FILE_ERROR_LOG)
     clone_path = None
     with open(result_file, 'r') as tmp_file:
         list_lines = tmp_file.readlines()
@@ -0,0 +1,191 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Input fingerprints of the pipeline phases, used to skip phases on a resumed run '''
+
+import os
+import json
+import shutil
+import hashlib
+from app.common import definitions, values
+from app.tools import runner
+
+PHASE_ORDER = [definitions.PHASE_DIFF, definitions.PHASE_DETECTION,
+               definitions.PHASE_SLICING, definitions.PHASE_EXTRACTION]
+
+TOOL_LIST = [definitions.APP_AST_DIFF, definitions.TOOL_VECGEN.strip(), "clang", "git"]
+
+FINGERPRINT_VERSION = 3
+
+# written next to the sources by the pipeline itself, they are not inputs
+GENERATED_SUFFIX_LIST = (".AST", ".vec", ".slice", ".orig")
+
+environment_digest = None
+file_digest_list = dict()
+
+
+def get_fingerprint_file():
+    return definitions.DIRECTORY_OUTPUT + "/phase-fingerprints.json"
+
+
+def read_fingerprints():
+    fingerprint_file = get_fingerprint_file()
+    if not os.path.isfile(fingerprint_file):
+        return dict()
+    try:
+        with open(fingerprint_file, 'r') as fingerprint_fd:
+            fingerprint_list = json.load(fingerprint_fd)
+    except (OSError, ValueError):
+        return dict()
+    if fingerprint_list.get("version", None) != FINGERPRINT_VERSION:
+        return dict()
+    return fingerprint_list.get("phases", dict())
+
+
+def write_fingerprints(phase_list):
+    fingerprint_file = get_fingerprint_file()
+    with open(fingerprint_file + ".tmp", 'w') as fingerprint_fd:
+        json.dump({"version": FINGERPRINT_VERSION, "phases": phase_list}, fingerprint_fd, indent=2)
+    os.replace(fingerprint_file + ".tmp", fingerprint_file)
+
+
+def get_file_digest(file_path):
+    # keyed by (mtime, size), artifacts are hashed at most once per run unless rewritten
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return "missing"
+    file_key = (file_stat.st_mtime_ns, file_stat.st_size)
+    if file_digest_list.get(file_path, (None, None))[0] != file_key:
+        sha1 = hashlib.sha1()
+        with open(file_path, 'rb') as artifact_file:
+            for chunk in iter(lambda: artifact_file.read(1024 * 1024), b""):
+                sha1.update(chunk)
+        file_digest_list[file_path] = (file_key, sha1.hexdigest())
+    return file_digest_list[file_path][1]
+
+
+def get_commit_id(repo_path):
+    if not repo_path or not os.path.isdir(repo_path):
+        return ""
+    result = runner.run(["git", "-C", repo_path, "rev-parse", "HEAD"], "git", runner.CAPTURE)
+    return result.output.decode("utf-8", errors="replace").strip()
+
+
+def is_generated_file(file_path):
+    return file_path.endswith(GENERATED_SUFFIX_LIST)
+
+
+def get_git_tree_digest(repo_path):
+    # uncommitted and untracked files, the committed state is covered by the head in the environment digest
+    result = runner.run(["git", "-C", repo_path, "status", "--porcelain", "-z", "--untracked-files=all"],
+                        "git", runner.CAPTURE)
+    sha256 = hashlib.sha256()
+    for entry in result.output.decode("utf-8", errors="replace").split("\0"):
+        # rename entries are followed by the original path without a status
+        file_path = entry[3:] if len(entry) > 3 and entry[2] == " " else entry
+        if not file_path or is_generated_file(file_path):
+            continue
+        file_digest = get_file_digest(os.path.join(repo_path, file_path))
+        sha256.update((entry[:2] + ":" + file_path + ":" + file_digest + "\n").encode("utf-8"))
+    return sha256.hexdigest()
+
+
+def get_dir_tree_digest(dir_path):
+    # trees without version control are compared by the path and content of every source file, slicing
+    # restores the sources from their .orig backups, which keeps the content but not the mtime
+    sha256 = hashlib.sha256()
+    for root_path, dir_list, file_list in os.walk(dir_path):
+        dir_list[:] = sorted(dir_name for dir_name in dir_list if dir_name != ".git")
+        for file_name in sorted(file_list):
+            if is_generated_file(file_name):
+                continue
+            file_path = os.path.join(root_path, file_name)
+            if not os.path.isfile(file_path):
+                continue
+            sha256.update((os.path.relpath(file_path, dir_path) + ":" + get_file_digest(file_path) +
+                           "\n").encode("utf-8"))
+    return sha256.hexdigest()
+
+
+def get_tree_digest(tree_path):
+    if not tree_path or not os.path.isdir(tree_path):
+        return "missing"
+    if os.path.exists(os.path.join(tree_path, ".git")):
+        return get_git_tree_digest(tree_path)
+    return get_dir_tree_digest(tree_path)
+
+
+def get_tool_version(tool_name):
+    tool_path = tool_name
+    if not os.path.isabs(tool_path):
+        local_path = os.path.join(definitions.DIRECTORY_MAIN, tool_name)
+        tool_path = local_path if os.path.isfile(local_path) else shutil.which(tool_name)
+    if not tool_path or not os.path.isfile(tool_path):
+        return tool_name + ":missing"
+    tool_stat = os.stat(tool_path)
+    return tool_path + ":" + str(tool_stat.st_mtime_ns) + ":" + str(tool_stat.st_size)
+
+
+def get_environment_digest():
+    # configuration, repository heads and tool builds do not change during a run
+    global environment_digest
+    if environment_digest is None:
+        sha256 = hashlib.sha256()
+        if values.FILE_CONFIGURATION and os.path.isfile(values.FILE_CONFIGURATION):
+            with open(values.FILE_CONFIGURATION, 'rb') as config_file:
+                sha256.update(config_file.read())
+        for commit_id in [values.CONF_COMMIT_A, values.CONF_COMMIT_B, values.CONF_COMMIT_C]:
+            sha256.update(("commit:" + str(commit_id).strip() + "\n").encode("utf-8"))
+        for repo_path in [values.CONF_PATH_A, values.CONF_PATH_B, values.CONF_PATH_C]:
+            sha256.update(("head:" + get_commit_id(repo_path) + "\n").encode("utf-8"))
+        for tool_name in TOOL_LIST:
+            sha256.update(("tool:" + get_tool_version(tool_name) + "\n").encode("utf-8"))
+        environment_digest = sha256.hexdigest()
+    return environment_digest
+
+
+def compute_fingerprint(phase, input_list, tree_list=()):
+    sha256 = hashlib.sha256()
+    sha256.update(("phase:" + phase + "\n").encode("utf-8"))
+    sha256.update(("environment:" + get_environment_digest() + "\n").encode("utf-8"))
+    phase_index = PHASE_ORDER.index(phase)
+    if phase_index > 0:
+        # a re-executed phase invalidates every phase after it
+        previous_phase = PHASE_ORDER[phase_index - 1]
+        previous_digest = read_fingerprints().get(previous_phase, dict()).get("digest", "")
+        sha256.update(("previous:" + previous_digest + "\n").encode("utf-8"))
+    for input_file in input_list:
+        sha256.update(("input:" + input_file + ":" + get_file_digest(input_file) + "\n").encode("utf-8"))
+    for tree_path in tree_list:
+        sha256.update(("tree:" + tree_path + ":" + get_tree_digest(tree_path) + "\n").encode("utf-8"))
+    return sha256.hexdigest()
+
+
+def check_phase(phase, input_list, output_list, tree_list=()):
+    # tree_list holds source trees the phase reads, including their uncommitted changes
+    digest = compute_fingerprint(phase, input_list, tree_list)
+    if not values.CONF_RESUME:
+        return False, digest
+    phase_info = read_fingerprints().get(phase, None)
+    if phase_info is None or phase_info.get("digest", None) != digest:
+        return False, digest
+    for output_file in output_list:
+        if not os.path.exists(output_file):
+            return False, digest
+        # an artifact rewritten after the phase finished no longer matches the recorded run
+        if phase_info.get("outputs", dict()).get(output_file, None) != get_file_digest(output_file):
+            return False, digest
+    return True, digest
+
+
+def record_phase(phase, digest, output_list):
+    phase_list = read_fingerprints()
+    phase_index = PHASE_ORDER.index(phase)
+    for later_phase in PHASE_ORDER[phase_index + 1:]:
+        phase_list.pop(later_phase, None)
+    phase_list[phase] = {
+        "digest": digest,
+        "outputs": {output_file: get_file_digest(output_file) for output_file in output_list}
+    }
+    write_fingerprints(phase_list)
@@ -5,19 +5,15 @@ import json
 import os
 from app.common import definitions, values
 from app.common.utilities import remove_bracketed_content
-from app.tools import emitter
+from app.tools import emitter, slice_store, fingerprint, parallel
 
 def extract_function_content(slice_file_path):
-    """Extract function content from a slice file"""
-    try:
-        with open(slice_file_path, 'r') as f:
-            return f.read().strip()
-    except FileNotFoundError:
-        print("\t\t\t[ERROR] Error extracting function content from {0}: [Errno 2] No such file or directory: '{1}'".format(slice_file_path, slice_file_path))
-        return None
-    except Exception as e:
-        print("\t\t\t[ERROR] Error extracting function content from {0}: {1}".format(slice_file_path, str(e)))
+    """Extract function content from the slice store"""
+    content = slice_store.read_slice(slice_file_path)
+    if content is None:
+        print("\t\t\t[ERROR] Error extracting function content from {0}: no slice stored for '{1}'".format(slice_file_path, slice_file_path))
         return None
+    return content.strip()
 
 def extract_function_line_numbers_from_project(project, source_file_path, function_name):
     """Extract start and end line numbers from existing project data"""
@@ -41,11 +37,12 @@ def extract_function_line_numbers_from_project(project, source_file_path, functi
         print("\t\t\t[WARNING] Could not extract line numbers from project data for function {0}: {1}".format(function_name, str(e)))
         return None
 
-def extract_function_line_numbers_fallback(source_file_path, function_name):
+def extract_function_line_numbers_fallback(source_file_path, function_name, ast_tree=None):
     """Fallback method to extract line numbers using AST parsing (for PB only when needed)"""
     try:
         from app.ast import ast_generator as ASTGenerator
-        ast_tree = ASTGenerator.get_ast_json(source_file_path, False, True)
+        if ast_tree is None:
+            ast_tree = ASTGenerator.get_ast_json(source_file_path, False, True)
         segment_type = ['FunctionDecl', 'CXXConstructorDecl', 'CXXMethodDecl']
         
         def find_function_lines(ast_node):
@@ -103,125 +100,213 @@ def extract_function_line_numbers_fallback(source_file_path, function_name):
         print("\t\t\t[WARNING] Could not extract line numbers from project data for function {0}: {1}".format(function_name, str(e)))
         return None
 
+def parse_clone_result(clone_result):
+    """Extract the PA and PC source files and function names of a clone result"""
+    if len(clone_result) < 2:
+        return None
+    pa_vector_path = clone_result[0]  # PA vector path
+    pc_vector_path = clone_result[1]  # PC vector path (matched function)
+
+    # Extract function information from vector paths
+    # PA vector: /path/PA/file.cc.func_FunctionName.vec
+    # PC vector: /path/PC/file.cc.func_FunctionName.vec
+    if '.func_' not in pa_vector_path or '.func_' not in pc_vector_path:
+        return None
+
+    pa_parts = pa_vector_path.split('.func_')
+    pc_parts = pc_vector_path.split('.func_')
+    return pa_parts[0], pa_parts[1].replace('.vec', ''), pc_parts[0], pc_parts[1].replace('.vec', '')
+
+def collect_line_ranges():
+    """Collect the function line ranges of PA, PB and PC known from the earlier phases"""
+    line_range_map = dict()
+    for project_name, project in [("PA", values.Project_A), ("PB", values.Project_B), ("PC", values.Project_C)]:
+        if not project or not hasattr(project, 'function_list'):
+            continue
+        for source_file_path, function_list in project.function_list.items():
+            for func_key, vector_obj in function_list.items():
+                line_range_map[(project_name, source_file_path, func_key)] = (vector_obj.start_line, vector_obj.end_line)
+    return line_range_map
+
+def get_function_lines(project_name, source_file_path, function_name, ast_cache):
+    """Look up line numbers in the published project data, parsing the AST once per file otherwise"""
+    line_range_map = parallel.get_published_data("line_range_map")
+    func_lines = line_range_map.get((project_name, source_file_path, "func_" + function_name), None)
+    if func_lines is not None or project_name == "PA":
+        return func_lines
+
+    print("\t\t\t📍 {0} project data not available, using fallback AST parsing...".format(project_name))
+    if source_file_path not in ast_cache:
+        from app.ast import ast_generator as ASTGenerator
+        try:
+            ast_cache[source_file_path] = ASTGenerator.get_ast_json(source_file_path, False, True)
+        except Exception as e:
+            print("\t\t\t[WARNING] Fallback AST parsing failed for {0}: {1}".format(source_file_path, str(e)))
+            ast_cache[source_file_path] = None
+    if ast_cache[source_file_path] is None:
+        return None
+    return extract_function_line_numbers_fallback(source_file_path, function_name, ast_cache[source_file_path])
+
+def build_function_triplet(clone_result, ast_cache):
+    """Build the triplet of one clone pair, None if the pair is not a function clone"""
+    try:
+        clone_info = parse_clone_result(clone_result)
+        if clone_info is None:
+            return None
+        pa_source_file, pa_function_name, pc_source_file, pc_function_name = clone_info
+
+        print("\t\t✅ Processing function pair:")
+        print("\t\t\t PA: {0} in {1}".format(pa_function_name, pa_source_file))
+        print("\t\t\t PC: {0} in {1}".format(pc_function_name, pc_source_file))
+
+        # Construct slice file paths using actual function names
+        pa_slice_file = "{0}.func.{1}.slice".format(pa_source_file, pa_function_name)
+        pb_slice_file = pa_source_file.replace('/PA/', '/PB/') + ".func.{0}.slice".format(pa_function_name)
+        pc_slice_file = "{0}.func.{1}.slice".format(pc_source_file, pc_function_name)
+
+        # Extract function content from each slice file
+        pa_content = extract_function_content(pa_slice_file)
+        pb_content = extract_function_content(pb_slice_file)
+        pc_content = extract_function_content(pc_slice_file)
+
+        # Extract line numbers for each version using existing project data
+        print("\t\t\t📍 Extracting line numbers from project data...")
+        pb_source_file = pa_source_file.replace('/PA/', '/PB/')
+
+        pa_lines = get_function_lines("PA", pa_source_file, pa_function_name, ast_cache)
+        pb_lines = get_function_lines("PB", pb_source_file, pa_function_name, ast_cache)
+        pc_lines = get_function_lines("PC", pc_source_file, pc_function_name, ast_cache)
+
+        if pa_lines:
+            print("\t\t\t📍 PA lines: {0}-{1}".format(pa_lines[0], pa_lines[1]))
+        if pb_lines:
+            print("\t\t\t📍 PB lines: {0}-{1}".format(pb_lines[0], pb_lines[1]))
+        if pc_lines:
+            print("\t\t\t📍 PC lines: {0}-{1}".format(pc_lines[0], pc_lines[1]))
+
+        # Create triplet with both PA and PC function names
+        triplet = {
+            "function_mapping": {
+                "pa_function_name": pa_function_name,
+                "pc_function_name": pc_function_name
+            },
+            "pa_pre_patch": {
+                "content": pa_content if pa_content is not None else "",
+                "source_file": pa_source_file,
+                "function_name": pa_function_name,
+                "start_line": pa_lines[0] if pa_lines else None,
+                "end_line": pa_lines[1] if pa_lines else None
+            },
+            "pb_post_patch": {
+                "content": pb_content if pb_content is not None else "",
+                "source_file": pb_source_file,
+                "function_name": pa_function_name,  # PB uses same name as PA
+                "start_line": pb_lines[0] if pb_lines else None,
+                "end_line": pb_lines[1] if pb_lines else None
+            },
+            "pc_pre_patch": {
+                "content": pc_content if pc_content is not None else "",
+                "source_file": pc_source_file,
+                "function_name": pc_function_name,
+                "start_line": pc_lines[0] if pc_lines else None,
+                "end_line": pc_lines[1] if pc_lines else None
+            },
+            "slice_files": {
+                "pa_slice": pa_slice_file,
+                "pb_slice": pb_slice_file,
+                "pc_slice": pc_slice_file
+            }
+        }
+        print("\t\t✅ Collected triplet for function pair: {0} -> {1}".format(pa_function_name, pc_function_name))
+        return triplet
+
+    except Exception as e:
+        print("\t\t❌ Error processing clone result: {0}".format(str(e)))
+        return None
+
+def group_clone_results(clone_list):
+    """Group clone pairs that share a source file, each group is collected by one worker"""
+    parent_map = dict()
+
+    def find_root(source_file_path):
+        while parent_map[source_file_path] != source_file_path:
+            parent_map[source_file_path] = parent_map[parent_map[source_file_path]]
+            source_file_path = parent_map[source_file_path]
+        return source_file_path
+
+    clone_source_list = list()
+    for clone_index, clone_result in enumerate(clone_list):
+        clone_info = parse_clone_result(clone_result)
+        if clone_info is None:
+            continue
+        pa_source_file, pa_function_name, pc_source_file, pc_function_name = clone_info
+        source_list = [pa_source_file, pa_source_file.replace('/PA/', '/PB/'), pc_source_file]
+        for source_file_path in source_list:
+            parent_map.setdefault(source_file_path, source_file_path)
+        for source_file_path in source_list[1:]:
+            parent_map[find_root(source_file_path)] = find_root(source_list[0])
+        clone_source_list.append((clone_index, pa_source_file))
+
+    group_map = dict()
+    for clone_index, pa_source_file in clone_source_list:
+        group_map.setdefault(find_root(pa_source_file), list()).append(clone_index)
+    return list(group_map.values())
+
+def collect_triplet_group(clone_index_list):
+    """Collect the triplets of one group of clone pairs, parsing each fallback AST once"""
+    clone_list = parallel.get_published_data("clone_list")
+    ast_cache = dict()
+    triplet_list = list()
+    for clone_index in clone_index_list:
+        triplet = build_function_triplet(clone_list[clone_index], ast_cache)
+        if triplet is not None:
+            triplet_list.append((clone_index, triplet))
+    return triplet_list
+
+def iterate_function_triplets(clone_list=None):
+    """Yield (clone index, triplet) as soon as the group of the pair has been collected"""
+    if clone_list is None:
+        # Use clone detection results from detection phase instead of finding slice files manually
+        from app.phases.detection import segment_clone_list
+        clone_list = segment_clone_list
+
+    if not clone_list:
+        print("\t\t❌ No clone detection results found")
+        return
+
+    print("\t\tFound {0} clone detection results".format(len(clone_list)))
+    group_list = group_clone_results(clone_list)
+    parallel.publish_data(clone_list=list(clone_list), line_range_map=collect_line_ranges())
+    for group_index, triplet_list in parallel.pool_imap_unordered(collect_triplet_group, group_list, chunk_size=1):
+        for clone_index, triplet in triplet_list:
+            yield clone_index, triplet
+
 def collect_function_triplets():
     """Collect function triplets using clone detection results"""
-    function_triplets = []
-    
-    # Use clone detection results from detection phase instead of finding slice files manually
-    from app.phases.detection import segment_clone_list
-    
-    if not segment_clone_list:
-        print("\t\t❌ No clone detection results found")
-        return function_triplets
-    
-    print("\t\tFound {0} clone detection results".format(len(segment_clone_list)))
-    
-    for clone_result in segment_clone_list:
-        if len(clone_result) >= 2:
-            pa_vector_path = clone_result[0]  # PA vector path
-            pc_vector_path = clone_result[1]  # PC vector path (matched function)
-            
-            # Extract function information from vector paths
-            # PA vector: /path/PA/file.cc.func_FunctionName.vec
-            # PC vector: /path/PC/file.cc.func_FunctionName.vec
-            
-            try:
-                # Extract PA function info
-                if '.func_' not in pa_vector_path:
-                    continue
-                    
-                pa_parts = pa_vector_path.split('.func_')
-                pa_source_file = pa_parts[0]
-                pa_function_name = pa_parts[1].replace('.vec', '')
-                
-                # Extract PC function info  
-                if '.func_' not in pc_vector_path:
-                    continue
-                    
-                pc_parts = pc_vector_path.split('.func_')
-                pc_source_file = pc_parts[0]
-                pc_function_name = pc_parts[1].replace('.vec', '')
-                
-                print("\t\t✅ Processing function pair:")
-                print("\t\t\t PA: {0} in {1}".format(pa_function_name, pa_source_file))
-                print("\t\t\t PC: {0} in {1}".format(pc_function_name, pc_source_file))
-                
-                # Construct slice file paths using actual function names
-                pa_slice_file = "{0}.func.{1}.slice".format(pa_source_file, pa_function_name)
-                pb_slice_file = pa_source_file.replace('/PA/', '/PB/') + ".func.{0}.slice".format(pa_function_name)
-                pc_slice_file = "{0}.func.{1}.slice".format(pc_source_file, pc_function_name)
-                
-                # Extract function content from each slice file
-                pa_content = extract_function_content(pa_slice_file)
-                pb_content = extract_function_content(pb_slice_file)
-                pc_content = extract_function_content(pc_slice_file)
-                
-                # Extract line numbers for each version using existing project data
-                print("\t\t\t📍 Extracting line numbers from project data...")
-                pb_source_file = pa_source_file.replace('/PA/', '/PB/')
-                
-                pa_lines = extract_function_line_numbers_from_project(values.Project_A, pa_source_file, pa_function_name)
-                pb_lines = extract_function_line_numbers_from_project(values.Project_B, pb_source_file, pa_function_name)
-                pc_lines = extract_function_line_numbers_from_project(values.Project_C, pc_source_file, pc_function_name)
-                
-                # Use fallback AST parsing for PB if project data is not available
-                if pb_lines is None:
-                    print("\t\t\t📍 PB project data not available, using fallback AST parsing...")
-                    pb_lines = extract_function_line_numbers_fallback(pb_source_file, pa_function_name)
-                
-                # Use fallback for PC if project data is not available
-                if pc_lines is None:
-                    print("\t\t\t📍 PC project data not available, using fallback AST parsing...")
-                    pc_lines = extract_function_line_numbers_fallback(pc_source_file, pc_function_name)
-                
-                if pa_lines:
-                    print("\t\t\t📍 PA lines: {0}-{1}".format(pa_lines[0], pa_lines[1]))
-                if pb_lines:
-                    print("\t\t\t📍 PB lines: {0}-{1}".format(pb_lines[0], pb_lines[1]))
-                if pc_lines:
-                    print("\t\t\t📍 PC lines: {0}-{1}".format(pc_lines[0], pc_lines[1]))
-                
-                # Create triplet with both PA and PC function names
-                triplet = {
-                    "function_mapping": {
-                        "pa_function_name": pa_function_name,
-                        "pc_function_name": pc_function_name
-                    },
-                    "pa_pre_patch": {
-                        "content": pa_content if pa_content is not None else "",
-                        "source_file": pa_source_file,
-                        "function_name": pa_function_name,
-                        "start_line": pa_lines[0] if pa_lines else None,
-                        "end_line": pa_lines[1] if pa_lines else None
-                    },
-                    "pb_post_patch": {
-                        "content": pb_content if pb_content is not None else "",
-                        "source_file": pb_source_file,
-                        "function_name": pa_function_name,  # PB uses same name as PA
-                        "start_line": pb_lines[0] if pb_lines else None,
-                        "end_line": pb_lines[1] if pb_lines else None
-                    },
-                    "pc_pre_patch": {
-                        "content": pc_content if pc_content is not None else "",
-                        "source_file": pc_source_file,
-                        "function_name": pc_function_name,
-                        "start_line": pc_lines[0] if pc_lines else None,
-                        "end_line": pc_lines[1] if pc_lines else None
-                    },
-                    "slice_files": {
-                        "pa_slice": pa_slice_file,
-                        "pb_slice": pb_slice_file,
-                        "pc_slice": pc_slice_file
-                    }
-                }
-                function_triplets.append(triplet)
-                print("\t\t✅ Collected triplet for function pair: {0} -> {1}".format(pa_function_name, pc_function_name))
-                
-            except Exception as e:
-                print("\t\t❌ Error processing clone result: {0}".format(str(e)))
-                continue
-    
-    return function_triplets
+    return [triplet for clone_index, triplet in sorted(iterate_function_triplets(), key=lambda x: x[0])]
+
+def stream_function_triplets(stream_file, on_triplet=None):
+    """Append each triplet to a JSON Lines file as it is collected, calling on_triplet for it"""
+    triplet_count = 0
+    with open(stream_file, 'w') as f:
+        for clone_index, triplet in iterate_function_triplets():
+            f.write(json.dumps({"clone_index": clone_index, "triplet": triplet}) + "\n")
+            f.flush()
+            triplet_count += 1
+            if on_triplet is not None:
+                on_triplet(clone_index, triplet)
+    return triplet_count
+
+def load_function_triplets_stream(stream_file):
+    """Read a triplet stream back in clone order, skipping a partially written last line"""
+    record_list = list()
+    with open(stream_file, 'r') as f:
+        for record_line in f:
+            if not record_line.endswith("\n"):
+                break
+            record = json.loads(record_line)
+            record_list.append((record["clone_index"], record["triplet"]))
+    return [triplet for clone_index, triplet in sorted(record_list, key=lambda x: x[0])]
 
 def save_function_triplets(function_triplets, output_file):
     """Save function triplets to JSON file"""
@@ -233,23 +318,38 @@ def save_function_triplets(function_triplets, output_file):
     except Exception as e:
         print("\t\t❌ Error saving function triplets: {0}".format(str(e)))
 
-def process_and_save_function_triplets():
+def process_and_save_function_triplets(on_triplet=None):
     """Main function to process and save function triplets"""
     emitter.title("Function Triplet Extraction")
     emitter.sub_title("Collecting Function Triplets")
     
-    # Collect function triplets
-    triplets = collect_function_triplets()
+    # Use the file path defined in definitions
+    output_file = definitions.FILE_FUNCTION_TRIPLETS
+    stream_file = definitions.FILE_FUNCTION_TRIPLETS_STREAM
+    
+    # Reuse the triplets of a previous run when clones and slices are unchanged; only the stream
+    # is fingerprinted, the JSON is rewritten by the Gemini phase and is rebuilt from the stream
+    input_list = [definitions.FILE_CLONE_INFO, definitions.FILE_SLICE_STORE]
+    output_list = [stream_file]
+    is_current, digest = fingerprint.check_phase(definitions.PHASE_EXTRACTION, input_list, output_list)
+    if is_current:
+        triplets = load_function_triplets_stream(stream_file)
+        print("\t\tInputs unchanged, reusing {0} triplets of previous run".format(len(triplets)))
+        save_function_triplets(triplets, output_file)
+        values.function_triplets = triplets
+        return triplets
+    
+    # Collect function triplets, each one is appended to the stream as soon as it is ready
+    stream_function_triplets(stream_file, on_triplet)
+    triplets = load_function_triplets_stream(stream_file)
     
     if not triplets:
         print("\t\t❌ No function triplets found")
         return
     
-    # Use the file path defined in definitions
-    output_file = definitions.FILE_FUNCTION_TRIPLETS
-    
-    # Save triplets to JSON
+    # Save triplets to JSON, in clone order, derived from the stream
     save_function_triplets(triplets, output_file)
+    fingerprint.record_phase(definitions.PHASE_EXTRACTION, digest, output_list)
     
     # Store in values for potential use by other phases
     values.function_triplets = triplets
@@ -4,9 +4,14 @@
 import argparse
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 
 import google.generativeai as genai
 from dotenv import load_dotenv
+from app.tools import llm_scheduler, llm_cache, llm_journal, patch_transplant
+
+
+MODEL_NAME = 'gemini-2.0-flash-exp'
 
 
 def load_environment_config():
@@ -26,7 +31,84 @@ def load_environment_config():
     return config
 
 
-def process_function_triplets_with_gemini(triplets_file, api_key, output_dir=None, method="semantic"):
+def build_function_prompt(triplet):
+    # Extract function content from the new format
+    function_a = triplet.get('pa_pre_patch', {}).get('content', '')
+    function_b = triplet.get('pb_post_patch', {}).get('content', '')
+    function_c = triplet.get('pc_pre_patch', {}).get('content', '')
+    
+    return f"""Generate a patch for the following code context:
+
+FUNCTION A (Original):
+{function_a}
+
+FUNCTION B (Target):
+{function_b}
+
+FUNCTION C (Current):
+{function_c}
+
+Generate a patch that transforms Function C to match the semantic behavior of Function B.
+Return only the corrected function code without explanations."""
+
+
+def configure_client(api_key, scheduler):
+    base_url = llm_scheduler.get_base_url()
+    if base_url:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": base_url})
+    else:
+        genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(MODEL_NAME)
+    request_options = dict()
+    if scheduler.request_timeout > 0:
+        request_options["timeout"] = scheduler.request_timeout
+    return model, request_options
+
+
+class TripletPrefetcher:
+    # sends the prompts of triplets as extraction yields them, the responses land in the response cache
+    # where the Gemini stage picks them up once function-triplets.json is complete
+
+    def __init__(self, api_key, cache):
+        self.scheduler = llm_scheduler.RequestScheduler()
+        self.model, self.request_options = configure_client(api_key, self.scheduler)
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=self.scheduler.concurrency)
+        self.future_list = []
+
+    def generate(self, prompt):
+        self.cache.get_or_generate(
+            MODEL_NAME, None, prompt,
+            lambda: self.scheduler.call(self.model.generate_content, prompt,
+                                        request_options=self.request_options).text
+        )
+
+    def submit(self, clone_index, triplet):
+        if patch_transplant.transplant_triplet(triplet) is not None:
+            return
+        self.future_list.append(self.executor.submit(self.generate, build_function_prompt(triplet)))
+
+    def finish(self):
+        # failed requests are not reported here, the Gemini stage sends them again
+        wait(self.future_list)
+        self.executor.shutdown()
+        prefetch_count = sum(1 for future in self.future_list if future.exception() is None)
+        print(f"Prefetched {prefetch_count} of {len(self.future_list)} model responses during extraction")
+
+
+def create_prefetcher():
+    # None when the Gemini stage would not send these prompts or could not reuse the responses
+    config = load_environment_config()
+    if not config['api_key'] or config['method'] != "function":
+        return None
+    cache = llm_cache.ResponseCache()
+    if not cache.enabled:
+        return None
+    return TripletPrefetcher(config['api_key'], cache)
+
+
+def process_function_triplets_with_gemini(triplets_file, api_key, output_dir=None, method="semantic", use_cache=True,
+                                          resume=True):
     try:
         with open(triplets_file, 'r') as f:
             data = json.load(f)
@@ -40,62 +122,84 @@ def process_function_triplets_with_gemini(triplets_file, api_key, output_dir=Non
         if not triplets:
             raise ValueError("No function triplets found in " + triplets_file)
         
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        scheduler = llm_scheduler.RequestScheduler()
+        model, request_options = configure_client(api_key, scheduler)
+        cache = llm_cache.ResponseCache(enabled=None if use_cache else False)
         
-        gemini_results = []
+        # Results are journaled as they complete, an interrupted run picks up the triplets left over
+        journal = llm_journal.ResultJournal(llm_journal.get_journal_file(triplets_file, "gemini"))
+        if not resume:
+            journal.reset()
+        key_list = [llm_journal.get_triplet_key(triplet, method) for triplet in triplets]
+        finished_results = journal.load(key_list)
+        if finished_results:
+            print(f"Resuming: {len(finished_results)} triplets already have results")
         
-        for i, triplet in enumerate(triplets):
-            try:
-                if method == "function":
-                    # Extract function content from the new format
-                    function_a = triplet.get('pa_pre_patch', {}).get('content', '')
-                    function_b = triplet.get('pb_post_patch', {}).get('content', '')  
-                    function_c = triplet.get('pc_pre_patch', {}).get('content', '')
-                    
-                    prompt = f"""Generate a patch for the following code context:
-
-FUNCTION A (Original):
-{function_a}
-
-FUNCTION B (Target):
-{function_b}
-
-FUNCTION C (Current):
-{function_c}
-
-Generate a patch that transforms Function C to match the semantic behavior of Function B.
-Return only the corrected function code without explanations."""
-                
-                    response = model.generate_content(prompt)
-                    patch_content = response.text.strip()
-                    
-                    triplet_id = triplet.get('function_mapping', {}).get('pa_function_name', f"triplet_{i}")
-                    
-                    gemini_results.append({
+        request_list = []
+        transplant_count = 0
+        if method == "function":
+            for i, triplet in enumerate(triplets):
+                if i in finished_results:
+                    continue
+                # PC matching PA modulo whitespace and renaming gets the mainline edit merged without the model
+                patched_content = patch_transplant.transplant_triplet(triplet)
+                if patched_content is not None:
+                    result = {
                         "triplet_index": i,
-                        "triplet_id": triplet_id,
-                        "method": method,
-                        "prompt": prompt,
-                        "generated_patch": patch_content
-                    })
-                    
-            except Exception as e:
-                print(f"Error processing triplet {i}: {e}")
-                continue
+                        "triplet_id": triplet.get('function_mapping', {}).get('pa_function_name', f"triplet_{i}"),
+                        "method": patch_transplant.TRANSPLANT_METHOD,
+                        "prompt": None,
+                        "generated_patch": patched_content.strip()
+                    }
+                    journal.append(i, key_list[i], result)
+                    finished_results[i] = result
+                    transplant_count += 1
+                else:
+                    request_list.append((i, triplet, build_function_prompt(triplet)))
+        if transplant_count:
+            print(f"Resolved {transplant_count} triplets without the model")
+        
+        def generate(request):
+            i, triplet, prompt = request
+            patch_content = cache.get_or_generate(
+                MODEL_NAME, None, prompt,
+                lambda: scheduler.call(model.generate_content, prompt, request_options=request_options).text
+            ).strip()
+            
+            triplet_id = triplet.get('function_mapping', {}).get('pa_function_name', f"triplet_{i}")
+            
+            return {
+                "triplet_index": i,
+                "triplet_id": triplet_id,
+                "method": method,
+                "prompt": prompt,
+                "generated_patch": patch_content
+            }
+        
+        def on_result(request_index, is_success, result):
+            i = request_list[request_index][0]
+            if is_success:
+                journal.append(i, key_list[i], result)
+                finished_results[i] = result
+            else:
+                print(f"Error processing triplet {i}: {result}")
+        
+        scheduler.map(generate, request_list, on_result)
+        gemini_results = [finished_results[i] for i in sorted(finished_results)]
+        if cache.enabled:
+            stats = cache.get_stats()
+            print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses")
         
         # Add gemini_results to the original data structure
         if isinstance(data, list):
-            # For list format, add gemini_results to each triplet
-            for i, result in enumerate(gemini_results):
-                if i < len(data):
-                    data[i]['gemini_result'] = result
+            # For list format, add each result to the triplet it was generated for
+            for result in gemini_results:
+                data[result['triplet_index']]['gemini_result'] = result
         else:
             # For dict format, add as separate key
             data['gemini_results'] = gemini_results
         
-        with open(triplets_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        llm_journal.write_json(triplets_file, data)
         
         return triplets_file
         
@@ -103,7 +207,7 @@ Return only the corrected function code without explanations."""
         raise RuntimeError(f"Failed to process with Gemini API: {e}")
 
 
-def integrate_gemini_patch_generation(output_dir, api_key=None, method=None):
+def integrate_gemini_patch_generation(output_dir, api_key=None, method=None, use_cache=True, resume=True):
     config = load_environment_config()
     
     if api_key is None:
@@ -128,7 +232,9 @@ def integrate_gemini_patch_generation(output_dir, api_key=None, method=None):
         triplets_file=triplets_file,
         api_key=api_key,
         output_dir=output_dir,
-        method=method
+        method=method,
+        use_cache=use_cache,
+        resume=resume
     )
     
     return patches_file
@@ -140,6 +246,8 @@ def generate_patches_with_gemini_cli():
     parser.add_argument("--api-key", help="Gemini API key (or configure in .env file)")
     parser.add_argument("--method", choices=["diff", "function", "both"], 
                        help="Generation method (or configure in .env file)")
+    parser.add_argument("--no-cache", action="store_true", help="Send every prompt to the API, bypassing the response cache")
+    parser.add_argument("--fresh", action="store_true", help="Discard results journaled by an interrupted run")
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose logging")
     
     args = parser.parse_args()
@@ -151,7 +259,9 @@ def generate_patches_with_gemini_cli():
         patches_file = integrate_gemini_patch_generation(
             output_dir=args.output_dir,
             api_key=args.api_key,
-            method=args.method
+            method=args.method,
+            use_cache=not args.no_cache,
+            resume=not args.fresh
         )
         print(f"Generated patches saved to: {patches_file}")
     except Exception as e:
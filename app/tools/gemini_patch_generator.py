@@ -15,6 +15,7 @@ import difflib
 from typing import Dict, List, Tuple, Optional, Any
 from google import genai
 from google.genai import types
+from app.tools import llm_scheduler, llm_cache, llm_journal, patch_transplant
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,16 +31,22 @@ class GeminiPatchGenerator:
     code versions.
     """
     
-    def __init__(self, api_key: str, model: str = "gemini-2.5-pro"):
+    def __init__(self, api_key: str, model: str = "gemini-2.5-pro",
+                 scheduler: Optional[llm_scheduler.RequestScheduler] = None,
+                 cache: Optional[llm_cache.ResponseCache] = None):
         """
         Initialize the Gemini Patch Generator.
         
         Args:
             api_key: Google AI API key for Gemini access
             model: Gemini model to use (default: gemini-2.5-pro)
+            scheduler: Request scheduler shared by concurrent generations (default: configured from env)
+            cache: Response cache consulted before any request (default: configured from env)
         """
         self.api_key = api_key
         self.model = model
+        self.scheduler = scheduler or llm_scheduler.RequestScheduler()
+        self.cache = cache or llm_cache.ResponseCache()
         self.client = None
         self._initialize_client()
     
@@ -48,7 +55,14 @@ class GeminiPatchGenerator:
         try:
             # Set API key as environment variable for the client
             os.environ['GOOGLE_API_KEY'] = self.api_key
-            self.client = genai.Client(api_key=self.api_key)
+            http_options = {}
+            base_url = llm_scheduler.get_base_url()
+            if base_url:
+                http_options["base_url"] = base_url
+            if self.scheduler.request_timeout > 0:
+                # milliseconds for a single HTTP request
+                http_options["timeout"] = int(self.scheduler.request_timeout * 1000)
+            self.client = genai.Client(api_key=self.api_key, http_options=types.HttpOptions(**http_options))
             logger.info(f"✅ Gemini API client initialized with model: {self.model}")
         except Exception as e:
             logger.error(f"❌ Failed to initialize Gemini client: {e}")
@@ -85,6 +99,21 @@ class GeminiPatchGenerator:
             **base_config
         )
     
+    def _generate_text(self, prompt: str, config: types.GenerateContentConfig) -> str:
+        """
+        Answer a prompt from the response cache, or send it through the scheduler:
+        rate limited, retried on 429/5xx, bounded by a deadline.
+        """
+        def generate():
+            return self.scheduler.call(
+                self.client.models.generate_content,
+                model=self.model,
+                contents=prompt,
+                config=config
+            ).text
+        
+        return self.cache.get_or_generate(self.model, config, prompt, generate)
+    
     def generate_unified_diff(self, pa_content: str, pb_content: str) -> str:
         """
         Generate unified diff between PA and PB versions.
@@ -186,13 +215,7 @@ Generate a unified diff patch for the older version (PC) that applies the same s
 
         try:
             config = self._get_generation_config("diff")
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=config
-            )
-            
-            generated_diff = response.text.strip()
+            generated_diff = self._generate_text(prompt, config).strip()
             
             # Extract diff from code blocks if present
             if "```diff" in generated_diff:
@@ -314,13 +337,7 @@ Provide ONLY the complete function code without additional explanations or code
 
         try:
             config = self._get_generation_config("function")
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=config
-            )
-            
-            generated_function = response.text.strip()
+            generated_function = self._generate_text(prompt, config).strip()
             
             # Clean up code blocks if present
             if "```cpp" in generated_function:
@@ -354,6 +371,60 @@ Provide ONLY the complete function code without additional explanations or code
                 "generated_function": None
             }
     
+    def transplant_patch(self, triplet_data: Dict[str, Any], method: str = "both") -> Optional[Dict[str, Any]]:
+        """
+        Resolve the triplet without the model when PC only renames or reformats PA.
+        
+        The PA → PB edit is merged into PC line by line with the identifier renaming applied.
+        
+        Args:
+            triplet_data: Function triplet data from FixMorph
+            method: Generation method ("diff", "function", or "both")
+            
+        Returns:
+            Result in the format of generate_patch, None if the triplet needs the model
+        """
+        pa_content = triplet_data["pa_pre_patch"]["content"]
+        pb_content = triplet_data["pb_post_patch"]["content"]
+        pc_content = triplet_data["pc_pre_patch"]["content"]
+        patched_content = patch_transplant.transplant_function(pa_content, pb_content, pc_content)
+        if patched_content is None:
+            return None
+        
+        logger.info("⚡ PC matches PA, patch transplanted without the model")
+        results = {
+            "input_triplet": triplet_data["function_mapping"],
+            "generation_timestamp": __import__('datetime').datetime.now().isoformat(),
+            "model_used": None,
+            "resolved_without_llm": True
+        }
+        reasoning = "PC equals PA modulo whitespace and identifier renaming, mainline edit merged mechanically"
+        
+        if method in ["diff", "both"]:
+            results["diff_based_result"] = {
+                "method": patch_transplant.TRANSPLANT_METHOD,
+                "success": True,
+                "generated_diff": patch_transplant.make_diff(pc_content, patched_content),
+                "mainline_diff": self.generate_unified_diff(pa_content, pb_content),
+                "reasoning": reasoning
+            }
+        
+        if method in ["function", "both"]:
+            results["function_generation_result"] = {
+                "method": patch_transplant.TRANSPLANT_METHOD,
+                "success": True,
+                "generated_function": patched_content,
+                "original_pc_function": pc_content,
+                "function_name": triplet_data["function_mapping"]["pc_function_name"],
+                "reasoning": reasoning
+            }
+        
+        if method == "both":
+            results["recommendation"] = "function_generation"
+            results["reason"] = "Deterministic transplant, both results are equivalent"
+        
+        return results
+    
     def generate_patch(self, triplet_data: Dict[str, Any], method: str = "both") -> Dict[str, Any]:
         """
         Generate patch for older version using specified method(s).
@@ -367,6 +438,11 @@ Provide ONLY the complete function code without additional explanations or code
         """
         logger.info(f"🚀 Starting patch generation using method: {method}")
         
+        # Triplets where PC matches PA never reach the network
+        transplant_result = self.transplant_patch(triplet_data, method)
+        if transplant_result is not None:
+            return transplant_result
+        
         # Extract function data
         pa_content = triplet_data["pa_pre_patch"]["content"]
         pb_content = triplet_data["pb_post_patch"]["content"]
@@ -410,8 +486,15 @@ Provide ONLY the complete function code without additional explanations or code
         return results
 
 
+def is_generation_successful(result: Dict[str, Any]) -> bool:
+    """Whether at least one generation method produced a patch for the triplet."""
+    return any(result.get(key, {}).get("success", False)
+               for key in ["function_generation_result", "diff_based_result"])
+
+
 def process_function_triplets_with_gemini(triplets_file: str, api_key: str, 
-                                        output_dir: str, method: str = "function") -> str:
+                                        output_dir: str, method: str = "function",
+                                        use_cache: bool = True, resume: bool = True) -> str:
     """
     Process function triplets and generate patches using Gemini API.
     
@@ -420,6 +503,8 @@ def process_function_triplets_with_gemini(triplets_file: str, api_key: str,
         api_key: Gemini API key
         output_dir: Directory to save generated patches
         method: Generation method ("diff", "function", or "both")
+        use_cache: Answer repeated prompts from the response cache (GEMINI_CACHE=0 also disables it)
+        resume: Skip triplets whose results were journaled by an interrupted run
         
     Returns:
         Path to generated patches file
@@ -430,59 +515,55 @@ def process_function_triplets_with_gemini(triplets_file: str, api_key: str,
     with open(triplets_file, 'r') as f:
         triplets = json.load(f)
     
-    # Initialize Gemini generator
-    generator = GeminiPatchGenerator(api_key)
+    # Initialize Gemini generator, triplets are processed concurrently
+    cache = None if use_cache else llm_cache.ResponseCache(enabled=False)
+    generator = GeminiPatchGenerator(api_key, cache=cache)
     
-    # Process each triplet
-    all_results = []
-    for i, triplet in enumerate(triplets):
-        logger.info(f"🔄 Processing triplet {i+1}/{len(triplets)}")
-        try:
-            result = generator.generate_patch(triplet, method=method)
-            all_results.append(result)
-        except Exception as e:
-            logger.error(f"❌ Failed to process triplet {i+1}: {e}")
-            all_results.append({
-                "input_triplet": triplet.get("function_mapping", {}),
-                "error": str(e),
-                "success": False
-            })
+    # Successful results are journaled as they complete, so a crash loses at most the requests in flight
+    journal = llm_journal.ResultJournal(llm_journal.get_journal_file(triplets_file, "gemini-patches"))
+    if not resume:
+        journal.reset()
+    key_list = [llm_journal.get_triplet_key(triplet, method) for triplet in triplets]
+    all_results = journal.load(key_list)
+    if all_results:
+        logger.info(f"⏩ Resuming: {len(all_results)}/{len(triplets)} triplets already have results")
+    pending_index_list = [i for i in range(len(triplets)) if i not in all_results]
     
-    # Update the original function-triplets.json file with Gemini results
-    # Load the original triplets again to get the full structure
-    with open(triplets_file, 'r') as f:
-        original_triplets = json.load(f)
+    def process_triplet(i):
+        return generator.generate_patch(triplets[i], method=method)
+    
+    def on_result(request_index, success, result):
+        i = pending_index_list[request_index]
+        logger.info(f"🔄 Processed triplet {i+1}/{len(triplets)}")
+        if not success:
+            logger.error(f"❌ Failed to process triplet {i+1}: {result}")
+            result = {
+                "input_triplet": triplets[i].get("function_mapping", {}),
+                "error": str(result),
+                "success": False
+            }
+        elif is_generation_successful(result):
+            journal.append(i, key_list[i], result)
+        all_results[i] = result
     
-    # Create a mapping from function names to results for easy lookup
-    results_map = {}
-    for result in all_results:
-        # Create a key using both PA and PC function names to match triplets
-        input_triplet = result.get("input_triplet", {})
-        pa_name = input_triplet.get("pa_function_name", "")
-        pc_name = input_triplet.get("pc_function_name", "")
-        key = f"{pa_name}::{pc_name}"
-        results_map[key] = result
+    generator.scheduler.map(process_triplet, pending_index_list, on_result)
     
     # Add Gemini results to each triplet
-    for triplet in original_triplets:
-        function_mapping = triplet.get("function_mapping", {})
-        pa_name = function_mapping.get("pa_function_name", "")
-        pc_name = function_mapping.get("pc_function_name", "")
-        key = f"{pa_name}::{pc_name}"
-        
+    for i, triplet in enumerate(triplets):
+        result = all_results.get(i)
         # Add Gemini result if available
-        if key in results_map:
+        if result is not None:
             triplet["gemini_patch_generation"] = {
-                "generation_timestamp": results_map[key].get("generation_timestamp"),
-                "model_used": results_map[key].get("model_used"),
-                "method": results_map[key].get("function_generation_result", {}).get("method") or 
-                         results_map[key].get("diff_generation_result", {}).get("method"),
-                "success": results_map[key].get("function_generation_result", {}).get("success") or 
-                          results_map[key].get("diff_generation_result", {}).get("success"),
-                "result": results_map[key].get("function_generation_result") or 
-                         results_map[key].get("diff_generation_result"),
-                "error": results_map[key].get("error") if not (results_map[key].get("function_generation_result", {}).get("success") or 
-                                                               results_map[key].get("diff_generation_result", {}).get("success")) else None
+                "generation_timestamp": result.get("generation_timestamp"),
+                "model_used": result.get("model_used"),
+                "method": result.get("function_generation_result", {}).get("method") or 
+                         result.get("diff_generation_result", {}).get("method"),
+                "success": result.get("function_generation_result", {}).get("success") or 
+                          result.get("diff_generation_result", {}).get("success"),
+                "result": result.get("function_generation_result") or 
+                         result.get("diff_generation_result"),
+                "error": result.get("error") if not (result.get("function_generation_result", {}).get("success") or 
+                                                     result.get("diff_generation_result", {}).get("success")) else None
             }
         else:
             # Mark as not processed by Gemini
@@ -495,18 +576,11 @@ def process_function_triplets_with_gemini(triplets_file: str, api_key: str,
                 "error": "Not processed by Gemini"
             }
     
-    # Save the updated triplets back to the original file
-    with open(triplets_file, 'w') as f:
-        json.dump(original_triplets, f, indent=2)
+    # Materialize the updated triplets from the journaled results
+    llm_journal.write_json(triplets_file, triplets)
     
     logger.info(f"✅ Gemini patch generation results added to: {triplets_file}")
-    
-    # Also create a backup of the separate results file for reference
-    backup_file = os.path.join(output_dir, "gemini-generated-patches-backup.json")
-    with open(backup_file, 'w') as f:
-        json.dump(all_results, f, indent=2)
-    
-    logger.info(f"📁 Backup of separate results saved to: {backup_file}")
+    generator.cache.log_stats()
     return triplets_file
 
 
@@ -515,13 +589,16 @@ if __name__ == "__main__":
     import sys
     
     if len(sys.argv) < 3:
-        print("Usage: python gemini_patch_generator.py <triplets_file> <api_key> [method]")
+        print("Usage: python gemini_patch_generator.py <triplets_file> <api_key> [method] [--no-cache] [--fresh]")
         print("Methods: diff, function, both (default: function)")
         sys.exit(1)
     
     triplets_file = sys.argv[1]
     api_key = sys.argv[2]
-    method = sys.argv[3] if len(sys.argv) > 3 else "function"
+    use_cache = "--no-cache" not in sys.argv
+    resume = "--fresh" not in sys.argv
+    argument_list = [argument for argument in sys.argv if argument not in ["--no-cache", "--fresh"]]
+    method = argument_list[3] if len(argument_list) > 3 else "function"
     output_dir = os.path.dirname(triplets_file)
     
-    process_function_triplets_with_gemini(triplets_file, api_key, output_dir, method)
+    process_function_triplets_with_gemini(triplets_file, api_key, output_dir, method, use_cache, resume)
@@ -3,13 +3,14 @@
 
 import io
 import os
+import shlex
 
 import json
 
 import app.common.utilities
-from app.common.utilities import execute_command, find_files, definitions, error_exit, remove_bracketed_content
-from app.tools import merger, slicer, parallel, emitter, finder, extractor
-from app.ast import ast_vector, ast_generator
+from app.common.utilities import find_files, definitions, error_exit, remove_bracketed_content
+from app.tools import merger, slicer, parallel, emitter, finder, extractor, slice_store, file_index, runner
+from app.ast import ast_generator
 from app.common import values, utilities
 
 def generate_slice_for_vector(vector_path, use_macro=False):
@@ -28,7 +29,7 @@ def generate_slice_for_vector(vector_path, use_macro=False):
         slicer.slice_source_file(source_file, seg_type, segment_identifier,
                                  project_path,
                                  True)
-    if not os.path.isfile(slice_file) or os.stat(slice_file).st_size == 0:
+    if not slice_store.read_slice(slice_file):
         return None
     return slice_file
 
@@ -48,7 +49,7 @@ def generate_similarity_score(vector_path_a, vector_path_c):
     ast_node_a = finder.search_function_node_by_name(ast_tree_a, segment_identifier_a)
     ast_node_c = finder.search_function_node_by_name(ast_tree_c, segment_identifier_c)
     app.common.utilities.generate_map_gumtree(source_file_a, source_file_c, map_file_name)
-    ast_node_map = parallel.read_mapping(map_file_name)
+    mapped_id_list_a, mapped_id_list_c = parallel.read_mapping_ids(map_file_name)
     utilities.restore_per_slice(slice_file_a)
     utilities.restore_per_slice(slice_file_c)
     if not ast_node_a or not ast_node_c:
@@ -58,11 +59,7 @@ def generate_similarity_score(vector_path_a, vector_path_c):
 
     node_size_a = len(id_list_a)
     node_size_c = len(id_list_c)
-    match_count = 0
-    for node_str_a in ast_node_map:
-        node_id_a = utilities.id_from_string(node_str_a)
-        if node_id_a in id_list_a:
-            match_count = match_count + 1
+    match_count = len(set(mapped_id_list_a).intersection(id_list_a))
     similarity = float(match_count / (node_size_a + node_size_c))
     emitter.information("Segment A Name: " + str(segment_identifier_a))
     emitter.information("Segment C Name: " + str(segment_identifier_c))
@@ -104,16 +101,17 @@ def iterate_path(source_path, project, file_extension, log_file):
     source_dir = source_path[:str(source_path).find(file_name)]
     source_dir = source_dir.replace(values.CONF_PATH_A, "")
     regex = file_name
-    find_files(project.path, file_extension, log_file, regex)
+    file_list = file_index.find_files(project.path, file_extension, regex)
 
-    while os.stat(log_file).st_size == 0:
+    while not file_list:
         source_dir = source_dir[:-1]
         regex = source_dir
-        find_files(project.path, file_extension, log_file, regex)
+        file_list = file_index.find_files(project.path, file_extension, regex)
         if "/" not in source_dir:
             break
         last_sub_dir = source_dir.split("/")[-1]
         source_dir = source_dir[:source_dir.find(last_sub_dir)]
+    utilities.write_file_list(file_list, log_file)
 
 
 def generate_segmentation(source_file, use_macro=False):
@@ -226,31 +224,26 @@ def create_vectors(project, source_file, segmentation_list):
         for function_name, begin_line, finish_line in filtered_function_list:
             function_name = "func_" + remove_bracketed_content(function_name)
             print("Function Name:", function_name, "Begin Line:", begin_line, "Finish Line:", finish_line)
-            project.function_list[source_file][function_name] = ast_vector.Vector(source_file, function_name,
-                                                                                  begin_line,
-                                                                                  finish_line, True)
+            project.add_vector("func", source_file, function_name, begin_line, finish_line)
 
         ast_generator.get_vars(project, source_file, definition_list)
 
     if values.IS_STRUCT:
         for struct_name, begin_line, finish_line in struct_list:
             struct_name = "struct_" + struct_name.split(";")[0]
-            project.struct_list[source_file][struct_name] = ast_vector.Vector(source_file, struct_name, begin_line,
-                                                                              finish_line, True)
+            project.add_vector("struct", source_file, struct_name, begin_line, finish_line)
 
     if values.IS_TYPEDEC:
         for var_name, begin_line, finish_line in decl_list:
             var_name = "var_" + var_name.split(";")[0]
             var_type = (var_name.split("(")[1]).split(")")[0]
             var_name = var_name.split("(")[0]
-            project.decl_list[source_file][var_name] = ast_vector.Vector(source_file, var_name, begin_line, finish_line,
-                                                                         True)
+            project.add_vector("var", source_file, var_name, begin_line, finish_line)
 
     if values.IS_MACRO:
         for macro_name, begin_line, finish_line in macro_list:
             macro_name = "macro_" + macro_name
-            project.macro_list[source_file][macro_name] = ast_vector.Vector(source_file, macro_name, begin_line,
-                                                                            finish_line, True)
+            project.add_vector("macro", source_file, macro_name, begin_line, finish_line)
 
     if values.IS_ENUM:
         count = 0
@@ -259,9 +252,7 @@ def create_vectors(project, source_file, segmentation_list):
             if "anonymous" in enum_name:
                 count = count + 1
                 enum_name = "enum_" + str(count)
-            project.enum_list[source_file][enum_name] = ast_vector.Vector(source_file, enum_name, begin_line,
-                                                                          finish_line,
-                                                                          True)
+            project.add_vector("enum", source_file, enum_name, begin_line, finish_line)
 
 
 def generate_vectors(file_extension, log_file, project, diff_file_list):
@@ -301,24 +292,7 @@ def generate_vectors(file_extension, log_file, project, diff_file_list):
 
 def generate_ast_json(file_path, use_macro=False):
     json_file = file_path + ".AST"
-    macro_list = values.TARGET_PRE_PROCESS_MACRO
-    if values.CONF_PATH_A in file_path:
-        macro_list = values.DONOR_PRE_PROCESS_MACRO
-    dump_command = definitions.APP_AST_DIFF + " -ast-dump-json "
-    if use_macro:
-        if values.CONF_PATH_A in file_path or values.CONF_PATH_B in file_path:
-            dump_command += " " + values.DONOR_PRE_PROCESS_MACRO.replace("--extra-arg-a", "--extra-arg") + "  "
-        else:
-            dump_command += " " + values.TARGET_PRE_PROCESS_MACRO.replace("--extra-arg-c", "--extra-arg") + "  "
-    dump_command += file_path
-    if file_path[-1] == 'h':
-        dump_command += " --"
-
-    error_file = definitions.DIRECTORY_OUTPUT + "/errors_AST_dump"
-    dump_command += " 2> " + error_file + " > " + json_file
-
-    return_code = execute_command(dump_command)
-    emitter.debug("return code:" + str(return_code))
+    ast_generator.ast_dump(file_path, json_file, False, use_macro)
     if os.stat(json_file).st_size == 0:
         return None
     with io.open(json_file, 'r', encoding='utf8', errors="ignore") as f:
@@ -329,9 +303,9 @@ def generate_ast_json(file_path, use_macro=False):
 def generate_untracked_file_list(output_file_path, project_path):
     file_list = list()
     emitter.normal("\t\texcluding untracked files...")
-    list_command = 'cd ' + project_path+ ';'
-    list_command += 'git ls-files --others --exclude-standard > ' +  output_file_path
-    execute_command(list_command)
+    list_command = ["git", "-C", project_path, "ls-files", "--others", "--exclude-standard"]
+    emitter.command(" ".join(list_command))
+    runner.run(list_command, "git", output_file_path, definitions.FILE_ERROR_LOG)
     emitter.normal("\t\tuntracked files:")
     with open(output_file_path, 'r') as output_file:
         file_name = output_file.readline().strip()
@@ -348,16 +322,15 @@ def generate_edit_script(file_a, file_b, output_file):
     name_a = file_a.split("/")[-1]
     emitter.normal("\t\t\tgenerating transformation script")
     try:
-        extra_arg = ""
-        if file_a[-1] == 'h':
-            extra_arg = " --"
-        command = definitions.DIFF_COMMAND + " -s=" + definitions.DIFF_SIZE + " -dump-matches "
+        command = [definitions.DIFF_COMMAND.strip(), "-s=" + definitions.DIFF_SIZE, "-dump-matches"]
         if values.DONOR_REQUIRE_MACRO:
-            command += " " + values.DONOR_PRE_PROCESS_MACRO + " "
-            command += " " + values.DONOR_PRE_PROCESS_MACRO.replace("--extra-arg-a", "--extra-arg-c") + " "
-        command += file_a + " " + file_b + extra_arg + " 2> output/errors_clang_diff "
-        command += " > " + output_file
-        execute_command(command, False)
+            command += shlex.split(values.DONOR_PRE_PROCESS_MACRO)
+            command += shlex.split(values.DONOR_PRE_PROCESS_MACRO.replace("--extra-arg-a", "--extra-arg-c"))
+        command += [file_a, file_b]
+        if file_a[-1] == 'h':
+            command.append("--")
+        emitter.command(" ".join(command))
+        runner.run(command, "gumtree", output_file, "output/errors_clang_diff")
     except Exception as e:
         error_exit(e, "Unexpected fail at generating edit script: " + output_file)
 
@@ -366,11 +339,11 @@ def generate_edit_diff(file_a, file_b, output_file):
     name_a = file_a.split("/")[-1]
     emitter.normal("\t\t\tgenerating edit diff")
     try:
-        command = definitions.LINUX_DIFF_COMMAND
+        command = [definitions.LINUX_DIFF_COMMAND.strip()]
         if values.DEFAULT_OPERATION_MODE == 2:
-            command += " --context=" + str(values.DEFAULT_CONTEXT_LEVEL) + " "
-        command += file_a + " " + file_b + " 2> output/errors_linux_diff "
-        command += " > " + output_file
-        execute_command(command, False)
+            command.append("--context=" + str(values.DEFAULT_CONTEXT_LEVEL))
+        command += [file_a, file_b]
+        emitter.command(" ".join(command))
+        runner.run(command, "diff", output_file, "output/errors_linux_diff")
     except Exception as e:
         error_exit(e, "Unexpected fail at generating edit script: " + output_file)
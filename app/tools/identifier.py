@@ -9,7 +9,18 @@ import collections
 from app.common import values
 from app.tools import oracle, merger
 from app.tools import converter, generator as Gen, emitter, finder, extractor
-from app.ast import ast_vector, ast_generator
+from app.ast import ast_generator
+from app.entity import symbol_table
+
+
+def get_symbol_table(source_path):
+    project = values.Project_C
+    if values.Project_D.path in source_path:
+        project = values.Project_D
+    if project.symbol_table is None:
+        project.symbol_table = symbol_table.SymbolTable(values.TARGET_REQUIRE_MACRO)
+    return project.symbol_table
+
 
 def identify_missing_labels(neighborhood_a, neighborhood_b, neighborhood_c, insert_node_b, source_path_b, var_map):
     emitter.normal("\t\t\tanalysing for missing labels")
@@ -40,7 +51,7 @@ def identify_missing_functions(ast_node, source_path_b, source_path_d, ast_tree_
     emitter.normal("\t\t\tanalysing for missing function calls")
     missing_function_info = dict()
     call_list_b = extractor.extract_call_node_list(ast_node)
-    function_list_c = extractor.extract_function_node_list(ast_tree_c)
+    function_list_c = get_symbol_table(source_path_d).get_function_list(source_path_d, ast_tree_c)
     source_path_a = source_path_b.replace(values.CONF_PATH_B, values.CONF_PATH_A)
     macro_list = extractor.extract_macro_node_list(ast_node)
     missing_function_list = dict()
@@ -49,10 +60,8 @@ def identify_missing_functions(ast_node, source_path_b, source_path_d, ast_tree_
             macro_value = macro_node['value']
             if "(" in macro_value:
                 function_name = macro_value.split("(")[0]
-                if function_name in function_list_c.keys():
-                    function_node = function_list_c[function_name]
-                    signature_node = function_node['children'][0]
-                    num_param = len(signature_node['children'])
+                if function_name in function_list_c:
+                    num_param = function_list_c[function_name]
                     num_args = len(macro_value.replace(function_name, "").split(","))
                     if num_args == num_param:
                         continue
@@ -64,10 +73,8 @@ def identify_missing_functions(ast_node, source_path_b, source_path_d, ast_tree_
         function_ref_node = call_expr['children'][0]
         if "value" in function_ref_node.keys():
             function_name = function_ref_node['value']
-            if function_name in function_list_c.keys():
-                function_node = function_list_c[function_name]
-                signature_node = function_node['children'][0]
-                num_param = len(signature_node['children']) - 1
+            if function_name in function_list_c:
+                num_param = function_list_c[function_name] - 1
                 num_args = len(call_expr['children'][0]) - 1
                 if num_args == num_param:
                     continue
@@ -120,14 +127,12 @@ def identify_missing_var(neighborhood_a, neighborhood_b, neighborhood_c, ast_nod
     ref_list = extractor.extract_reference_node_list(ast_node_b)
     dec_list_local_a = extractor.extract_decl_node_list(neighborhood_a)
     dec_list_local_b = extractor.extract_decl_node_list(neighborhood_b)
-    source_path_c = source_path_d.replace(values.Project_D.path, values.CONF_PATH_C)
     dec_list_local_c = extractor.extract_decl_node_list(neighborhood_c)
     ast_tree_a = ast_generator.get_ast_json(source_path_a)
     ast_tree_b = ast_generator.get_ast_json(source_path_b)
-    ast_tree_c = ast_generator.get_ast_json(source_path_c)
     dec_list_global_a = extractor.extract_decl_node_list_global(ast_tree_a)
     dec_list_global_b = extractor.extract_decl_node_list_global(ast_tree_b)
-    dec_list_global_c = extractor.extract_decl_node_list_global(ast_tree_c)
+    dec_list_global_c = get_symbol_table(source_path_d).get_global_list(source_path_d)
     enum_list_b = extractor.extract_enum_node_list(ast_tree_b)
     if ast_node_b['type'] == "Macro":
         if "value" in ast_node_b:
@@ -150,10 +155,10 @@ def identify_missing_var(neighborhood_a, neighborhood_b, neighborhood_c, ast_nod
                     else:
                         var_list.append(identifier)
                 for identifier in var_list:
-                    if identifier not in set(list(dec_list_local_c.keys()) + list(dec_list_global_c.keys())):
+                    if identifier not in set(list(dec_list_local_c.keys()) + list(dec_list_global_c)):
                         is_mapping = (identifier in var_map) and \
                                      (var_map[identifier] in set(
-                                         list(dec_list_local_c.keys()) + list(dec_list_global_c.keys())))
+                                         list(dec_list_local_c.keys()) + list(dec_list_global_c)))
                         if identifier not in missing_var_list.keys():
                             info = dict()
                             info['ref_list'] = [neighborhood_b['value']]
@@ -208,7 +213,7 @@ def identify_missing_var(neighborhood_a, neighborhood_b, neighborhood_c, ast_nod
                 ref_type = str(ref_node['ref_type'])
                 identifier = str(ref_node['value']).strip().replace("\n", "").replace(" ", "")
                 if ref_type == "VarDecl":
-                    if identifier not in set(list(dec_list_local_c.keys()) + list(dec_list_global_c.keys())):
+                    if identifier not in set(list(dec_list_local_c.keys()) + list(dec_list_global_c)):
                         if identifier not in missing_var_list.keys():
                             info = dict()
                             info['ref_list'] = [neighborhood_b['value']]
@@ -219,7 +224,7 @@ def identify_missing_var(neighborhood_a, neighborhood_b, neighborhood_c, ast_nod
                                 info['pre-exist'] = True
                                 is_mapping = (identifier in var_map) and \
                                              (var_map[identifier] in set(
-                                                 list(dec_list_local_c.keys()) + list(dec_list_global_c.keys())))
+                                                 list(dec_list_local_c.keys()) + list(dec_list_global_c)))
                                 info['map-exist'] = is_mapping
                                 info['is_global'] = False
                                 info['target-file'] = source_path_d
@@ -229,7 +234,7 @@ def identify_missing_var(neighborhood_a, neighborhood_b, neighborhood_c, ast_nod
                                 info['pre-exist'] = True
                                 is_mapping = (identifier in var_map) and \
                                              (var_map[identifier] in set(
-                                                 list(dec_list_local_c.keys()) + list(dec_list_global_c.keys())))
+                                                 list(dec_list_local_c.keys()) + list(dec_list_global_c)))
                                 info['map-exist'] = is_mapping
                                 info['ast-node'] = dec_list_global_b[identifier]
                                 info['target-file'] = source_path_d
@@ -239,7 +244,7 @@ def identify_missing_var(neighborhood_a, neighborhood_b, neighborhood_c, ast_nod
                                 info['pre-exist'] = False
                                 is_mapping = (identifier in var_map) and \
                                              (var_map[identifier] in set(
-                                                 list(dec_list_local_c.keys()) + list(dec_list_global_c.keys())))
+                                                 list(dec_list_local_c.keys()) + list(dec_list_global_c)))
                                 info['map-exist'] = is_mapping
                                 info['ast-node'] = dec_list_local_b[identifier]
                                 info['target-file'] = source_path_d
@@ -249,7 +254,7 @@ def identify_missing_var(neighborhood_a, neighborhood_b, neighborhood_c, ast_nod
                                 info['pre-exist'] = False
                                 is_mapping = (identifier in var_map) and \
                                              (var_map[identifier] in set(
-                                                 list(dec_list_local_c.keys()) + list(dec_list_global_c.keys())))
+                                                 list(dec_list_local_c.keys()) + list(dec_list_global_c)))
                                 info['map-exist'] = is_mapping
                                 info['ast-node'] = dec_list_global_b[identifier]
                                 info['target-file'] = source_path_d
@@ -290,7 +295,7 @@ def identify_missing_var(neighborhood_a, neighborhood_b, neighborhood_c, ast_nod
                                 info['enum-value'] = enum_value_int
                                 is_mapping = (identifier in var_map) and \
                                              (var_map[identifier] in set(
-                                                 list(dec_list_local_c.keys()) + list(dec_list_global_c.keys())))
+                                                 list(dec_list_local_c.keys()) + list(dec_list_global_c)))
                                 info['map-exist'] = is_mapping
                                 info['pre-exist'] = True
                                 info['is_global'] = False
@@ -307,7 +312,7 @@ def identify_missing_data_types(ast_tree_a, ast_tree_b, ast_tree_c, ast_node_b,
     ref_list = extractor.extract_reference_node_list(ast_node_b)
     type_def_node_list_a = extractor.extract_typedef_node_list(ast_tree_a)
     type_def_node_list_b = extractor.extract_typedef_node_list(ast_tree_b)
-    type_def_node_list_c = extractor.extract_typedef_node_list(ast_tree_c)
+    type_def_node_list_c = get_symbol_table(source_path_d).get_type_list(source_path_d, ast_tree_c)
     source_path_c = source_path_d.replace(values.Project_D.path, values.CONF_PATH_C)
 
     for ref_node in ref_list:
@@ -462,8 +467,7 @@ def identify_missing_macros(ast_node, source_file, target_file, namespace_map_ke
     emitter.normal("\t\t\tanalysing for missing macros")
     missing_macro_list = dict()
     node_type = str(ast_node['type'])
-    target_macro_def_list = list(converter.convert_macro_list_to_dict(
-        extractor.extract_macro_definitions(target_file)).keys())
+    target_macro_def_list = list(get_symbol_table(target_file).get_macro_list(target_file))
     target_macro_ref_list = extractor.extract_macro_ref_list(ast_tree_global_c)
     if node_type == "Macro":
         node_macro_list = extractor.extract_macro_definition(ast_node, source_file, target_file)
@@ -733,84 +737,106 @@ def separate_segment(project, source_file, use_macro=False):
     return enum_list, function_list, macro_list, struct_list, type_def_list, def_list, decl_list
 
 
+def merge_line_ranges(line_range_list):
+    merged_list = list()
+    for start_line, end_line in sorted(line_range_list):
+        if merged_list and start_line <= merged_list[-1][1]:
+            if end_line > merged_list[-1][1]:
+                merged_list[-1][1] = end_line
+            continue
+        merged_list.append([start_line, end_line])
+    return merged_list
+
+
+def find_intersecting_segments(segment_range_list, line_range_list):
+    # sweep segments sorted by their first line over the merged, disjoint hunk ranges
+    intersect_list = set()
+    merged_list = merge_line_ranges(line_range_list)
+    range_index = 0
+    for begin_line, finish_line, segment_key in sorted(segment_range_list, key=lambda x: x[0]):
+        while range_index < len(merged_list) and merged_list[range_index][1] < begin_line:
+            range_index += 1
+        if range_index == len(merged_list):
+            break
+        if merged_list[range_index][0] <= finish_line:
+            intersect_list.add(segment_key)
+    return intersect_list
+
+
 def create_vectors(project, source_file, segmentation_list, pertinent_lines, out_file_path):
     emitter.normal("\t\t\tcreating vectors for neighborhoods")
     neighbor_list = list()
     enum_list, function_list, macro_list, \
     struct_list, type_def_list, def_list, decl_list = segmentation_list
-    for function_name, begin_line, finish_line in function_list:
+    segment_range_list = list()
+    for segment_type, segment_list in [("func", function_list), ("struct", struct_list), ("var", decl_list),
+                                       ("macro", macro_list), ("enum", enum_list)]:
+        for index, (segment_name, begin_line, finish_line) in enumerate(segment_list):
+            segment_range_list.append((begin_line, finish_line, (segment_type, index)))
+    intersect_list = find_intersecting_segments(segment_range_list, pertinent_lines)
+
+    for index, (function_name, begin_line, finish_line) in enumerate(function_list):
         function_name = "func_" + remove_bracketed_content(function_name)
-        print("Function Name:", function_name, "Begin Line:", begin_line, "Finish Line:", finish_line, "pertinent lines:", pertinent_lines)
-        for start_line, end_line in pertinent_lines:
-            if is_intersect(begin_line, finish_line, start_line, end_line):
-                values.IS_FUNCTION = True
-                if source_file not in project.function_list.keys():
-                    project.function_list[source_file] = dict()
-                if function_name not in project.function_list[source_file]:
-                    emitter.success("\t\t\tFunction: " + function_name.replace("func_", ""))
-                    neighbor_list.append(function_name)
-                    print("generating vector for:", source_file, function_name)
-                    project.function_list[source_file][function_name] = ast_vector.Vector(source_file, function_name,
-                                                                                          begin_line, finish_line, True)
-
-    for struct_name, begin_line, finish_line in struct_list:
+        if ("func", index) in intersect_list:
+            values.IS_FUNCTION = True
+            if source_file not in project.function_list.keys():
+                project.function_list[source_file] = dict()
+            if function_name not in project.function_list[source_file]:
+                emitter.success("\t\t\tFunction: " + function_name.replace("func_", ""))
+                neighbor_list.append(function_name)
+                print("generating vector for:", source_file, function_name)
+                project.add_vector("func", source_file, function_name, begin_line, finish_line)
+
+    for index, (struct_name, begin_line, finish_line) in enumerate(struct_list):
         struct_name = "struct_" + struct_name.split(";")[0]
-        for start_line, end_line in pertinent_lines:
-            if is_intersect(begin_line, finish_line, start_line, end_line):
-                values.IS_STRUCT = True
-                if source_file not in project.struct_list.keys():
-                    project.struct_list[source_file] = dict()
-                if struct_name not in project.struct_list[source_file]:
-                    emitter.success("\t\t\tStruct: " + struct_name.replace("struct_", ""))
-                    neighbor_list.append(struct_name)
-                    project.struct_list[source_file][struct_name] = ast_vector.Vector(source_file, struct_name,
-                                                                                      begin_line, finish_line, True)
-
-    for var_name, begin_line, finish_line in decl_list:
+        if ("struct", index) in intersect_list:
+            values.IS_STRUCT = True
+            if source_file not in project.struct_list.keys():
+                project.struct_list[source_file] = dict()
+            if struct_name not in project.struct_list[source_file]:
+                emitter.success("\t\t\tStruct: " + struct_name.replace("struct_", ""))
+                neighbor_list.append(struct_name)
+                project.add_vector("struct", source_file, struct_name, begin_line, finish_line)
+
+    for index, (var_name, begin_line, finish_line) in enumerate(decl_list):
         var_name = "var_" + var_name.split(";")[0]
         var_type = (var_name.split("(")[1]).split(")")[0]
         var_name = var_name.split("(")[0]
-        for start_line, end_line in pertinent_lines:
-            if is_intersect(begin_line, finish_line, start_line, end_line):
-                values.IS_TYPEDEC = True
-                if source_file not in project.decl_list.keys():
-                    project.decl_list[source_file] = dict()
-                if var_name not in project.decl_list[source_file]:
-                    emitter.success("\t\t\tVariable: " + var_name.replace("var_", ""))
-                    neighbor_list.append(var_name)
-                    project.decl_list[source_file][var_name] = ast_vector.Vector(source_file, var_name,
-                                                                                 begin_line, finish_line, True)
-
-    for macro_name, begin_line, finish_line in macro_list:
+        if ("var", index) in intersect_list:
+            values.IS_TYPEDEC = True
+            if source_file not in project.decl_list.keys():
+                project.decl_list[source_file] = dict()
+            if var_name not in project.decl_list[source_file]:
+                emitter.success("\t\t\tVariable: " + var_name.replace("var_", ""))
+                neighbor_list.append(var_name)
+                project.add_vector("var", source_file, var_name, begin_line, finish_line)
+
+    for index, (macro_name, begin_line, finish_line) in enumerate(macro_list):
         macro_name = "macro_" + macro_name
-        for start_line, end_line in pertinent_lines:
-            if is_intersect(begin_line, finish_line, start_line, end_line):
-                values.IS_MACRO = True
-                if source_file not in project.macro_list.keys():
-                    project.macro_list[source_file] = dict()
-                if macro_name not in project.macro_list[source_file]:
-                    emitter.success("\t\t\tMacro: " + macro_name.replace("macro_", ""))
-                    neighbor_list.append(macro_name)
-                    project.macro_list[source_file][macro_name] = ast_vector.Vector(source_file, macro_name,
-                                                                                    begin_line, finish_line, True)
+        if ("macro", index) in intersect_list:
+            values.IS_MACRO = True
+            if source_file not in project.macro_list.keys():
+                project.macro_list[source_file] = dict()
+            if macro_name not in project.macro_list[source_file]:
+                emitter.success("\t\t\tMacro: " + macro_name.replace("macro_", ""))
+                neighbor_list.append(macro_name)
+                project.add_vector("macro", source_file, macro_name, begin_line, finish_line)
 
     count = 0
-    for enum_name, begin_line, finish_line in enum_list:
+    for index, (enum_name, begin_line, finish_line) in enumerate(enum_list):
         enum_name = "enum_" + enum_name.split(";")[0]
         if "anonymous" in enum_name:
             count = count + 1
             enum_name = "enum_" + str(count)
-        for start_line, end_line in pertinent_lines:
-            if is_intersect(begin_line, finish_line, start_line, end_line):
-                values.IS_ENUM = True
-
-                if source_file not in project.enum_list.keys():
-                    project.enum_list[source_file] = dict()
-                if enum_name not in project.enum_list[source_file]:
-                    emitter.success("\t\t\tEnum: " + enum_name.replace("enum_", ""))
-                    neighbor_list.append(enum_name)
-                    project.enum_list[source_file][enum_name] = ast_vector.Vector(source_file, enum_name,
-                                                                                  begin_line, finish_line, True)
+        if ("enum", index) in intersect_list:
+            values.IS_ENUM = True
+
+            if source_file not in project.enum_list.keys():
+                project.enum_list[source_file] = dict()
+            if enum_name not in project.enum_list[source_file]:
+                emitter.success("\t\t\tEnum: " + enum_name.replace("enum_", ""))
+                neighbor_list.append(enum_name)
+                project.add_vector("enum", source_file, enum_name, begin_line, finish_line)
 
     with open(out_file_path, "w") as out_file:
         for neighbor_name in neighbor_list:
@@ -0,0 +1,156 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' On-disk cache of model responses keyed by model, generation config and normalized prompt '''
+
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from app.common import definitions
+
+logger = logging.getLogger(__name__)
+
+# seconds, 0 keeps entries until they are evicted for size
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_MB = 256
+# eviction frees space down to this share of the limit, so it does not run on every store
+EVICTION_TARGET = 0.9
+DISABLED_VALUE_LIST = ["0", "false", "no", "off"]
+
+
+def get_config_data(config):
+    if config is None:
+        return None
+    if hasattr(config, "model_dump"):
+        return config.model_dump(mode="json", exclude_none=True)
+    if isinstance(config, dict):
+        return config
+    return repr(config)
+
+
+def normalize_prompt(prompt):
+    # line endings and trailing blanks do not change what the model is asked
+    line_list = prompt.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in line_list).strip()
+
+
+def get_key(model, config, prompt):
+    key_data = json.dumps([model, get_config_data(config), normalize_prompt(prompt)], sort_keys=True)
+    return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+
+    def __init__(self, file_path=None, ttl=None, max_mb=None, enabled=None):
+        if enabled is None:
+            enabled = os.getenv("GEMINI_CACHE", "1").strip().lower() not in DISABLED_VALUE_LIST
+        if ttl is None:
+            ttl = float(os.getenv("GEMINI_CACHE_TTL", DEFAULT_TTL))
+        if max_mb is None:
+            max_mb = float(os.getenv("GEMINI_CACHE_MAX_MB", DEFAULT_MAX_MB))
+        self.file_path = file_path or definitions.FILE_LLM_CACHE
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_size = int(max_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.hit_count = 0
+        self.miss_count = 0
+        self.store_count = 0
+        self.eviction_count = 0
+        if self.enabled:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            with self.lock:
+                connection = self.connect()
+                with connection:
+                    self.remove_expired(connection)
+                connection.close()
+
+    def connect(self):
+        connection = sqlite3.connect(self.file_path, timeout=30)
+        connection.execute("CREATE TABLE IF NOT EXISTS response "
+                           "(key TEXT PRIMARY KEY, text TEXT, size INTEGER, created REAL, accessed REAL)")
+        return connection
+
+    def remove_expired(self, connection):
+        if self.ttl <= 0:
+            return
+        cursor = connection.execute("DELETE FROM response WHERE created < ?", (time.time() - self.ttl,))
+        self.eviction_count += cursor.rowcount
+
+    def evict(self, connection):
+        # least recently used entries go first
+        total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM response").fetchone()[0]
+        if total_size <= self.max_size:
+            return
+        target_size = self.max_size * EVICTION_TARGET
+        for key, size in connection.execute("SELECT key, size FROM response ORDER BY accessed").fetchall():
+            if total_size <= target_size:
+                break
+            connection.execute("DELETE FROM response WHERE key = ?", (key,))
+            total_size -= size
+            self.eviction_count += 1
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                row = connection.execute("SELECT text, created FROM response WHERE key = ?", (key,)).fetchone()
+                now = time.time()
+                if row is not None and self.ttl > 0 and row[1] < now - self.ttl:
+                    connection.execute("DELETE FROM response WHERE key = ?", (key,))
+                    self.eviction_count += 1
+                    row = None
+                if row is None:
+                    self.miss_count += 1
+                else:
+                    connection.execute("UPDATE response SET accessed = ? WHERE key = ?", (now, key))
+                    self.hit_count += 1
+            connection.close()
+        return None if row is None else row[0]
+
+    def put(self, key, text):
+        if not self.enabled:
+            return
+        size = len(text.encode("utf-8"))
+        if size > self.max_size:
+            return
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                now = time.time()
+                connection.execute("INSERT OR REPLACE INTO response (key, text, size, created, accessed) "
+                                   "VALUES (?, ?, ?, ?, ?)", (key, text, size, now, now))
+                self.store_count += 1
+                self.evict(connection)
+            connection.close()
+
+    def get_or_generate(self, model, config, prompt, generate):
+        # generate() returns the response text, it only runs on a miss
+        if not self.enabled:
+            return generate()
+        key = get_key(model, config, prompt)
+        text = self.get(key)
+        if text is None:
+            text = generate()
+            self.put(key, text)
+        return text
+
+    def get_stats(self):
+        return {
+            "enabled": self.enabled,
+            "hits": self.hit_count,
+            "misses": self.miss_count,
+            "stores": self.store_count,
+            "evictions": self.eviction_count
+        }
+
+    def log_stats(self):
+        if self.enabled:
+            logger.info(f"Response cache: {self.hit_count} hits, {self.miss_count} misses, "
+                        f"{self.store_count} stored, {self.eviction_count} evicted")
@@ -0,0 +1,83 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Append-only journal of per-triplet model results, used to resume and to materialize the final JSON '''
+
+import os
+import json
+import hashlib
+import threading
+
+TRIPLET_INPUT_KEY_LIST = ["function_mapping", "pa_pre_patch", "pb_post_patch", "pc_pre_patch"]
+BLOCK_SIZE = 64 * 1024
+
+
+def get_journal_file(triplets_file, name):
+    return os.path.splitext(triplets_file)[0] + "-" + name + ".jsonl"
+
+
+def get_triplet_key(triplet, method):
+    # only the inputs of the request, results attached to the triplet by an earlier run do not count
+    key_data = json.dumps([method] + [triplet.get(key, None) for key in TRIPLET_INPUT_KEY_LIST], sort_keys=True)
+    return hashlib.sha1(key_data.encode("utf-8")).hexdigest()
+
+
+def write_json(file_path, data):
+    with open(file_path + ".tmp", 'w') as json_file:
+        json.dump(data, json_file, indent=2)
+    os.replace(file_path + ".tmp", file_path)
+
+
+class ResultJournal:
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.lock = threading.Lock()
+        self.truncate_torn_line()
+
+    def truncate_torn_line(self):
+        # an interrupted run can leave a partial last line, appending to it would tear the next entry as well
+        if not os.path.isfile(self.file_path):
+            return
+        with open(self.file_path, 'rb+') as journal_file:
+            end = journal_file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - BLOCK_SIZE)
+                journal_file.seek(start)
+                block = journal_file.read(position - start)
+                newline = block.rfind(b"\n")
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                journal_file.truncate(position)
+
+    def load(self, key_list):
+        # index -> result of every journaled triplet whose inputs still match
+        result_list = dict()
+        if not os.path.isfile(self.file_path):
+            return result_list
+        with open(self.file_path, 'r') as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                index = entry.get("triplet_index", None)
+                if isinstance(index, int) and 0 <= index < len(key_list) and entry.get("key") == key_list[index]:
+                    result_list[index] = entry["result"]
+        return result_list
+
+    def reset(self):
+        with self.lock:
+            if os.path.isfile(self.file_path):
+                os.remove(self.file_path)
+
+    def append(self, index, key, result):
+        line = json.dumps({"triplet_index": index, "key": key, "result": result}) + "\n"
+        with self.lock:
+            with open(self.file_path, 'a') as journal_file:
+                journal_file.write(line)
+                journal_file.flush()
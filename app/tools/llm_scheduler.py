@@ -0,0 +1,197 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Concurrent model requests with a token bucket, retries with backoff and per-request deadlines '''
+
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from google.api_core import exceptions as api_exceptions
+except ImportError:
+    api_exceptions = None
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_LIST = [429, 500, 502, 503, 504]
+# google.api_core exception class name -> HTTP status, for errors raised without a numeric code
+API_EXCEPTION_STATUS_LIST = [
+    ("TooManyRequests", 429),
+    ("ResourceExhausted", 429),
+    ("InternalServerError", 500),
+    ("BadGateway", 502),
+    ("ServiceUnavailable", 503),
+    ("GatewayTimeout", 504)
+]
+
+DEFAULT_CONCURRENCY = 4
+# requests per minute, 0 disables the limit
+DEFAULT_RATE_LIMIT = 60
+DEFAULT_MAX_RETRIES = 5
+# seconds per request, retries and waiting for the bucket included
+DEFAULT_REQUEST_TIMEOUT = 300
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+
+class RequestDeadlineExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+
+    def __init__(self, rate_limit):
+        # rate_limit requests per minute, halved on every 429 and recovered step by step on success
+        self.max_rate = rate_limit / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(1.0, self.max_rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, deadline=None):
+        if self.max_rate <= 0:
+            return True
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait_time = (1 - self.tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait_time > deadline:
+                return False
+            time.sleep(wait_time)
+
+    def on_throttle(self):
+        if self.max_rate <= 0:
+            return
+        with self.lock:
+            self.refill()
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self.tokens = 0
+
+    def on_success(self):
+        if self.max_rate <= 0:
+            return
+        with self.lock:
+            self.refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+def get_env_number(name, default, value_type=int):
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return value_type(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid {name}={value}")
+        return default
+
+
+def get_status_code(exception):
+    # only typed status fields count, numbers in the error message do not
+    for attribute in ["code", "status_code"]:
+        status = getattr(exception, attribute, None)
+        if isinstance(status, int) and not isinstance(status, bool):
+            return int(status)
+    response = getattr(exception, "response", None)
+    status = getattr(response, "status_code", None)
+    if isinstance(status, int) and not isinstance(status, bool):
+        return int(status)
+    if api_exceptions is not None:
+        for class_name, status in API_EXCEPTION_STATUS_LIST:
+            exception_class = getattr(api_exceptions, class_name, None)
+            if exception_class is not None and isinstance(exception, exception_class):
+                return status
+    return None
+
+
+def is_retryable(exception):
+    if isinstance(exception, (TimeoutError, ConnectionError)):
+        return True
+    return get_status_code(exception) in RETRY_STATUS_LIST
+
+
+def get_backoff(attempt):
+    # exponential with full jitter over the upper half
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class RequestScheduler:
+
+    def __init__(self, concurrency=None, rate_limit=None, max_retries=None, request_timeout=None):
+        if concurrency is None:
+            concurrency = get_env_number("GEMINI_CONCURRENCY", DEFAULT_CONCURRENCY)
+        if rate_limit is None:
+            rate_limit = get_env_number("GEMINI_RATE_LIMIT", DEFAULT_RATE_LIMIT, float)
+        if max_retries is None:
+            max_retries = get_env_number("GEMINI_MAX_RETRIES", DEFAULT_MAX_RETRIES)
+        if request_timeout is None:
+            request_timeout = get_env_number("GEMINI_REQUEST_TIMEOUT", DEFAULT_REQUEST_TIMEOUT, float)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self.request_timeout = request_timeout
+        self.bucket = TokenBucket(rate_limit)
+
+    def call(self, function, *args, **kwargs):
+        # one model request: waits for the bucket, retries 429/5xx with backoff until the deadline
+        deadline = time.monotonic() + self.request_timeout if self.request_timeout > 0 else None
+        attempt = 0
+        while True:
+            if not self.bucket.acquire(deadline):
+                raise RequestDeadlineExceeded(f"deadline of {self.request_timeout}s passed waiting for the rate limit")
+            try:
+                result = function(*args, **kwargs)
+                self.bucket.on_success()
+                return result
+            except Exception as exception:
+                status = get_status_code(exception)
+                if status == 429:
+                    self.bucket.on_throttle()
+                if attempt >= self.max_retries or not is_retryable(exception):
+                    raise
+                delay = get_backoff(attempt)
+                if deadline is not None and time.monotonic() + delay > deadline:
+                    raise RequestDeadlineExceeded(f"deadline of {self.request_timeout}s passed after "
+                                                  f"{attempt + 1} attempts: {exception}")
+                logger.warning(f"Request failed with status {status}, retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def map(self, function, item_list, on_result=None):
+        # runs function over item_list on the thread pool, results come back in item order as
+        # (is_success, result or exception); on_result(index, is_success, value) is called on completion
+        result_list = [None] * len(item_list)
+        if not item_list:
+            return result_list
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(item_list))) as executor:
+            future_map = {executor.submit(function, item): index for index, item in enumerate(item_list)}
+            for future in as_completed(future_map):
+                index = future_map[future]
+                try:
+                    result_list[index] = (True, future.result())
+                except Exception as exception:
+                    result_list[index] = (False, exception)
+                if on_result is not None:
+                    on_result(index, *result_list[index])
+        return result_list
+
+
+def get_base_url():
+    # lets the clients talk to a local fake endpoint
+    base_url = os.getenv("GEMINI_BASE_URL")
+    if base_url and base_url.strip():
+        return base_url.strip()
+    return None
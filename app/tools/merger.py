@@ -3,7 +3,8 @@
 
 
 from app.common.utilities import error_exit
-from app.ast import ast_obj
+from app.common import definitions
+from app.ast import ast_obj, edit_script
 from app.tools import emitter, finder, extractor
 
 
@@ -87,176 +88,159 @@ def merge_data_type_info(info_a, info_b):
 
 def merge_ast_script(ast_script, ast_node_a, ast_node_b, mapping_ba):
     emitter.normal("\t\tmerging AST script")
+    ast_script = edit_script.load_script(ast_script)
+    merge_key = (id(ast_node_a), id(ast_node_b), id(mapping_ba))
+    if merge_key in ast_script.merge_cache:
+        return ast_script.merge_cache[merge_key][1]
     merged_ast_script = list()
-    inserted_node_list = list()
-    deleted_node_list = list()
-    replace_node_list = list()
+    merged_insert_list = dict()
+    removed_index_list = set()
+    inserted_node_list = set()
     try:
         ast_tree_a = ast_obj.load_from_map(ast_node_a)
         ast_tree_b = ast_obj.load_from_map(ast_node_b)
     except:
         return None
-    for script_line in ast_script:
-        if "Insert" in script_line:
-            node_id_a = int(((script_line.split(" into ")[0]).split("(")[1]).split(")")[0])
-            node_id_b = int(((script_line.split(" into ")[1]).split("(")[1]).split(")")[0])
+    node_index_a = ast_script.get_node_index(ast_node_a)
+    node_index_b = ast_script.get_node_index(ast_node_b)
+
+    def append_operation(operation):
+        if operation.kind == definitions.INSERT:
+            for node_id in (operation.node_id, operation.target_id):
+                if node_id not in merged_insert_list:
+                    merged_insert_list[node_id] = list()
+                merged_insert_list[node_id].append(len(merged_ast_script))
+        merged_ast_script.append(operation)
+
+    for script_op in ast_script:
+        if script_op.kind == definitions.INSERT:
+            node_id_a = script_op.node_id
+            node_id_b = script_op.target_id
             if node_id_b in inserted_node_list or node_id_b == 0:
-                inserted_node_list.append(node_id_a)
+                inserted_node_list.add(node_id_a)
                 if node_id_b == 0:
-                    merged_ast_script.append(script_line)
+                    append_operation(script_op)
                 continue
-            insert_node = finder.search_ast_node_by_id(ast_node_b, node_id_a)
+            insert_node = node_index_b.get(node_id_a)
             target_node_id_a = mapping_ba[node_id_b]
-            target_node = finder.search_ast_node_by_id(ast_node_a, target_node_id_a)
-            insert_position = int((script_line.split(" at ")[1]))
-            del_op = "Delete " + str(target_node['type']) + "(" + str(target_node_id_a) + ")\n"
-            possible_replacement_node = finder.search_ast_node_by_id(ast_node_a, target_node_id_a)
-            parent_node = finder.search_ast_node_by_id(ast_node_a, int(possible_replacement_node['parent_id']))
-            del_parent_op = "Delete " + str(parent_node['type']) + "(" + str(parent_node['id']) + ")\n"
-            if del_op in ast_script:
-                replace_node_str = str(insert_node['type']) + "(" + str(node_id_a) + ")"
-                target_node_str = str(possible_replacement_node['type']) + "(" + str(target_node_id_a) + ")"
-                script_line = "Replace " + target_node_str + " with " + replace_node_str
-                inserted_node_list.append(node_id_a)
-            elif del_parent_op in ast_script:
-                replace_node_str = str(insert_node['type']) + "(" + str(node_id_a) + ")"
-                target_node_str = str(possible_replacement_node['type']) + "(" + str(target_node_id_a) + ")"
-                script_line = "Replace " + target_node_str + " with " + replace_node_str
+            possible_replacement_node = node_index_a.get(target_node_id_a)
+            parent_node = node_index_a.get(int(possible_replacement_node['parent_id']))
+            if ast_script.has_operation(definitions.DELETE, target_node_id_a, possible_replacement_node['type']):
+                script_op = edit_script.EditOperation(definitions.REPLACE,
+                                                      possible_replacement_node['type'], target_node_id_a,
+                                                      insert_node['type'], node_id_a)
+                inserted_node_list.add(node_id_a)
+            elif ast_script.has_operation(definitions.DELETE, parent_node['id'], parent_node['type']):
+                script_op = edit_script.EditOperation(definitions.REPLACE,
+                                                      possible_replacement_node['type'], target_node_id_a,
+                                                      insert_node['type'], node_id_a)
 
             if node_id_b not in inserted_node_list:
-                merged_ast_script.append(script_line)
+                append_operation(script_op)
             # mark all child-ids as inserted since merging and avoid update
-            child_id_list = extractor.extract_child_id_list(insert_node)
-            inserted_node_list = list(set(child_id_list + inserted_node_list))
-            inserted_node_list.append(node_id_a)
-        elif "Delete" in script_line:
-            merged_ast_script.append(script_line)
-        elif "Move" in script_line:
-            move_position = int((script_line.split(" at ")[1]))
-            move_node_str = (script_line.split(" into ")[0]).replace("Move ", "")
-            move_node_id_b = int((move_node_str.split("(")[1]).split(")")[0])
+            inserted_node_list.update(edit_script.get_child_id_list(insert_node))
+            inserted_node_list.add(node_id_a)
+        elif script_op.kind == definitions.DELETE:
+            append_operation(script_op)
+        elif script_op.kind in [definitions.MOVE, definitions.UPDATEMOVE]:
+            move_position = script_op.position
+            move_node_id_b = script_op.node_id
             move_node_id_a = mapping_ba[move_node_id_b]
-            move_node_b = finder.search_ast_node_by_id(ast_node_b, move_node_id_b)
-            move_node_a = finder.search_ast_node_by_id(ast_node_a, move_node_id_a)
+            move_node_b = node_index_b.get(move_node_id_b)
+            move_node_a = node_index_a.get(move_node_id_a)
             move_node_type_b = move_node_b['type']
             move_node_type_a = move_node_a['type']
             if move_node_type_b == "CaseStmt":
                 continue
-            target_node_id_b = int(((script_line.split(" into ")[1]).split("(")[1]).split(")")[0])
+            target_node_id_b = script_op.target_id
 
             if target_node_id_b in inserted_node_list or move_node_id_b in inserted_node_list:
-                replace_node_str = str(move_node_a['type']) + "(" + str(move_node_id_a) + ")"
-                target_node_str = str(move_node_b['type']) + "(" + str(move_node_id_b) + ")"
-                script_line = "Replace " + target_node_str + " with " + replace_node_str
-
-                merged_ast_script.append(script_line)
-                for script_line in merged_ast_script:
-                    if str(target_node_id_b) in script_line and "Insert" in script_line:
-                        merged_ast_script.remove(script_line)
+                script_op = edit_script.EditOperation(definitions.REPLACE,
+                                                      move_node_b['type'], move_node_id_b,
+                                                      move_node_a['type'], move_node_id_a)
+                append_operation(script_op)
+                # only inserts of exactly this node or into it are dropped, matching the id as a substring
+                # of the whole line also hit other ids and insert positions
+                removed_index_list.update(merged_insert_list.pop(target_node_id_b, []))
                 continue
             target_node_id_a = mapping_ba[target_node_id_b]
-            target_node_a = finder.search_ast_node_by_id(ast_node_a, target_node_id_a)
-            target_node_str = target_node_a['type'] + "(" + str(target_node_a['id']) + ")"
-            if move_node_type_a != move_node_type_b:
-                script_line = "Insert " + move_node_str + " into " + target_node_str + " at " + str(move_position)
-            if len(target_node_a['children']) <= move_position:
-                script_line = "Insert " + move_node_str + " into " + target_node_str + " at " + str(move_position)
-
-            elif len(target_node_a['children']) > move_position:
+            target_node_a = node_index_a.get(target_node_id_a)
+            if move_node_type_a != move_node_type_b or len(target_node_a['children']) <= move_position:
+                script_op = edit_script.EditOperation(definitions.INSERT,
+                                                      script_op.node_type, move_node_id_b,
+                                                      target_node_a['type'], target_node_a['id'],
+                                                      move_position)
+            if len(target_node_a['children']) > move_position:
                 possible_replacement_node = target_node_a['children'][move_position]
                 replacement_node_id = possible_replacement_node['id']
-                del_op = "Delete " + str(possible_replacement_node['type']) + "(" + str(replacement_node_id) + ")\n"
-                if del_op in ast_script:
-                    replace_node_str = str(move_node_b['type']) + "(" + str(move_node_b['id']) + ")"
-                    target_node_str = str(possible_replacement_node['type']) + "(" + str(replacement_node_id) + ")"
-                    script_line = "Replace " + target_node_str + " with " + replace_node_str
-                    deleted_node_list.append(replacement_node_id)
-                    child_id_list = extractor.extract_child_id_list(possible_replacement_node)
-                    deleted_node_list = deleted_node_list + child_id_list
-
-            else:
-                replacing_node = target_node_a['children'][move_position]
-                replacing_node_id = replacing_node['id']
-                replacing_node_str = replacing_node['type'] + "(" + str(replacing_node['id']) + ")"
-                script_line = "Replace " + replacing_node_str + " with " + move_node_str
-                deleted_node_list.append(replacing_node_id)
-                child_id_list = extractor.extract_child_id_list(replacing_node)
-                deleted_node_list = deleted_node_list + child_id_list
-                inserted_node_list.append(replacing_node_id)
-            merged_ast_script.append(script_line)
-        elif "Update" in script_line:
-            target_node_str = (script_line.split(" to ")[0]).replace("Update ", "")
-            target_node_id = int((target_node_str.split("(")[1]).split(")")[0])
-            target_node = finder.search_ast_node_by_id(ast_node_a, target_node_id)
-            replace_node_str = script_line.split(" to ")[1]
-            replace_node_id = int((replace_node_str.split("(")[1]).split(")")[0])
-            replace_node = finder.search_ast_node_by_id(ast_node_b, replace_node_id)
-
-            if "TypeLoc" in script_line:
+                if ast_script.has_operation(definitions.DELETE, replacement_node_id,
+                                            possible_replacement_node['type']):
+                    script_op = edit_script.EditOperation(definitions.REPLACE,
+                                                          possible_replacement_node['type'], replacement_node_id,
+                                                          move_node_b['type'], move_node_b['id'])
+            append_operation(script_op)
+        elif script_op.kind == definitions.UPDATE:
+            if "TypeLoc" in script_op.line:
                 continue
-            if replace_node_id not in inserted_node_list:
-                merged_ast_script.append(script_line)
+            if script_op.target_id not in inserted_node_list:
+                append_operation(script_op)
+
+    merged_ast_script = [merged_ast_script[i] for i in range(len(merged_ast_script))
+                         if i not in removed_index_list]
+    replace_count = dict()
+    for script_op in merged_ast_script:
+        if script_op.kind == definitions.REPLACE:
+            node_key = (script_op.node_type, script_op.node_id)
+            replace_count[node_key] = replace_count.get(node_key, 0) + 1
 
     second_merged_ast_script = list()
+    parent_replace_list = set()
     inserted_node_list = dict()
-    for script_line in merged_ast_script:
-        # print(script_line)
-        if "Replace" in script_line:
-            # print(script_line)
-            node_id_a = int(((script_line.split(" with ")[0]).split("(")[1]).split(")")[0])
-            node_id_b = int(((script_line.split(" with ")[1]).split("(")[1]).split(")")[0])
-            node_a = finder.search_ast_node_by_id(ast_node_a, node_id_a)
-            parent_node_id_a = int(node_a['parent_id'])
-            parent_node_a = finder.search_ast_node_by_id(ast_node_a, parent_node_id_a)
+    for script_op in merged_ast_script:
+        if script_op.kind == definitions.REPLACE:
+            node_a = node_index_a.get(script_op.node_id)
+            parent_node_a = node_index_a.get(int(node_a['parent_id']))
             if len(parent_node_a['children']) > 0:
                 count = 0
                 for child_node in parent_node_a['children']:
-                    replace_op = "Replace " + child_node['type'] + "(" + str(child_node['id']) + ")"
-                    count += sum(replace_op in s for s in merged_ast_script)
+                    count += replace_count.get((str(child_node['type']), int(child_node['id'])), 0)
                 if count > 1:
-                    node_b = finder.search_ast_node_by_id(ast_node_b, node_id_b)
-                    parent_node_id_b = int(node_b['parent_id'])
-                    parent_node_b = finder.search_ast_node_by_id(ast_node_b, parent_node_id_b)
-                    parent_node_str_a = parent_node_a['type'] + "(" + str(parent_node_a['id']) + ")"
-                    parent_node_str_b = parent_node_b['type'] + "(" + str(parent_node_b['id']) + ")"
-                    new_op = "Replace " + parent_node_str_a + " with " + parent_node_str_b + "\n"
-                    if new_op not in second_merged_ast_script:
+                    node_b = node_index_b.get(script_op.target_id)
+                    parent_node_b = node_index_b.get(int(node_b['parent_id']))
+                    new_op = edit_script.EditOperation(definitions.REPLACE,
+                                                       parent_node_a['type'], parent_node_a['id'],
+                                                       parent_node_b['type'], parent_node_b['id'])
+                    new_op.line += "\n"
+                    if new_op.line not in parent_replace_list:
+                        parent_replace_list.add(new_op.line)
                         second_merged_ast_script.append(new_op)
                 else:
-                    second_merged_ast_script.append(script_line)
+                    second_merged_ast_script.append(script_op)
             else:
-                second_merged_ast_script.append(script_line)
-        elif "Update" in script_line:
-            update_line = str(script_line).replace("Update", "Replace").replace(" to ", " with ")
-            # print(update_line)
-            second_merged_ast_script.append(update_line)
-
-        elif "Insert" in script_line:
-            node_id_a = int(((script_line.split(" into ")[0]).split("(")[1]).split(")")[0])
-            node_id_b = int(((script_line.split(" into ")[1]).split("(")[1]).split(")")[0])
-            new_insert_node = finder.search_ast_node_by_id(ast_node_b, node_id_a)
+                second_merged_ast_script.append(script_op)
+        elif script_op.kind == definitions.UPDATE:
+            update_line = str(script_op.line).replace("Update", "Replace").replace(" to ", " with ")
+            second_merged_ast_script.append(edit_script.EditOperation(definitions.REPLACE,
+                                                                      script_op.node_type, script_op.node_id,
+                                                                      script_op.target_type, script_op.target_id,
+                                                                      line=update_line))
+
+        elif script_op.kind == definitions.INSERT:
+            node_id_a = script_op.node_id
+            node_id_b = script_op.target_id
+            new_insert_node = node_index_b.get(node_id_a)
+            insert_key = (new_insert_node['type'], new_insert_node['start line'], new_insert_node['parent_id'])
             if node_id_b not in inserted_node_list:
-                inserted_node_list[node_id_b] = list()
-            inserted_node_list_target = inserted_node_list[node_id_b]
-            if not inserted_node_list_target:
-                inserted_node_list[node_id_b] = [node_id_a]
-                second_merged_ast_script.append(script_line)
-            else:
-                is_duplicate = False
-                for inserted_node_id in inserted_node_list_target:
-                    inserted_node = finder.search_ast_node_by_id(ast_node_b, inserted_node_id)
-                    if (inserted_node['type'] == new_insert_node['type']) and \
-                        (inserted_node['start line'] == new_insert_node['start line'])and \
-                        (inserted_node['parent_id'] == new_insert_node['parent_id']):
-                        is_duplicate = True
-                        break
-                if not is_duplicate:
-                    inserted_node_list[node_id_b].append(node_id_a)
-                    second_merged_ast_script.append(script_line)
+                inserted_node_list[node_id_b] = set()
+            if insert_key not in inserted_node_list[node_id_b]:
+                inserted_node_list[node_id_b].add(insert_key)
+                second_merged_ast_script.append(script_op)
 
         else:
-            second_merged_ast_script.append(script_line)
+            second_merged_ast_script.append(script_op)
 
+    # the inputs are held with the result so their ids cannot be reused while cached
+    ast_script.merge_cache[merge_key] = ((ast_node_a, ast_node_b, mapping_ba), second_merged_ast_script)
     return second_merged_ast_script
 
 
@@ -1,20 +1,197 @@
+import os
+import re
+import atexit
+import pickle
+import tempfile
 import multiprocessing as mp
+from array import array
 
 import app.common.utilities
 from app.common import definitions, values, utilities
-from app.tools import converter, emitter, finder, extractor
+from app.tools import converter, emitter, finder, extractor, runner
 from app.ast import ast_generator
 
 BREAK_LIST = [",", " ", " _", ";", "\n"]
+SNAPSHOT_TYPE_LIST = (str, int, float, bool, type(None))
+MATCH_PREFIX = definitions.MATCH + " "
+NODE_ID_PATTERN = re.compile(r"\((\d+)\)\s*$")
+MAPPING_CHUNK_SIZE = 4 * 1024 * 1024
+
+pool = None
+pool_pid = None
+pool_size = 0
+# version of the published data the workers received when the pool was forked
+pool_version = 0
+published_data = dict()
+published_version = 0
+# (version, pickle file) of the published data for workers forked before it was published
+published_handle = None
+
+
+def get_pool_size():
+    if values.CONF_WORKERS > 0:
+        return values.CONF_WORKERS
+    return mp.cpu_count()
+
+
+def remove_published_file():
+    global published_handle
+    if published_handle is not None and pool_pid == os.getpid():
+        try:
+            os.remove(published_handle[1])
+        except OSError:
+            pass
+    published_handle = None
+
+
+def publish_data(**data):
+    # read-only data for the workers, a running pool is kept and its workers load the new version once
+    global published_data, published_version
+    remove_published_file()
+    published_data = data
+    published_version += 1
+
+
+def get_published_handle():
+    # forked workers already hold the version published before the fork, later versions go through a file
+    global published_handle
+    if published_version == pool_version:
+        return None
+    if published_handle is None:
+        file_descriptor, file_path = tempfile.mkstemp(prefix="published-", suffix=".pickle",
+                                                      dir=definitions.DIRECTORY_TMP or None)
+        with os.fdopen(file_descriptor, 'wb') as published_file:
+            pickle.dump(published_data, published_file, pickle.HIGHEST_PROTOCOL)
+        published_handle = (published_version, file_path)
+    return published_handle
+
+
+def load_published_data(handle):
+    global published_data, published_version
+    if handle is None or handle[0] == published_version:
+        return
+    with open(handle[1], 'rb') as published_file:
+        published_data = pickle.load(published_file)
+    published_version = handle[0]
+
+
+def get_published_data(key):
+    return published_data[key]
+
+
+def get_pool():
+    # one pool per run, forked on first use and reused by every phase
+    global pool, pool_pid, pool_size, pool_version
+    if pool is None:
+        pool_size = get_pool_size()
+        emitter.normal("\t\tstarting process pool with " + str(pool_size) + " workers")
+        pool = mp.Pool(pool_size)
+        pool_pid = os.getpid()
+        pool_version = published_version
+    return pool
+
+
+def shutdown_pool():
+    global pool, pool_pid
+    if pool is None or pool_pid != os.getpid():
+        return
+    pool.close()
+    pool.join()
+    remove_published_file()
+    pool = None
+    pool_pid = None
+
+
+atexit.register(shutdown_pool)
 
 
-def collect_result(result):
-    global result_list
-    result_list.append(result)
+def get_state_snapshot():
+    # workers are forked once, so the simple settings are shipped with every task
+    snapshot = list()
+    for module in [values, definitions]:
+        state = dict()
+        for name, value in vars(module).items():
+            if name.startswith("_") or not isinstance(value, SNAPSHOT_TYPE_LIST):
+                continue
+            state[name] = value
+        snapshot.append(state)
+    return snapshot
+
+
+def apply_state_snapshot(snapshot):
+    for module, state in zip([values, definitions], snapshot):
+        for name, value in state.items():
+            if getattr(module, name, None) != value:
+                setattr(module, name, value)
+
+
+def run_task_chunk(snapshot, handle, function, arg_chunk):
+    apply_state_snapshot(snapshot)
+    load_published_data(handle)
+    result_chunk = list()
+    for index, args in arg_chunk:
+        try:
+            result_chunk.append((index, True, function(*args)))
+        except Exception as exception:
+            result_chunk.append((index, False, str(exception)))
+    # the command counters of the worker travel back with the results
+    return result_chunk, runner.pop_stats()
+
+
+def get_task_chunks(function, arg_list, chunk_size, handle=None):
+    snapshot = get_state_snapshot()
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(arg_list) // (get_pool_size() * 4)))
+    task_list = list()
+    for start in range(0, len(arg_list), chunk_size):
+        arg_chunk = [(index, arg_list[index]) for index in range(start, min(start + chunk_size, len(arg_list)))]
+        task_list.append((snapshot, handle, function, arg_chunk))
+    return task_list
+
+
+def run_chunk_task(task):
+    return run_task_chunk(*task)
+
+
+def pool_imap_unordered(function, arg_list, chunk_size=None):
+    # yields (index, result) of each task as its chunk completes, failed tasks are reported and skipped
+    arg_list = [args if isinstance(args, tuple) else (args,) for args in arg_list]
+    if not arg_list:
+        return
+    if pool_pid is not None and pool_pid != os.getpid():
+        chunk_iterator = map(run_chunk_task, get_task_chunks(function, arg_list, chunk_size))
+    else:
+        process_pool = get_pool()
+        task_list = get_task_chunks(function, arg_list, chunk_size, get_published_handle())
+        chunk_iterator = process_pool.imap_unordered(run_chunk_task, task_list)
+    for result_chunk, tool_stat_list in chunk_iterator:
+        runner.merge_stats(tool_stat_list)
+        for index, is_success, result in result_chunk:
+            if not is_success:
+                emitter.warning("\t\t[warning] task " + function.__name__ + " failed: " + result)
+                continue
+            yield index, result
+
+
+def pool_map(function, arg_list, chunk_size=None):
+    # results of the successful tasks, in the order of arg_list
+    task_result_list = sorted(pool_imap_unordered(function, arg_list, chunk_size), key=lambda x: x[0])
+    return [result for index, result in task_result_list]
+
+
+def extract_mapping_by_id(node_id_a, node_id_c, value_score):
+    ast_node_a = get_published_data("ast_array_a")[node_id_a]
+    ast_node_c = get_published_data("ast_array_c")[node_id_c]
+    return extractor.extract_mapping(ast_node_a, ast_node_c, value_score)
+
+
+def anti_unification_by_id(node_id_a, node_id_c):
+    ast_node_a = get_published_data("ast_array_a")[node_id_a]
+    ast_node_c = get_published_data("ast_array_c")[node_id_c]
+    return anti_unification(ast_node_a, ast_node_c)
 
 
 def derive_namespace_map(ast_node_map, source_a, source_c, neighbor_id_a, neighbor_id_c):
-    global pool, result_list, expected_count
     result_list = []
 
     namespace_map = dict()
@@ -24,8 +201,9 @@ def derive_namespace_map(ast_node_map, source_a, source_c, neighbor_id_a, neighb
     ast_tree_c = ast_generator.get_ast_json(source_c, values.TARGET_REQUIRE_MACRO, regenerate=True)
     ast_array_a = converter.convert_dict_to_array(ast_tree_a)
     ast_array_c = converter.convert_dict_to_array(ast_tree_c)
+    publish_data(ast_array_a=ast_array_a, ast_array_c=ast_array_c)
     emitter.normal("\t\tstarting parallel computing")
-    pool = mp.Pool(mp.cpu_count())
+    mapping_arg_list = list()
     for ast_node_txt_a in ast_node_map:
         ast_node_txt_c = ast_node_map[ast_node_txt_a]
         ast_node_id_a = int(str(ast_node_txt_a).split("(")[1].split(")")[0])
@@ -39,8 +217,7 @@ def derive_namespace_map(ast_node_map, source_a, source_c, neighbor_id_a, neighb
 
         value_score = 1
         if ast_node_a:
-            pool.apply_async(extractor.extract_mapping, args=(ast_node_a, ast_node_c, value_score),
-                             callback=collect_result)
+            mapping_arg_list.append((ast_node_id_a, ast_node_id_c, value_score))
         if parent_id_c != 0:
 
             # TODO: Improve this mapping
@@ -50,16 +227,14 @@ def derive_namespace_map(ast_node_map, source_a, source_c, neighbor_id_a, neighb
                 grand_id = parent_c['parent_id']
                 if grand_id != 0:
                     grand_parent_c = ast_array_c[parent_c['parent_id']]
-                    pool.apply_async(extractor.extract_mapping, args=(ast_node_a, parent_c, value_score),
-                                     callback=collect_result)
+                    mapping_arg_list.append((ast_node_id_a, parent_id_c, value_score))
                     if grand_parent_c["type"] == "BinaryOperator" and ast_node_c['data_type'] == "ktime_t":
                         var_mapping = "." + ast_node_a['value'][1:], "." + ast_node_c['value'][1:] + "." + parent_c['value'][1:], 100, "MemberExpr", "MemberExpr"
                         result_list.append(var_mapping)
                         values.data_type_map[ast_node_a['data_type']] = parent_c['data_type']
 
-    pool.close()
     emitter.normal("\t\twaiting for thread completion")
-    pool.join()
+    result_list = result_list + pool_map(extract_mapping_by_id, mapping_arg_list)
 
     for id_a, id_c, score, type_a, type_c in result_list:
         if id_a is None or id_c is None:
@@ -111,59 +286,106 @@ def derive_namespace_map(ast_node_map, source_a, source_c, neighbor_id_a, neighb
     return refined_namespace_map
 
 
-def read_mapping(map_file_name):
-    global pool, result_list, expected_count
-    result_list = []
-    node_map = dict()
-    emitter.normal("\t\tstarting parallel computing")
-    pool = mp.Pool(mp.cpu_count())
+def parse_mapping_line(line):
+    # most lines carry no quoted literal and split on the single separator
+    if not line.startswith(MATCH_PREFIX):
+        return None
+    content = line[len(MATCH_PREFIX):].strip()
+    if "\"" not in content and content.count(definitions.TO) == 1:
+        return content.split(definitions.TO)
+    return utilities.clean_parse(content, definitions.TO)
+
+
+def get_node_id(node_str):
+    id_match = NODE_ID_PATTERN.search(node_str)
+    if id_match is None:
+        return None
+    return int(id_match.group(1))
+
+
+def read_mapping_range(map_file_name, start_offset, end_offset, only_ids=False):
+    # a line belongs to the range its first byte falls in
+    node_pair_list = list()
+    id_list_a = array("l")
+    id_list_c = array("l")
+    with open(map_file_name, 'rb') as map_file:
+        if start_offset > 0:
+            map_file.seek(start_offset - 1)
+            map_file.readline()
+        while map_file.tell() < end_offset:
+            line = map_file.readline()
+            if not line:
+                break
+            node_pair = parse_mapping_line(line.decode('utf-8', errors='replace').strip())
+            if node_pair is None:
+                continue
+            if not only_ids:
+                node_pair_list.append(node_pair)
+                continue
+            node_id_a = get_node_id(node_pair[0])
+            node_id_c = get_node_id(node_pair[1])
+            if node_id_a is None or node_id_c is None:
+                continue
+            id_list_a.append(node_id_a)
+            id_list_c.append(node_id_c)
+    if only_ids:
+        return id_list_a, id_list_c
+    return node_pair_list
 
-    with open(map_file_name, 'r') as ast_map:
-        line_list = ast_map.readlines()
 
-    for line in line_list:
-        line = line.strip()
-        line = line.split(" ")
-        operation = line[0]
-        content = " ".join(line[1:])
-        if operation == definitions.MATCH:
-            node_pair = utilities.clean_parse(content, definitions.TO)
-            result_list.append(node_pair)
+def read_mapping_chunks(map_file_name, only_ids=False):
+    file_size = os.path.getsize(map_file_name)
+    if file_size < MAPPING_CHUNK_SIZE * 2:
+        return [read_mapping_range(map_file_name, 0, file_size, only_ids)]
+    emitter.normal("\t\tstarting parallel computing")
+    range_arg_list = list()
+    for start_offset in range(0, file_size, MAPPING_CHUNK_SIZE):
+        range_arg_list.append((map_file_name, start_offset, min(start_offset + MAPPING_CHUNK_SIZE, file_size),
+                               only_ids))
+    return pool_map(read_mapping_range, range_arg_list, chunk_size=1)
 
-    pool.close()
-    emitter.normal("\t\twaiting for thread completion")
-    pool.join()
 
-    for node_a, node_c in result_list:
-        node_map[node_a] = node_c
+def read_mapping(map_file_name):
+    node_map = dict()
+    for node_pair_list in read_mapping_chunks(map_file_name):
+        for node_a, node_c in node_pair_list:
+            node_map[node_a] = node_c
     return node_map
 
 
+def read_mapping_ids(map_file_name):
+    # the matched node ids of both sides, as parallel integer arrays
+    id_list_a = array("l")
+    id_list_c = array("l")
+    for chunk_id_list_a, chunk_id_list_c in read_mapping_chunks(map_file_name, True):
+        id_list_a.extend(chunk_id_list_a)
+        id_list_c.extend(chunk_id_list_c)
+    return id_list_a, id_list_c
+
+
 # adjust the mapping via anti-unification
 def extend_mapping(ast_node_map, source_a, source_c, neighbor_id_a):
-    global pool, result_list, expected_count
-    result_list = []
 
     emitter.normal("\tupdating ast map using anti-unification")
     ast_tree_a = ast_generator.get_ast_json(source_a, values.DONOR_REQUIRE_MACRO, regenerate=True)
     ast_tree_c = ast_generator.get_ast_json(source_c, values.TARGET_REQUIRE_MACRO, regenerate=True)
 
-    emitter.normal("\t\tstarting parallel computing")
-    pool = mp.Pool(mp.cpu_count())
+    ast_array_a = converter.convert_dict_to_array(ast_tree_a)
+    ast_array_c = converter.convert_dict_to_array(ast_tree_c)
+    ast_array_a[int(ast_tree_a['id'])] = ast_tree_a
+    ast_array_c[int(ast_tree_c['id'])] = ast_tree_c
+    publish_data(ast_array_a=ast_array_a, ast_array_c=ast_array_c)
 
+    emitter.normal("\t\tstarting parallel computing")
+    unification_arg_list = list()
     for node_a in ast_node_map:
         node_c = ast_node_map[node_a]
         ast_node_id_a = int(str(node_a).split("(")[1].split(")")[0])
         ast_node_id_c = int(str(node_c).split("(")[1].split(")")[0])
-        ast_node_a = finder.search_ast_node_by_id(ast_tree_a, ast_node_id_a)
-        ast_node_c = finder.search_ast_node_by_id(ast_tree_c, ast_node_id_c)
+        unification_arg_list.append((ast_node_id_a, ast_node_id_c))
 
-        pool.apply_async(anti_unification, args=(ast_node_a, ast_node_c),
-                         callback=collect_result)
-
-    pool.close()
     emitter.normal("\t\twaiting for thread completion")
-    pool.join()
+    result_list = pool_map(anti_unification_by_id, unification_arg_list)
 
     for au_pairs in result_list:
         for au_pair_key in au_pairs:
@@ -175,8 +397,6 @@ def extend_mapping(ast_node_map, source_a, source_c, neighbor_id_a):
 
 
 def generate_method_invocation_map(source_a, source_c, ast_tree_a, ast_tree_c, method_name):
-    global pool, result_list, expected_count
-    result_list = []
     method_invocation_map = dict()
     emitter.normal("\tderiving method invocation map")
 
@@ -184,8 +404,6 @@ def generate_method_invocation_map(source_a, source_c, ast_tree_a, ast_tree_c, m
     app.common.utilities.generate_map_gumtree(source_a, source_c, map_file_name)
     global_ast_node_map = read_mapping(map_file_name)
     result_list = []
-    emitter.normal("\t\tstarting parallel computing")
-    pool = mp.Pool(mp.cpu_count())
 
     for ast_node_txt_a in global_ast_node_map:
         ast_node_txt_c = global_ast_node_map[ast_node_txt_a]
@@ -206,10 +424,6 @@ def generate_method_invocation_map(source_a, source_c, ast_tree_a, ast_tree_c, m
                 result_list.append(extractor.extract_method_invocations(global_ast_node_map,
                                                                         ast_node_a, ast_node_c, method_name))
 
-    pool.close()
-    emitter.normal("\t\twaiting for thread completion")
-    pool.join()
-
     for method_name_a, method_name_c, arg_operation in result_list:
         if method_name_a is not None:
             if method_name_a not in method_invocation_map:
@@ -225,15 +439,11 @@ def generate_method_invocation_map(source_a, source_c, ast_tree_a, ast_tree_c, m
 
 
 def generate_function_signature_map(source_a, source_c, ast_tree_a, ast_tree_c, method_name):
-    global pool, result_list, expected_count
-    result_list = []
     function_map = dict()
     emitter.normal("\tderiving function signature map")
     map_file_name = definitions.DIRECTORY_OUTPUT + "/" + source_a.split("/")[-1] + ".map"
     global_ast_node_map = read_mapping(map_file_name)
     result_list = []
-    emitter.normal("\t\tstarting parallel computing")
-    pool = mp.Pool(mp.cpu_count())
 
     for ast_node_txt_a in global_ast_node_map:
         ast_node_txt_c = global_ast_node_map[ast_node_txt_a]
@@ -254,10 +464,6 @@ def generate_function_signature_map(source_a, source_c, ast_tree_a, ast_tree_c,
                 result_list.append(extractor.extract_method_signatures(global_ast_node_map,
                                                                        ast_node_a, ast_node_c, method_name))
 
-    pool.close()
-    emitter.normal("\t\twaiting for thread completion")
-    pool.join()
-
     for method_name_a, method_name_c, arg_operation in result_list:
         if method_name_a is not None:
             if method_name_a not in function_map:
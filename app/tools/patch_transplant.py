@@ -0,0 +1,180 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Deterministic transplant of the PA to PB edit onto PC when PC only renames or reformats PA '''
+
+import re
+import difflib
+
+TRANSPLANT_METHOD = "deterministic_transplant"
+
+TOKEN_PATTERN = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[A-Za-z_]\w*|\d[\w.]*|\S')
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_]\w*')
+# literals, numbers and comments are copied as they are when identifiers of a line are renamed
+RENAME_PATTERN = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|\d[\w.]*|[A-Za-z_]\w*')
+
+KEYWORD_LIST = {
+    "auto", "break", "case", "char", "const", "continue", "default", "do", "double", "else", "enum", "extern",
+    "float", "for", "goto", "if", "inline", "int", "long", "register", "restrict", "return", "short", "signed",
+    "sizeof", "static", "struct", "switch", "typedef", "union", "unsigned", "void", "volatile", "while",
+    "bool", "true", "false", "class", "namespace", "template", "typename", "public", "private", "protected",
+    "virtual", "new", "delete", "this", "nullptr", "NULL", "operator", "using", "try", "catch", "throw"
+}
+# keywords that can end the type of a declaration or come before it
+TYPE_KEYWORD_LIST = {
+    "auto", "bool", "char", "const", "double", "float", "int", "long", "register", "short", "signed", "static",
+    "struct", "union", "unsigned", "void", "volatile", "enum", "class"
+}
+# tokens a declaration can start after, and tokens that can follow a declared name
+DECLARATION_START_LIST = {None, "(", ",", "{", "}", ";"}
+DECLARATION_END_LIST = {"=", ";", ",", ")", "[", ":"}
+
+
+def is_identifier(token):
+    return IDENTIFIER_PATTERN.fullmatch(token) is not None and token not in KEYWORD_LIST
+
+
+def tokenize_line(line):
+    return TOKEN_PATTERN.findall(line)
+
+
+def normalize_line(line):
+    return " ".join(tokenize_line(line))
+
+
+def is_type_token(token):
+    return token in TYPE_KEYWORD_LIST or is_identifier(token)
+
+
+def get_declared_names(line_list):
+    # parameters and locals: a name after a type, optionally behind * and &, and before = ; , ) [ or :
+    token_list = tokenize_line("\n".join(line_list))
+    declared_list = set()
+    for index, token in enumerate(token_list):
+        next_token = token_list[index + 1] if index + 1 < len(token_list) else None
+        if not is_identifier(token) or next_token not in DECLARATION_END_LIST or index == 0:
+            continue
+        type_index = index - 1
+        while type_index >= 0 and token_list[type_index] in ["*", "&", "const"]:
+            type_index -= 1
+        if type_index < 0 or not is_type_token(token_list[type_index]):
+            continue
+        if type_index < index - 1:
+            # behind a pointer or reference the type has to start the declaration, a * b is a product
+            previous_token = token_list[type_index - 1] if type_index > 0 else None
+            if previous_token not in DECLARATION_START_LIST and previous_token not in TYPE_KEYWORD_LIST:
+                continue
+        declared_list.add(token)
+    return declared_list
+
+
+def derive_identifier_map(line_list_a, line_list_c):
+    # the one-to-one renaming of parameters and locals that turns PA into PC line by line, None if PC
+    # differs otherwise; callees, types, macros and constants have to match as they are
+    if len(line_list_a) != len(line_list_c):
+        return None
+    declared_list_a = get_declared_names(line_list_a)
+    declared_list_c = get_declared_names(line_list_c)
+    identifier_map = dict()
+    reverse_map = dict()
+    for line_a, line_c in zip(line_list_a, line_list_c):
+        token_list_a = tokenize_line(line_a)
+        token_list_c = tokenize_line(line_c)
+        if len(token_list_a) != len(token_list_c):
+            return None
+        for token_a, token_c in zip(token_list_a, token_list_c):
+            if is_identifier(token_a) and is_identifier(token_c):
+                if token_a != token_c and (token_a not in declared_list_a or token_c not in declared_list_c):
+                    return None
+                if identifier_map.setdefault(token_a, token_c) != token_c:
+                    return None
+                if reverse_map.setdefault(token_c, token_a) != token_a:
+                    return None
+            elif token_a != token_c:
+                return None
+    return identifier_map
+
+
+def rename_line(line, identifier_map):
+    return RENAME_PATTERN.sub(lambda match: identifier_map.get(match.group(0), match.group(0)), line)
+
+
+def get_indent(line):
+    return line[:len(line) - len(line.lstrip())]
+
+
+def derive_indent_map(line_list_a, line_list_c):
+    indent_map = dict()
+    for line_a, line_c in zip(line_list_a, line_list_c):
+        if line_a.strip():
+            indent_map.setdefault(get_indent(line_a), get_indent(line_c))
+    indent_map.pop("", None)
+    return indent_map
+
+
+def reindent_line(line, indent_map):
+    # PB indentation in the style of PC, deeper levels are converted one known prefix at a time
+    indent = get_indent(line)
+    converted = ""
+    while indent:
+        prefix_list = [prefix for prefix in indent_map if indent.startswith(prefix)]
+        if not prefix_list:
+            converted += indent
+            break
+        prefix = max(prefix_list, key=len)
+        converted += indent_map[prefix]
+        indent = indent[len(prefix):]
+    return converted + line.lstrip()
+
+
+def has_name_conflict(line_list, identifier_map):
+    # a name introduced by PB that PC already uses for a different PA name would be captured by the rename
+    target_list = {name_c: name_a for name_a, name_c in identifier_map.items()}
+    for line in line_list:
+        for token in tokenize_line(line):
+            if is_identifier(token) and token not in identifier_map and token in target_list:
+                return True
+    return False
+
+
+def transplant_function(pa_content, pb_content, pc_content):
+    # patched PC function, None when PC is not PA modulo whitespace and a consistent renaming
+    if not pa_content.strip() or not pc_content.strip():
+        return None
+    line_list_a = pa_content.splitlines()
+    line_list_b = pb_content.splitlines()
+    line_list_c = pc_content.splitlines()
+    identifier_map = derive_identifier_map(line_list_a, line_list_c)
+    if identifier_map is None:
+        return None
+    indent_map = derive_indent_map(line_list_a, line_list_c)
+
+    # three-way merge where PA to PC has no edits: unchanged lines come from PC, edited lines from PB
+    matcher = difflib.SequenceMatcher(None, [normalize_line(line) for line in line_list_a],
+                                      [normalize_line(line) for line in line_list_b], autojunk=False)
+    patched_line_list = list()
+    for tag, start_a, end_a, start_b, end_b in matcher.get_opcodes():
+        if tag == "equal":
+            patched_line_list.extend(line_list_c[start_a:end_a])
+        elif tag in ["replace", "insert"]:
+            inserted_line_list = line_list_b[start_b:end_b]
+            if has_name_conflict(inserted_line_list, identifier_map):
+                return None
+            patched_line_list.extend(reindent_line(rename_line(line, identifier_map), indent_map)
+                                     for line in inserted_line_list)
+    patched_content = "\n".join(patched_line_list)
+    if pc_content.endswith("\n"):
+        patched_content += "\n"
+    return patched_content
+
+
+def make_diff(pc_content, patched_content):
+    diff = difflib.unified_diff(pc_content.splitlines(keepends=True), patched_content.splitlines(keepends=True),
+                                fromfile='PC/function.cc', tofile='PC/function.cc', n=0)
+    return ''.join(diff)
+
+
+def transplant_triplet(triplet):
+    return transplant_function(triplet.get('pa_pre_patch', {}).get('content', ''),
+                               triplet.get('pb_post_patch', {}).get('content', ''),
+                               triplet.get('pc_pre_patch', {}).get('content', ''))
@@ -0,0 +1,104 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Single pass scanner for preprocessor directives, memoized by file content '''
+
+import re
+import hashlib
+
+DIRECTIVE_PATTERN = re.compile(r"^\s*#\s*([A-Za-z_]\w*)\s*(.*)$", re.DOTALL)
+LITERAL_PATTERN = re.compile(r"\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'")
+BLOCK_COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.DOTALL)
+DEFINED_PATTERN = re.compile(r"\bdefined\s*(?:\(\s*([A-Za-z_]\w*)\s*\)|([A-Za-z_]\w*))")
+NAME_PATTERN = re.compile(r"[A-Za-z_]\w*")
+# literals come first so comment markers inside them, as in #include "a//b.h", are kept
+COMMENT_PATTERN = re.compile(r"\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|//.*|/\*.*?(?:\*/|$)")
+
+directive_cache = dict()
+
+
+class DirectiveInfo:
+
+    def __init__(self):
+        # (line number, directive text) in source order
+        self.include_list = list()
+        self.conditional_list = list()
+
+
+def iterate_logical_lines(source_text):
+    # join backslash continued lines, reporting the first physical line number
+    logical_line = ""
+    start_line = 0
+    for line_number, physical_line in enumerate(source_text.splitlines(), 1):
+        if not logical_line:
+            start_line = line_number
+        if physical_line.endswith("\\"):
+            logical_line += physical_line[:-1] + " "
+            continue
+        yield start_line, logical_line + physical_line
+        logical_line = ""
+    if logical_line:
+        yield start_line, logical_line
+
+
+def strip_comments(directive_text):
+    def replace_comment(match):
+        return match.group(0) if match.group(0)[0] in "\"'" else " "
+    return COMMENT_PATTERN.sub(replace_comment, directive_text).strip()
+
+
+def scan_text(source_text):
+    directive_info = DirectiveInfo()
+    in_comment = False
+    for line_number, logical_line in iterate_logical_lines(source_text):
+        if in_comment:
+            comment_end = logical_line.find("*/")
+            if comment_end == -1:
+                continue
+            logical_line = " " * (comment_end + 2) + logical_line[comment_end + 2:]
+            in_comment = False
+        directive_match = DIRECTIVE_PATTERN.match(logical_line)
+        code_line = BLOCK_COMMENT_PATTERN.sub(" ", LITERAL_PATTERN.sub("\"\"", logical_line))
+        comment_start = code_line.find("/*")
+        line_comment = code_line.find("//")
+        if comment_start != -1 and (line_comment == -1 or comment_start < line_comment):
+            in_comment = True
+        if not directive_match:
+            continue
+        directive_name = directive_match.group(1)
+        directive_text = "#" + directive_name + " " + strip_comments(directive_match.group(2))
+        directive_text = directive_text.strip()
+        if directive_name in ["include", "include_next", "import"]:
+            directive_info.include_list.append((line_number, directive_text))
+        elif directive_name in ["if", "ifdef", "ifndef", "elif", "elifdef", "elifndef"]:
+            directive_info.conditional_list.append((line_number, directive_text))
+    return directive_info
+
+
+def scan_file(source_path):
+    with open(source_path, 'rb') as source_file:
+        source_content = source_file.read()
+    content_hash = hashlib.sha1(source_content).hexdigest()
+    if content_hash not in directive_cache:
+        directive_cache[content_hash] = scan_text(source_content.decode('utf-8', errors='replace'))
+    return directive_cache[content_hash]
+
+
+def get_include_list(source_path):
+    return [directive_text for line_number, directive_text in scan_file(source_path).include_list]
+
+
+def get_conditional_macro_list(source_path, only_ifdef=False):
+    macro_list = set()
+    for line_number, directive_text in scan_file(source_path).conditional_list:
+        directive_name, _, condition = directive_text.partition(" ")
+        if directive_name in ["#ifdef", "#ifndef", "#elifdef", "#elifndef"]:
+            if only_ifdef and directive_name not in ["#ifdef", "#elifdef"]:
+                continue
+            name_match = NAME_PATTERN.match(condition.strip())
+            if name_match:
+                macro_list.add(name_match.group(0))
+        elif not only_ifdef:
+            for macro_match in DEFINED_PATTERN.finditer(condition):
+                macro_list.add(macro_match.group(1) or macro_match.group(2))
+    return macro_list
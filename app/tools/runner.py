@@ -0,0 +1,248 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Subprocess runner with argv execution, timeouts, streamed output and per-tool accounting '''
+
+import os
+import time
+import signal
+import threading
+import subprocess
+from app.common import values
+from app.tools import emitter
+
+CAPTURE = "capture"
+# upper bounds in seconds of the latency histogram buckets, the last bucket is unbounded
+BUCKET_LIST = [0.1, 0.5, 1, 5, 10, 30, 60, 300]
+
+stat_list = dict()
+stat_lock = threading.Lock()
+
+
+class CommandResult:
+
+    def __init__(self, return_code, output, error, duration, is_timeout):
+        self.return_code = return_code
+        self.output = output
+        self.error = error
+        self.duration = duration
+        self.is_timeout = is_timeout
+
+
+class ToolStat:
+
+    def __init__(self):
+        self.count = 0
+        self.failure_count = 0
+        self.timeout_count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.bucket_list = [0] * (len(BUCKET_LIST) + 1)
+
+    def add(self, duration, return_code, is_timeout):
+        self.count += 1
+        if is_timeout:
+            self.timeout_count += 1
+        elif return_code != 0:
+            self.failure_count += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        bucket_index = 0
+        while bucket_index < len(BUCKET_LIST) and duration > BUCKET_LIST[bucket_index]:
+            bucket_index += 1
+        self.bucket_list[bucket_index] += 1
+
+    def merge(self, tool_stat):
+        self.count += tool_stat.count
+        self.failure_count += tool_stat.failure_count
+        self.timeout_count += tool_stat.timeout_count
+        self.total_time += tool_stat.total_time
+        self.max_time = max(self.max_time, tool_stat.max_time)
+        self.bucket_list = [x + y for x, y in zip(self.bucket_list, tool_stat.bucket_list)]
+
+
+def get_tool_name(argv):
+    if isinstance(argv, str):
+        argv = argv.split()
+    if not argv:
+        return "shell"
+    return os.path.basename(argv[0])
+
+
+def get_timeout(timeout):
+    if timeout is None and values.CONF_COMMAND_TIMEOUT > 0:
+        return values.CONF_COMMAND_TIMEOUT
+    return timeout
+
+
+def record_command(tool, duration, return_code, is_timeout):
+    with stat_lock:
+        if tool not in stat_list:
+            stat_list[tool] = ToolStat()
+        stat_list[tool].add(duration, return_code, is_timeout)
+
+
+def pop_stats():
+    # hands the counters of a worker over to the parent process
+    global stat_list
+    with stat_lock:
+        tool_stat_list = stat_list
+        stat_list = dict()
+    return tool_stat_list
+
+
+def merge_stats(tool_stat_list):
+    with stat_lock:
+        for tool, tool_stat in tool_stat_list.items():
+            if tool not in stat_list:
+                stat_list[tool] = ToolStat()
+            stat_list[tool].merge(tool_stat)
+
+
+def break_link(file_path):
+    # a linked Project D shares inodes with Project C, never write through them
+    if os.path.isfile(file_path) and os.stat(file_path).st_nlink > 1:
+        os.unlink(file_path)
+
+
+def open_stream(target, mode='wb'):
+    # returns the stream for Popen and the file to close after the command finished
+    if target is None:
+        return subprocess.DEVNULL, None
+    if target == CAPTURE:
+        return subprocess.PIPE, None
+    if isinstance(target, str):
+        if 'w' in mode:
+            break_link(target)
+        stream = open(target, mode)
+        return stream, stream
+    return target, None
+
+
+def kill_process(process_id):
+    # commands run in their own session, so a shell and everything it started is killed
+    try:
+        os.killpg(process_id, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def run(argv, tool=None, stdout=None, stderr=None, timeout=None, cwd=None, shell=False, append_error=False):
+    if tool is None:
+        tool = get_tool_name(argv)
+    timeout = get_timeout(timeout)
+    stdout_stream, stdout_file = open_stream(stdout)
+    stderr_stream, stderr_file = open_stream(stderr, 'ab' if append_error else 'wb')
+    start_time = time.time()
+    is_timeout = False
+    try:
+        process = subprocess.Popen(argv, stdout=stdout_stream, stderr=stderr_stream, cwd=cwd, shell=shell,
+                                   start_new_session=True)
+        try:
+            output, error = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_process(process.pid)
+            output, error = process.communicate()
+            is_timeout = True
+        except BaseException:
+            kill_process(process.pid)
+            process.wait()
+            raise
+    finally:
+        for stream_file in [stdout_file, stderr_file]:
+            if stream_file is not None:
+                stream_file.close()
+    duration = time.time() - start_time
+    record_command(tool, duration, process.returncode, is_timeout)
+    if is_timeout:
+        emitter.warning("\t\t[warning] " + tool + " killed after " + str(timeout) + " seconds")
+    return CommandResult(process.returncode, output, error, duration, is_timeout)
+
+
+def run_shell(command, tool=None, stdout=None, stderr=None, timeout=None, cwd=None):
+    return run(command, tool, stdout, stderr, timeout, cwd, shell=True)
+
+
+class CommandStream:
+    # output lines of a command while it runs, result is set once the command finished
+
+    def __init__(self, argv, tool=None, stderr=None, timeout=None, cwd=None):
+        self.argv = argv
+        self.tool = get_tool_name(argv) if tool is None else tool
+        self.stderr = stderr
+        self.timeout = get_timeout(timeout)
+        self.cwd = cwd
+        self.result = None
+
+    def __iter__(self):
+        stderr_stream, stderr_file = open_stream(self.stderr)
+        start_time = time.time()
+        timeout_event = threading.Event()
+        timer = None
+        process = None
+        try:
+            process = subprocess.Popen(self.argv, stdout=subprocess.PIPE, stderr=stderr_stream, cwd=self.cwd,
+                                       universal_newlines=True, errors='replace', start_new_session=True)
+
+            def on_timeout():
+                timeout_event.set()
+                kill_process(process.pid)
+
+            if self.timeout:
+                timer = threading.Timer(self.timeout, on_timeout)
+                timer.daemon = True
+                timer.start()
+            try:
+                for line in process.stdout:
+                    yield line
+                process.wait()
+            except BaseException:
+                # includes the consumer leaving the loop early
+                kill_process(process.pid)
+                process.wait()
+                raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if process is not None:
+                process.stdout.close()
+            if stderr_file is not None:
+                stderr_file.close()
+            if process is not None:
+                is_timeout = timeout_event.is_set()
+                duration = time.time() - start_time
+                record_command(self.tool, duration, process.returncode, is_timeout)
+                if is_timeout:
+                    emitter.warning("\t\t[warning] " + self.tool + " killed after " + str(self.timeout) + " seconds")
+                self.result = CommandResult(process.returncode, None, None, duration, is_timeout)
+
+
+def run_stream(argv, tool=None, stderr=None, timeout=None, cwd=None):
+    return CommandStream(argv, tool, stderr, timeout, cwd)
+
+
+def format_histogram(tool_stat):
+    bucket_text_list = list()
+    lower_bound = 0
+    for upper_bound, count in zip(BUCKET_LIST + [None], tool_stat.bucket_list):
+        if count:
+            if upper_bound is None:
+                bucket_text_list.append(">" + str(lower_bound) + "s:" + str(count))
+            else:
+                bucket_text_list.append("<=" + str(upper_bound) + "s:" + str(count))
+        lower_bound = upper_bound
+    return " ".join(bucket_text_list)
+
+
+def print_stats():
+    if not stat_list:
+        return
+    emitter.sub_title("External command statistics")
+    for tool, tool_stat in sorted(stat_list.items(), key=lambda x: x[1].total_time, reverse=True):
+        mean_time = tool_stat.total_time / tool_stat.count
+        emitter.normal("\t" + tool + ": " + str(tool_stat.count) + " runs, " +
+                       str(tool_stat.failure_count) + " failed, " + str(tool_stat.timeout_count) + " timed out, " +
+                       "total " + format(tool_stat.total_time, '.2f') + "s, " +
+                       "mean " + format(mean_time, '.3f') + "s, " +
+                       "max " + format(tool_stat.max_time, '.2f') + "s")
+        emitter.normal("\t\t" + format_histogram(tool_stat))
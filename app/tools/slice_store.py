@@ -0,0 +1,90 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' In-memory slice store backed by a single append-only file per run '''
+
+import json
+import os
+import threading
+
+store_file_path = None
+store_offset = 0
+slice_list = dict()
+store_lock = threading.Lock()
+
+
+def open_store(file_path, reset=True):
+    global store_file_path, store_offset
+    with store_lock:
+        slice_list.clear()
+        store_file_path = file_path
+        store_offset = 0
+        if reset or not os.path.isfile(file_path):
+            open(file_path, 'w').close()
+    refresh_store()
+
+
+def refresh_store():
+    # replay records appended since the last read (e.g. by another process)
+    global store_offset
+    if not store_file_path or not os.path.isfile(store_file_path):
+        return
+    with store_lock:
+        if os.path.getsize(store_file_path) == store_offset:
+            return
+        with open(store_file_path, 'rb') as store_file:
+            store_file.seek(store_offset)
+            for record_line in store_file:
+                if not record_line.endswith(b"\n"):
+                    break
+                store_offset += len(record_line)
+                record = json.loads(record_line.decode('utf-8'))
+                slice_list[record['slice']] = record
+
+
+def add_slice(slice_path, source_path, segment_code, segment_identifier,
+              start_line, end_line, start_byte, end_byte, content):
+    global store_offset
+    record = {
+        "slice": slice_path,
+        "source": source_path,
+        "segment": segment_code,
+        "identifier": segment_identifier,
+        "start line": start_line,
+        "end line": end_line,
+        "start byte": start_byte,
+        "end byte": end_byte,
+        "content": content
+    }
+    with store_lock:
+        slice_list[slice_path] = record
+        if store_file_path:
+            record_line = (json.dumps(record) + "\n").encode('utf-8')
+            with open(store_file_path, 'ab') as store_file:
+                store_file.write(record_line)
+            if os.path.getsize(store_file_path) == store_offset + len(record_line):
+                store_offset += len(record_line)
+    return record
+
+
+def get_slice(slice_path):
+    if slice_path not in slice_list:
+        refresh_store()
+    return slice_list.get(slice_path, None)
+
+
+def has_slice(slice_path):
+    return get_slice(slice_path) is not None
+
+
+def read_slice(slice_path):
+    record = get_slice(slice_path)
+    if record is None:
+        return None
+    return record['content']
+
+
+def get_slice_list(source_path=None):
+    refresh_store()
+    return [slice_list[slice_path] for slice_path in slice_list
+            if source_path is None or slice_list[slice_path]['source'] == source_path]
@@ -2,102 +2,124 @@
 # -*- coding: utf-8 -*-
 
 
-import os
-
-import app.common.utilities
 from app.common import values
 from app.common.utilities import remove_bracketed_content
 from app.ast import ast_generator as ASTGenerator
-from app.tools import emitter
+from app.tools import emitter, slice_store
 
-def slice_source_file(source_path, segment_code, segment_identifier, project_path, use_macro=False):
-    print("Inside slice_source_file", source_path, segment_code, segment_identifier, project_path, use_macro)
-    
-    output_file_name = "." + segment_code + "." + segment_identifier + ".slice"
-    output_file_path = source_path + output_file_name
-    if os.path.isfile(output_file_path):
-        return True
-    try:
-        ast_tree = ASTGenerator.get_ast_json(source_path, use_macro, True)
-    except Exception as e:
-        print("Error in slice_source_file: ", e)
-        return False
-        
-    segment_type = values.segment_map[segment_code]
-    print("Segment type:", segment_type)
-    
-    project_path = app.common.utilities.extract_project_path(source_path)
-    source_relative_path = source_path.replace(project_path, "")[1:]
-    segment_found = False
-    target_function_lines = None
-    
-    # Find the target function and get its line range
-    def find_target_function(ast_node):
-        nonlocal segment_found, target_function_lines
-        
-        node_id = ast_node['id']
+FUNCTION_TYPE_LIST = ["FunctionDecl", "CXXMethodDecl", "CXXConstructorDecl"]
+
+
+def get_segment_identifier(ast_node):
+    node_type = ast_node['type']
+    if node_type in ["FunctionDecl", "CXXMethodDecl"] and 'qualified_identifier' in ast_node:
+        return remove_bracketed_content(ast_node['qualified_identifier'])
+    if 'value' in ast_node:
+        return remove_bracketed_content(ast_node['value'])
+    return None
+
+
+def index_segments(ast_tree):
+    # first (pre-order) occurrence of each segment, functions are not searched inside
+    segment_index = dict()
+    node_list = list(reversed(ast_tree.get('children', [])))
+    while node_list:
+        ast_node = node_list.pop()
         node_type = ast_node['type']
-        
-        # Check if this is the target function
-        if node_type in segment_type:
-            if node_type in ["FunctionDecl", "CXXMethodDecl"] and 'qualified_identifier' in ast_node:
-                node_identifier = remove_bracketed_content(ast_node['qualified_identifier'])
-            else:
-                node_identifier = remove_bracketed_content(ast_node['value'])
-            
-            print("Checking function:", node_identifier, "vs target:", segment_identifier)
-            if node_identifier == segment_identifier:
-                print("Found target function!")
-                segment_found = True
+        for segment_code in values.segment_map:
+            if node_type not in values.segment_map[segment_code]:
+                continue
+            node_identifier = get_segment_identifier(ast_node)
+            if node_identifier is None:
+                continue
+            segment_key = (segment_code, node_identifier)
+            if segment_key not in segment_index:
                 start_line = ast_node.get('start line', 0)
                 end_line = ast_node.get('end line', 0)
-                target_function_lines = (start_line, end_line)
-                print(f"Function spans lines {start_line} to {end_line}")
-                return True
-        
-        # Recursively search children
-        if node_type not in ["FunctionDecl", "CXXMethodDecl", "CXXConstructorDecl"]:
-            for child in ast_node.get('children', []):
-                if find_target_function(child):
-                    return True
-        
-        return False
-    
-    # Find the target function
-    for ast_node in ast_tree.get('children', []):
-        if find_target_function(ast_node):
-            break
-    
-    if not segment_found:
-        emitter.information("Target function not found")
-        return False
-    
-    # Extract only the function lines from the source file
+                segment_index[segment_key] = (start_line, end_line)
+        if node_type not in FUNCTION_TYPE_LIST:
+            node_list.extend(reversed(ast_node.get('children', [])))
+    return segment_index
+
+
+def normalize_line(source_line):
+    source_line = source_line.decode('utf-8', errors='ignore')
+    if source_line.endswith(("\n", "\r")):
+        source_line = source_line.rstrip("\r\n") + "\n"
+    return source_line
+
+
+def extract_segments(source_path, segment_list, use_macro=False):
+    segment_info = dict()
+    for segment_key in segment_list:
+        segment_info[segment_key] = None
+    if not segment_list:
+        return segment_info
     try:
-        with open(source_path, 'r', encoding='utf-8', errors='ignore') as source_file:
-            all_lines = source_file.readlines()
-        
-        start_line, end_line = target_function_lines
-        
-        # Extract the function lines (1-indexed to 0-indexed conversion)
-        if start_line > 0 and end_line > 0 and start_line <= len(all_lines) and end_line <= len(all_lines):
-            function_lines = all_lines[start_line-1:end_line]
-            
-            # Write only the function to the slice file
-            with open(output_file_path, 'w', encoding='utf-8') as slice_file:
-                slice_file.writelines(function_lines)
-            
-            print(f"Created function-only slice with lines {start_line}-{end_line}")
-        else:
-            print(f"Invalid line range: {start_line}-{end_line} for file with {len(all_lines)} lines")
-            return False
-            
-    except Exception as e:
-        print(f"Error extracting function lines: {e}")
-        return False
-
-    emitter.normal("\t\t\tcreated " + output_file_path)
-    return segment_found
+        ast_tree = ASTGenerator.get_ast_json(source_path, use_macro, True)
+        segment_index = index_segments(ast_tree)
+        with open(source_path, 'rb') as source_file:
+            all_lines = source_file.read().splitlines(keepends=True)
+    except Exception as exception:
+        emitter.warning("\t\t[warning] failed slicing " + source_path + ": " + str(exception))
+        return segment_info
+    line_offset_list = [0]
+    for source_line in all_lines:
+        line_offset_list.append(line_offset_list[-1] + len(source_line))
+
+    for segment_code, segment_identifier in segment_list:
+        segment_key = (segment_code, segment_identifier)
+        if segment_key not in segment_index:
+            emitter.information("Target " + segment_code + " " + segment_identifier + " not found")
+            continue
+        start_line, end_line = segment_index[segment_key]
+        # Extract the segment lines (1-indexed to 0-indexed conversion)
+        if not (0 < start_line <= len(all_lines) and 0 < end_line <= len(all_lines)):
+            emitter.warning("\t\t[warning] invalid line range " + str(start_line) + "-" + str(end_line) +
+                            " for file with " + str(len(all_lines)) + " lines")
+            continue
+        segment_lines = [normalize_line(line) for line in all_lines[start_line - 1:end_line]]
+        slice_path = source_path + "." + segment_code + "." + segment_identifier + ".slice"
+        segment_info[segment_key] = (slice_path, source_path, segment_code, segment_identifier,
+                                     start_line, end_line, line_offset_list[start_line - 1],
+                                     line_offset_list[end_line], "".join(segment_lines))
+    return segment_info
+
+
+def store_segments(segment_info):
+    slice_result = dict()
+    for segment_key in segment_info:
+        slice_info = segment_info[segment_key]
+        slice_result[segment_key] = slice_info is not None
+        if slice_info is not None:
+            slice_store.add_slice(*slice_info)
+            emitter.normal("\t\t\tcreated " + slice_info[0])
+    return slice_result
+
+
+def get_pending_segments(source_path, segment_list):
+    pending_list = list()
+    for segment_code, segment_identifier in segment_list:
+        slice_path = source_path + "." + segment_code + "." + segment_identifier + ".slice"
+        if slice_store.has_slice(slice_path):
+            continue
+        if (segment_code, segment_identifier) not in pending_list:
+            pending_list.append((segment_code, segment_identifier))
+    return pending_list
+
+
+def slice_source_segments(source_path, segment_list, use_macro=False):
+    slice_result = dict()
+    for segment_key in segment_list:
+        slice_result[segment_key] = True
+    pending_list = get_pending_segments(source_path, segment_list)
+    slice_result.update(store_segments(extract_segments(source_path, pending_list, use_macro)))
+    return slice_result
+
+
+def slice_source_file(source_path, segment_code, segment_identifier, project_path, use_macro=False):
+    slice_result = slice_source_segments(source_path, [(segment_code, segment_identifier)], use_macro)
+    return slice_result[(segment_code, segment_identifier)]
 
 
 def slice_ast_tree(ast_tree, segment_code, segment_identifier):
@@ -0,0 +1,136 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Versioned per-key store of the pipeline state in a single SQLite file '''
+
+import os
+import pickle
+import sqlite3
+import hashlib
+from app.common import values
+
+store_file_path = None
+# key -> (version, digest) of the record the values in memory correspond to
+key_state_list = dict()
+
+
+def get_segment_state():
+    return [values.IS_STRUCT, values.IS_ENUM, values.IS_MACRO, values.IS_TYPEDEC, values.IS_FUNCTION]
+
+
+def set_segment_state(segment_state):
+    values.IS_STRUCT, values.IS_ENUM, values.IS_MACRO, values.IS_TYPEDEC, values.IS_FUNCTION = segment_state
+
+
+def get_value(name):
+    return lambda: getattr(values, name)
+
+
+def set_value(name):
+    return lambda data: setattr(values, name, data)
+
+
+STATE_KEY_LIST = {
+    "project-a": (get_value("Project_A"), set_value("Project_A")),
+    "project-b": (get_value("Project_B"), set_value("Project_B")),
+    "project-c": (get_value("Project_C"), set_value("Project_C")),
+    "project-d": (get_value("Project_D"), set_value("Project_D")),
+    "segment-state": (get_segment_state, set_segment_state),
+    "datatype-map": (get_value("data_type_map"), set_value("data_type_map")),
+    "var-map": (get_value("map_namespace_global"), set_value("map_namespace_global")),
+    "vec-map": (get_value("VECTOR_MAP"), set_value("VECTOR_MAP")),
+    "source-map": (get_value("SOURCE_MAP"), set_value("SOURCE_MAP")),
+    "missing-headers": (get_value("missing_header_list"), set_value("missing_header_list")),
+    "missing-macros": (get_value("missing_macro_list"), set_value("missing_macro_list")),
+    "missing-functions": (get_value("missing_function_list"), set_value("missing_function_list")),
+    "missing-types": (get_value("missing_data_type_list"), set_value("missing_data_type_list")),
+}
+
+
+def connect():
+    connection = sqlite3.connect(store_file_path)
+    connection.execute("CREATE TABLE IF NOT EXISTS state "
+                       "(key TEXT PRIMARY KEY, version INTEGER, digest TEXT, data BLOB)")
+    return connection
+
+
+def open_store(file_path, reset=True):
+    global store_file_path
+    store_file_path = file_path
+    key_state_list.clear()
+    if reset and os.path.isfile(file_path):
+        os.remove(file_path)
+    connect().close()
+
+
+def save_state(key_list=None):
+    # key_list names the records a phase changed, records not yet in the store are always added;
+    # only records whose pickled content changed are written, each with a new version
+    if key_list is None:
+        key_list = list(STATE_KEY_LIST)
+    else:
+        key_list = list(key_list) + [key for key in STATE_KEY_LIST if key not in key_state_list and key not in key_list]
+    connection = connect()
+    with connection:
+        for key in key_list:
+            data = pickle.dumps(STATE_KEY_LIST[key][0](), pickle.HIGHEST_PROTOCOL)
+            digest = hashlib.sha1(data).hexdigest()
+            row = connection.execute("SELECT version, digest FROM state WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] == digest:
+                key_state_list[key] = row
+                continue
+            version = 1 if row is None else row[0] + 1
+            connection.execute("INSERT OR REPLACE INTO state (key, version, digest, data) VALUES (?, ?, ?, ?)",
+                               (key, version, digest, sqlite3.Binary(data)))
+            key_state_list[key] = (version, digest)
+    connection.close()
+
+
+def load_state(key_list=None):
+    # records already current in memory are not unpickled again
+    if key_list is None:
+        key_list = list(STATE_KEY_LIST)
+    connection = connect()
+    for key in key_list:
+        row = connection.execute("SELECT version, digest FROM state WHERE key = ?", (key,)).fetchone()
+        if row is None or key_state_list.get(key, None) == row:
+            continue
+        data = connection.execute("SELECT data FROM state WHERE key = ?", (key,)).fetchone()[0]
+        STATE_KEY_LIST[key][1](pickle.loads(data))
+        key_state_list[key] = row
+    connection.close()
+
+
+def get_version(key):
+    connection = connect()
+    row = connection.execute("SELECT version FROM state WHERE key = ?", (key,)).fetchone()
+    connection.close()
+    return 0 if row is None else row[0]
+
+
+def get_snapshot_file(name):
+    return os.path.splitext(store_file_path)[0] + "-" + name + ".db"
+
+
+def save_snapshot(name):
+    # copy of the store as it was at the end of a phase, restored when that phase is skipped
+    connection = connect()
+    snapshot = sqlite3.connect(get_snapshot_file(name))
+    with snapshot:
+        connection.backup(snapshot)
+    snapshot.close()
+    connection.close()
+
+
+def load_snapshot(name):
+    snapshot_file = get_snapshot_file(name)
+    if not os.path.isfile(snapshot_file):
+        return False
+    snapshot = sqlite3.connect(snapshot_file)
+    connection = connect()
+    with connection:
+        snapshot.backup(connection)
+    connection.close()
+    snapshot.close()
+    load_state()
+    return True
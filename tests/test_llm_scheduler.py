@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from app.tools import llm_scheduler
+
+
+class StatusError(Exception):
+
+    def __init__(self, code):
+        super().__init__("request failed")
+        self.code = code
+
+
+class FakeEndpoint(BaseHTTPRequestHandler):
+    # answers 429 until throttle_count requests have been refused, then 200
+    throttle_count = 0
+    request_count = 0
+
+    def do_GET(self):
+        FakeEndpoint.request_count += 1
+        status = 429 if FakeEndpoint.request_count <= FakeEndpoint.throttle_count else 200
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(b"ok" if status == 200 else b"quota exceeded")
+
+    def log_message(self, *args):
+        pass
+
+
+class FailingCall:
+
+    def __init__(self, exception_list, result="ok"):
+        self.exception_list = list(exception_list)
+        self.result = result
+        self.call_count = 0
+
+    def __call__(self):
+        self.call_count += 1
+        if self.exception_list:
+            raise self.exception_list.pop(0)
+        return self.result
+
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        sleep_patch = mock.patch.object(llm_scheduler.time, "sleep")
+        self.sleep = sleep_patch.start()
+        self.addCleanup(sleep_patch.stop)
+
+    def make_scheduler(self, max_retries=3, rate_limit=0):
+        return llm_scheduler.RequestScheduler(concurrency=1, rate_limit=rate_limit, max_retries=max_retries,
+                                              request_timeout=0)
+
+    def test_429_is_retried_with_backoff(self):
+        call = FailingCall([StatusError(429), StatusError(429)])
+        self.assertEqual(self.make_scheduler().call(call), "ok")
+        self.assertEqual(call.call_count, 3)
+        delay_list = [sleep_call.args[0] for sleep_call in self.sleep.call_args_list]
+        self.assertEqual(len(delay_list), 2)
+        self.assertTrue(0.5 * llm_scheduler.BACKOFF_BASE <= delay_list[0] <= llm_scheduler.BACKOFF_BASE)
+        self.assertTrue(llm_scheduler.BACKOFF_BASE <= delay_list[1] <= 2 * llm_scheduler.BACKOFF_BASE)
+
+    def test_retry_limit(self):
+        call = FailingCall([StatusError(503)] * 10)
+        with self.assertRaises(StatusError):
+            self.make_scheduler(max_retries=2).call(call)
+        self.assertEqual(call.call_count, 3)
+
+    def test_client_error_is_not_retried(self):
+        call = FailingCall([StatusError(400)])
+        with self.assertRaises(StatusError):
+            self.make_scheduler().call(call)
+        self.assertEqual(call.call_count, 1)
+
+    def test_status_in_message_is_not_retried(self):
+        call = FailingCall([ValueError("token 429 of 500 is invalid")])
+        with self.assertRaises(ValueError):
+            self.make_scheduler().call(call)
+        self.assertEqual(call.call_count, 1)
+
+    def test_429_slows_down_the_bucket(self):
+        scheduler = self.make_scheduler(rate_limit=600)
+        scheduler.call(FailingCall([StatusError(429)]))
+        self.assertLess(scheduler.bucket.rate, scheduler.bucket.max_rate)
+
+    def test_fake_endpoint(self):
+        FakeEndpoint.request_count = 0
+        FakeEndpoint.throttle_count = 2
+        server = HTTPServer(("127.0.0.1", 0), FakeEndpoint)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = "http://127.0.0.1:{0}/".format(server.server_port)
+
+        def request():
+            with urllib.request.urlopen(url, timeout=10) as response:
+                return response.read()
+
+        self.assertEqual(self.make_scheduler().call(request), b"ok")
+        self.assertEqual(FakeEndpoint.request_count, 3)
+
+        FakeEndpoint.request_count = 0
+        FakeEndpoint.throttle_count = 10
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.make_scheduler(max_retries=1).call(request)
+        self.assertEqual(context.exception.code, 429)
+        self.assertEqual(FakeEndpoint.request_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
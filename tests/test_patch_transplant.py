@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from app.tools import patch_transplant
+
+
+PA_FUNCTION = """int check(int len, char *buf) {
+  if (len < MAX_LEN)
+    return copy(buf, len);
+  return 0;
+}
+"""
+
+PB_FUNCTION = """int check(int len, char *buf) {
+  if (buf == NULL)
+    return -1;
+  if (len < MAX_LEN)
+    return copy(buf, len);
+  return 0;
+}
+"""
+
+
+class TestTransplantFunction(unittest.TestCase):
+
+    def test_whitespace_only_difference(self):
+        pc_function = PA_FUNCTION.replace("  ", "    ").replace("(len < MAX_LEN)", "( len <  MAX_LEN )")
+        patched = patch_transplant.transplant_function(PA_FUNCTION, PB_FUNCTION, pc_function)
+        self.assertEqual(patched, """int check(int len, char *buf) {
+    if (buf == NULL)
+        return -1;
+    if ( len <  MAX_LEN )
+        return copy(buf, len);
+    return 0;
+}
+""")
+
+    def test_local_rename(self):
+        pc_function = PA_FUNCTION.replace("len", "size").replace("buf", "data")
+        patched = patch_transplant.transplant_function(PA_FUNCTION, PB_FUNCTION, pc_function)
+        self.assertEqual(patched, PB_FUNCTION.replace("len", "size").replace("buf", "data"))
+
+    def test_name_conflict(self):
+        # PB uses "size", which PC already uses for PA's "len"
+        pb_function = PB_FUNCTION.replace("if (buf == NULL)", "if (size == 0)")
+        pc_function = PA_FUNCTION.replace("len", "size")
+        self.assertIsNone(patch_transplant.transplant_function(PA_FUNCTION, pb_function, pc_function))
+
+    def test_numeric_literal(self):
+        pa_function = "int scale(int e5) {\n  return e5;\n}\n"
+        pb_function = "int scale(int e5) {\n  if (e5 > 1e5 || e5 < 0x1e5)\n    return 0;\n  return e5;\n}\n"
+        pc_function = "int scale(int y) {\n  return y;\n}\n"
+        patched = patch_transplant.transplant_function(pa_function, pb_function, pc_function)
+        self.assertEqual(patched, "int scale(int y) {\n  if (y > 1e5 || y < 0x1e5)\n    return 0;\n  return y;\n}\n")
+
+    def test_non_local_mismatch(self):
+        for pc_function in [PA_FUNCTION.replace("MAX_LEN", "MIN_LEN"),
+                            PA_FUNCTION.replace("copy(", "copy_safe("),
+                            PA_FUNCTION.replace("int len", "long len")]:
+            self.assertIsNone(patch_transplant.transplant_function(PA_FUNCTION, PB_FUNCTION, pc_function))
+
+    def test_type_mismatch(self):
+        pa_function = "void reset(uint32_t *value) {\n  *value = 0;\n}\n"
+        pb_function = "void reset(uint32_t *value) {\n  if (value)\n    *value = 0;\n}\n"
+        pc_function = pa_function.replace("uint32_t", "uint64_t")
+        self.assertIsNone(patch_transplant.transplant_function(pa_function, pb_function, pc_function))
+
+
+class TestDeclaredNames(unittest.TestCase):
+
+    def test_parameters_and_locals(self):
+        line_list = ["int f(int count, char *name, const Item &item) {",
+                     "  size_t total = 0;",
+                     "  for (int i = 0; i < count; i++)",
+                     "    total = total * scale;",
+                     "  return total;",
+                     "}"]
+        self.assertEqual(patch_transplant.get_declared_names(line_list), {"count", "name", "item", "total", "i"})
+
+
+if __name__ == "__main__":
+    unittest.main()